@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: conftest.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the fakes shared by the tests."""
+
+import time
+from collections import namedtuple
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+PROGRESS_LINE = "size=1kB time=00:00:{0:05.2f} bitrate=1kbits/s"
+
+FakeQuality = namedtuple("FakeQuality", "params extension quality_tag")
+
+FAKE_QUALITIES = {
+    "Q": FakeQuality("-vcodec libx264", ".mp4", "[Q]-"),
+    "W": FakeQuality("-vcodec libvpx-vp9", ".webm", "[W]-"),
+}
+
+
+class FakeProfile:
+    """Profile with fixed params, extension and tag per target quality.
+
+    Like Profile, update() changes the shared state of the profile, so
+    jobs racing on one profile with different qualities show up in tests.
+    """
+
+    def __init__(self, qualities=None):
+        self.qualities = dict(
+            FAKE_QUALITIES if qualities is None else qualities
+        )
+        self.update(next(iter(self.qualities)))
+
+    def update(self, new_quality):
+        self.quality = new_quality
+        self.params, self.extension, self.quality_tag = self._get(new_quality)
+
+    def get_xml_profile_attr(self, target_quality, attr_name):
+        quality = self._get(target_quality)
+        if attr_name == "preset_extension":
+            return quality.extension
+        return quality.params
+
+    def _get(self, target_quality):
+        if target_quality in self.qualities:
+            return self.qualities[target_quality]
+        return next(iter(self.qualities.values()))
+
+
+class FakeRunner:
+    """Runner recording its commands and replaying some output.
+
+    An input whose name contains a key of failures makes the run fail
+    with the (exit code, output line) of that key. If release is an Event
+    the run waits for it, or for terminate().
+    """
+
+    commands = []
+    lines = (PROGRESS_LINE.format(1),)
+    failures = {}
+    release = None
+
+    def __init__(self):
+        self.killed = False
+        self.terminated = False
+
+    def run(self, cmd, on_output=None, resources=None):
+        self.commands.append(cmd)
+        input_name = Path(cmd[cmd.index("-i") + 1]).name if "-i" in cmd else ""
+        for key, (exit_code, line) in self.failures.items():
+            if key in input_name:
+                on_output(line)
+                return -9 if self.killed else exit_code
+
+        for line in self.lines:
+            on_output(line)
+        if self.release is not None:
+            while not (self.release.is_set() or self.terminated):
+                time.sleep(0.01)
+            if self.terminated:
+                return 255
+        self.write_output(cmd)
+        return 0
+
+    def write_output(self, cmd):
+        """Create the outputs of a successful run, none by default."""
+
+    def terminate(self):
+        self.terminated = True
+
+    def kill(self):
+        self.killed = True
+
+
+def fake_video(video_path, duration="2.0", **attributes):
+    """Return a valid, probed video-like object."""
+    video_path = Path(video_path)
+    video = SimpleNamespace(
+        path=video_path,
+        format_info={"duration": duration},
+        video_info={},
+        audio_info={},
+        frame_rate="25/1",
+        is_valid=lambda: True,
+        get_name=lambda with_extension=False: (
+            video_path.name if with_extension else video_path.stem
+        ),
+    )
+    for name, value in attributes.items():
+        setattr(video, name, value)
+    return video
+
+
+def wait_for(condition, timeout=5.0):
+    """Wait until condition() is true."""
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def runner_classes(cls=FakeRunner):
+    """Yield FakeRunner and all its subclasses."""
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from runner_classes(subclass)
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_runners():
+    """Give every test empty runner commands and its own failures."""
+    failures = {}
+    for cls in runner_classes():
+        if "commands" in vars(cls):
+            cls.commands = []
+        if "failures" in vars(cls):
+            failures[cls] = cls.failures
+            cls.failures = dict(cls.failures)
+    yield
+    for cls, cls_failures in failures.items():
+        cls.failures = cls_failures
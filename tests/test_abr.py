@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_abr.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for abr.py module."""
+
+from pathlib import Path
+
+import pytest
+
+from videomorph.converter.abr import (
+    ABR_LADDER,
+    PACKAGING,
+    ABRJob,
+    ladder_cmd,
+    ladder_filter,
+    select_renditions,
+)
+from videomorph.converter.batch import ConversionError
+
+from .conftest import FakeRunner, fake_video
+
+
+class ABRRunner(FakeRunner):
+    """Runner writing the master playlist, even if the run fails."""
+
+    failures = {"broken": (1, "")}
+
+    def run(self, cmd, on_output=None, resources=None):
+        Path(cmd[-1]).parent.parent.joinpath("master.m3u8").touch()
+        return super().run(cmd, on_output, resources)
+
+
+def abr_video(video_path, height="720", audio=True):
+    """Return a probed video-like object."""
+    return fake_video(
+        video_path,
+        video_info={"height": height},
+        audio_info={"codec_name": "aac"} if audio else {},
+    )
+
+
+def make_job(tmp_path, video):
+    """Return an ABRJob of a fake video."""
+    return ABRJob(
+        video.path,
+        tmp_path / "out",
+        runner_factory=ABRRunner,
+        video_factory=lambda path: video,
+    )
+
+
+def test_select_renditions():
+    """Test select_renditions() skips the rungs above the source."""
+    names = [rendition.name for rendition in select_renditions(720)]
+    assert names == ["720p", "480p", "360p", "240p"]
+    # A cropped 1080p source gets the 1080p rung at its own height
+    assert select_renditions(1072)[0] == ABR_LADDER[0]._replace(height=1072)
+    assert select_renditions(145) == [ABR_LADDER[-1]._replace(height=144)]
+    with pytest.raises(ValueError):
+        select_renditions(0)
+
+
+def test_ladder_filter():
+    """Test ladder_filter() decodes once and scales every rendition."""
+    assert ladder_filter(select_renditions(480)) == (
+        "[0:v:0]split=3[v0][v1][v2];"
+        "[v0]scale=-2:480[v0out];"
+        "[v1]scale=-2:360[v1out];"
+        "[v2]scale=-2:240[v2out]"
+    )
+
+
+def test_ladder_cmd_hls():
+    """Test ladder_cmd() maps a variant per rendition."""
+    cmd = ladder_cmd("a.mp4", select_renditions(360), "/out%")
+    assert cmd.count("-i") == 1
+    assert cmd.count("0:a:0") == 2
+    assert cmd[cmd.index("-var_stream_map") + 1] == (
+        "v:0,a:0,name:360p v:1,a:1,name:240p"
+    )
+    assert cmd[-2:] == ["-y", "/out%%/%v/index.m3u8"]
+
+
+def test_ladder_cmd_dash_without_audio():
+    """Test ladder_cmd() packages DASH without an audio stream."""
+    cmd = ladder_cmd(
+        "a.mp4",
+        select_renditions(360),
+        "/out",
+        packaging=PACKAGING.dash,
+        has_audio=False,
+    )
+    assert "0:a:0" not in cmd
+    assert cmd[cmd.index("-adaptation_sets") + 1] == "id=0,streams=v"
+    assert cmd[-1] == "/out/manifest.mpd"
+    with pytest.raises(ValueError):
+        ladder_cmd("a.mp4", select_renditions(360), "/out", packaging="rtmp")
+
+
+def test_run(tmp_path):
+    """Test run() creates the variant directories and the playlist."""
+    job = make_job(tmp_path, abr_video(tmp_path / "a.mp4", height="480"))
+    progress = []
+    assert job.run(on_progress=progress.append) == job.playlist_path
+    assert job.playlist_path.exists()
+    assert sorted(path.name for path in job.output_dir.iterdir()) == [
+        "240p",
+        "360p",
+        "480p",
+        "master.m3u8",
+    ]
+    assert progress == [50, 100]
+
+
+def test_run_failure(tmp_path):
+    """Test run() removes the playlist of a failed ladder."""
+    job = make_job(tmp_path, abr_video(tmp_path / "broken.mp4"))
+    with pytest.raises(ConversionError):
+        job.run()
+    assert not job.playlist_path.exists()
+
+
+def test_unknown_resolution(tmp_path):
+    """Test renditions raises ValueError without a video height."""
+    job = make_job(tmp_path, abr_video(tmp_path / "a.mp4", height=None))
+    with pytest.raises(ValueError):
+        job.renditions
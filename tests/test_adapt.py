@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_adapt.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for adapt.py module."""
+
+from types import SimpleNamespace
+
+from videomorph.converter.adapt import (
+    adapt_params,
+    cap_size,
+    is_compliance_target,
+    parse_frame_rate,
+)
+
+MP4_PARAMS = ["-f", "mp4", "-r", "29.97", "-s", "704x384", "-b:v", "1000k"]
+
+
+def make_video(width, height, frame_rate):
+    """Return a video-like object with probe info."""
+    return SimpleNamespace(
+        video_info={"width": str(width), "height": str(height)},
+        frame_rate=frame_rate,
+    )
+
+
+def test_parse_frame_rate():
+    """Test parse_frame_rate()."""
+    assert round(parse_frame_rate("30000/1001"), 2) == 29.97
+    assert parse_frame_rate("25") == 25
+    assert parse_frame_rate("0/0") is None
+    assert parse_frame_rate("") is None
+
+
+def test_cap_size():
+    """Test cap_size() keeps the preset shape and even sides."""
+    assert cap_size("704x384", 1920, 1080) == "704x384"
+    assert cap_size("704x384", 640, 360) == "640x348"
+    assert cap_size("1280:720", 854, 480) == "852x480"
+    assert cap_size("hd720", 320, 240) == "hd720"
+
+
+def test_is_compliance_target():
+    """Test is_compliance_target()."""
+    assert is_compliance_target(["-f", "dvd", "-r", "25.00"])
+    assert is_compliance_target(["-target", "pal-vcd"])
+    assert not is_compliance_target(MP4_PARAMS)
+
+
+def test_adapt_params_small_source():
+    """Test adapt_params() caps the size and frame rate at the source."""
+    adapted = adapt_params(MP4_PARAMS, make_video(320, 240, "25/1"))
+    assert adapted == ["-f", "mp4", "-s", "320x174", "-b:v", "1000k"]
+
+
+def test_adapt_params_large_source():
+    """Test adapt_params() keeps the preset values for large sources."""
+    video = make_video(1920, 1080, "30000/1001")
+    assert adapt_params(MP4_PARAMS, video) == MP4_PARAMS
+
+
+def test_adapt_params_compliance_target():
+    """Test adapt_params() keeps the DVD values."""
+    params = ["-f", "dvd", "-target", "ntsc-dvd", "-r", "29.97"]
+    params += ["-s", "720x480"]
+    assert adapt_params(params, make_video(320, 240, "25/1")) == params
+
+
+def test_adapt_params_without_probe_info():
+    """Test adapt_params() keeps the preset values if probing failed."""
+    video = SimpleNamespace(video_info={}, frame_rate="")
+    assert adapt_params(MP4_PARAMS, video) == MP4_PARAMS
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_batch.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for batch.py module."""
+
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from videomorph.converter.batch import BatchConverter, ConversionError
+from videomorph.converter.errors import ERROR_KIND
+from videomorph.converter.resources import ResourcePolicy
+from videomorph.converter.split import SplitLimits
+
+from .conftest import PROGRESS_LINE, FakeProfile, FakeRunner, fake_video
+
+
+class BatchRunner(FakeRunner):
+    """Runner emitting two progress lines."""
+
+    lines = (PROGRESS_LINE.format(1), PROGRESS_LINE.format(2))
+    failures = {
+        "full": (1, "av_interleaved_write_frame(): No space left on device"),
+        "broken": (1, PROGRESS_LINE.format(1)),
+    }
+
+
+class GatedRunner(BatchRunner):
+    """Runner failing broken inputs only after another job started."""
+
+    started = threading.Event()
+
+    def run(self, cmd, on_output=None, resources=None):
+        if "broken" in cmd[1]:
+            self.started.wait(5)
+        else:
+            self.started.set()
+        return super().run(cmd, on_output, resources)
+
+
+def video_factory(video_path):
+    """Return a fake video of 4 seconds."""
+    return fake_video(video_path, duration="4.0")
+
+
+def make_converter():
+    """Return a BatchConverter using fakes."""
+    return BatchConverter(
+        max_workers=2,
+        profile_factory=FakeProfile,
+        runner_factory=BatchRunner,
+        video_factory=video_factory,
+    )
+
+
+def test_submit_returns_output_path(tmp_path):
+    """Test BatchConverter.submit() resolves to the output path."""
+    video = tmp_path / "a.mov"
+    video.touch()
+    progress = []
+    with make_converter() as converter:
+        future = converter.submit(
+            video,
+            "Q",
+            tmp_path,
+            on_progress=lambda path, percent: progress.append(percent),
+        )
+        assert future.result() == str(tmp_path / "a.mp4")
+    assert progress == [25, 50, 100]
+
+
+def test_submit_failure(tmp_path):
+    """Test a failed conversion raises ConversionError."""
+    video = tmp_path / "broken.mov"
+    video.touch()
+    with make_converter() as converter:
+        future = converter.submit(video, "Q", tmp_path)
+        with pytest.raises(ConversionError):
+            future.result()
+
+
+def test_submit_fatal_error(tmp_path):
+    """Test a fatal library error kills the job and is classified."""
+    video = tmp_path / "full.mov"
+    video.touch()
+    with make_converter() as converter:
+        future = converter.submit(video, "Q", tmp_path)
+        with pytest.raises(ConversionError) as error:
+            future.result()
+    assert error.value.exit_code == -9
+    assert error.value.error.kind == ERROR_KIND.no_space
+
+
+def test_runner_after_cancel(tmp_path):
+    """Test a job reaching its runner after a cancel doesn't run."""
+    video = tmp_path / "a.mov"
+    video.touch()
+
+    def cancelling_runner():
+        # Cancel while the job is between setup and run
+        converter.shutdown(wait=False, cancel=True)
+        return BatchRunner()
+
+    converter = BatchConverter(
+        max_workers=1,
+        profile_factory=FakeProfile,
+        runner_factory=cancelling_runner,
+        video_factory=video_factory,
+    )
+    future = converter.submit(video, "Q", tmp_path)
+    with pytest.raises(CancelledError):
+        future.result()
+    assert not BatchRunner.commands
+
+
+def test_submit_with_split(tmp_path):
+    """Test BatchConverter.submit() resolves to the parts of a split."""
+    video = tmp_path / "a.mov"
+    video.touch()
+    (tmp_path / "a.mp4").touch()
+    with BatchConverter(
+        profile_factory=FakeProfile,
+        runner_factory=BatchRunner,
+        video_factory=video_factory,
+        split=SplitLimits(None, 10),
+    ) as converter:
+        future = converter.submit(video, "Q", tmp_path)
+        assert future.result() == [str(tmp_path / "a.mp4")]
+
+
+def test_failure_with_mixed_qualities(tmp_path):
+    """Test a failed job never deletes its input, whatever runs next."""
+    broken = tmp_path / "broken.mp4"
+    broken.touch()
+    video = tmp_path / "a.mov"
+    video.touch()
+    GatedRunner.started.clear()
+    with BatchConverter(
+        max_workers=2,
+        profile_factory=FakeProfile,
+        runner_factory=GatedRunner,
+        video_factory=video_factory,
+    ) as converter:
+        failing = converter.submit(broken, "W", tmp_path)
+        converter.submit(video, "Q", tmp_path).result()
+        with pytest.raises(ConversionError):
+            failing.result()
+    assert broken.exists()
+
+
+class PolicyRunner(BatchRunner):
+    """Runner recording the resources of every run."""
+
+    policies = []
+
+    def run(self, cmd, on_output=None, resources=None):
+        self.policies.append(resources)
+        return super().run(cmd, on_output, resources)
+
+
+def test_preset_resources(tmp_path):
+    """Test every job runs with the policy of its target quality."""
+    preset = ResourcePolicy(nice=19)
+    videos = [tmp_path / "a.mov", tmp_path / "b.mov"]
+    for video in videos:
+        video.touch()
+    PolicyRunner.policies = []
+    with BatchConverter(
+        max_workers=2,
+        profile_factory=FakeProfile,
+        runner_factory=PolicyRunner,
+        video_factory=video_factory,
+        preset_resources={"W": preset},
+        pin_cpus=True,
+    ) as converter:
+        converter.submit(videos[0], "W", tmp_path).result()
+        converter.submit(videos[1], "Q", tmp_path).result()
+    assert PolicyRunner.policies[0] is preset
+    assert PolicyRunner.policies[1].cpus
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_cache.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for cache.py module."""
+
+import errno
+import os
+
+from videomorph.converter import cache as cache_module
+from videomorph.converter.cache import OutputCache
+
+
+def make_cache(tmp_path, max_bytes=100):
+    """Return an OutputCache in a temporary directory."""
+    return OutputCache(
+        tmp_path / "cache", max_bytes=max_bytes, version="ffmpeg 6.0"
+    )
+
+
+def cmd(input_path, output_path):
+    """Return a conversion command."""
+    return ["-i", str(input_path), "-an", "-y", str(output_path)]
+
+
+def test_key_ignores_paths(tmp_path):
+    """Test the same content and args give the same key."""
+    (tmp_path / "a.mov").write_bytes(b"clip")
+    (tmp_path / "b.mov").write_bytes(b"clip")
+    (tmp_path / "c.mov").write_bytes(b"other")
+    cache = make_cache(tmp_path)
+
+    key = cache.key(
+        cmd(tmp_path / "a.mov", "x.mp4"), tmp_path / "a.mov", "x.mp4"
+    )
+    assert key == cache.key(
+        cmd(tmp_path / "b.mov", "y.mp4"), tmp_path / "b.mov", "y.mp4"
+    )
+    assert key != cache.key(
+        cmd(tmp_path / "c.mov", "x.mp4"), tmp_path / "c.mov", "x.mp4"
+    )
+    assert key != OutputCache(tmp_path, version="ffmpeg 7.0").key(
+        cmd(tmp_path / "a.mov", "x.mp4"), tmp_path / "a.mov", "x.mp4"
+    )
+
+
+def test_key_follows_sidecars(tmp_path):
+    """Test an edited subtitle sidecar changes the key, its path doesn't."""
+    (tmp_path / "a.mov").write_bytes(b"clip")
+    (tmp_path / "b.mov").write_bytes(b"clip")
+    cache = make_cache(tmp_path)
+
+    def subtitle_key(name):
+        video = tmp_path / (name + ".mov")
+        sidecar = tmp_path / (name + ".srt")
+        args = cmd(video, name + ".mp4")
+        args[2:2] = ["-vf", "subtitles='{0}'".format(sidecar)]
+        return cache.key(args, video, name + ".mp4", sidecars=[sidecar])
+
+    (tmp_path / "a.srt").write_bytes(b"1\nHello")
+    (tmp_path / "b.srt").write_bytes(b"1\nHello")
+    key = subtitle_key("a")
+    assert key == subtitle_key("b")
+    (tmp_path / "a.srt").write_bytes(b"1\nHello, world")
+    assert key != subtitle_key("a")
+
+
+def test_store_and_fetch(tmp_path):
+    """Test a stored output is fetched to another path."""
+    cache = make_cache(tmp_path)
+    (tmp_path / "out.mp4").write_bytes(b"converted")
+    assert not cache.fetch("ab12", tmp_path / "copy.mp4")
+
+    cache.store("ab12", tmp_path / "out.mp4")
+    assert cache.fetch("ab12", tmp_path / "copy.mp4")
+    assert (tmp_path / "copy.mp4").read_bytes() == b"converted"
+
+
+def test_store_failure(tmp_path, monkeypatch, caplog):
+    """Test a failed store() leaves no entry and no temporary file."""
+
+    def clone_file(source, target, link=True):
+        with open(target, "wb") as target_file:
+            target_file.write(b"conv")
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    cache = make_cache(tmp_path)
+    (tmp_path / "out.mp4").write_bytes(b"converted")
+    monkeypatch.setattr(cache_module, "clone_file", clone_file)
+    assert not cache.store("ab12", tmp_path / "out.mp4")
+    assert "not cached" in caplog.text
+    assert list(cache.entry_path("ab12").parent.iterdir()) == []
+    assert (tmp_path / "out.mp4").read_bytes() == b"converted"
+    # A failed fetch is a miss
+    cache.entry_path("ab12").write_bytes(b"converted")
+    assert not cache.fetch("ab12", tmp_path / "copy.mp4")
+
+
+def test_prepare_unlinks_shared_outputs(tmp_path):
+    """Test prepare() breaks a hard link before an overwrite."""
+    cache = make_cache(tmp_path)
+    (tmp_path / "out.mp4").write_bytes(b"converted")
+    os.link(tmp_path / "out.mp4", tmp_path / "link.mp4")
+    cache.prepare(tmp_path / "link.mp4")
+    assert not (tmp_path / "link.mp4").exists()
+    assert (tmp_path / "out.mp4").exists()
+
+
+def test_lru_eviction(tmp_path):
+    """Test the least recently used entries are evicted."""
+    cache = make_cache(tmp_path, max_bytes=20)
+    (tmp_path / "out.mp4").write_bytes(b"x" * 10)
+    cache.store("aa01", tmp_path / "out.mp4")
+    os.utime(cache.entry_path("aa01"), (1, 1))
+    cache.store("bb02", tmp_path / "out.mp4")
+    os.utime(cache.entry_path("bb02"), (2, 2))
+    # A hit makes aa01 the most recently used entry
+    assert cache.fetch("aa01", tmp_path / "hit.mp4")
+    cache.store("cc03", tmp_path / "out.mp4")
+
+    assert cache.entry_path("aa01").exists()
+    assert not cache.entry_path("bb02").exists()
+    assert cache.entry_path("cc03").exists()
+    assert cache.size == 20
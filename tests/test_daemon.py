@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_daemon.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for daemon.py module."""
+
+import json
+import socket
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from videomorph.converter import JOB_STATUS
+from videomorph.converter.daemon import JobServer, create_job_server
+
+from .conftest import FakeProfile, FakeRunner, fake_video, wait_for
+
+
+class DaemonRunner(FakeRunner):
+    """Runner waiting until it is released or terminated."""
+
+    release = threading.Event()
+    commands = []
+
+
+def make_server(tmp_path, max_jobs=1):
+    """Return a started JobServer and some input videos."""
+    job_server = JobServer(
+        profile=FakeProfile(),
+        runner_factory=DaemonRunner,
+        video_factory=fake_video,
+        log_dir=tmp_path / "logs",
+    )
+    job_server.scheduler.max_jobs = max_jobs
+    job_server.scheduler.device_limit = max_jobs
+    videos = []
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        video = tmp_path / name
+        video.touch()
+        videos.append(video)
+    return job_server, videos
+
+
+def test_priority_and_cancel(tmp_path):
+    """Test higher priority jobs run first and jobs can be cancelled."""
+    DaemonRunner.release.clear()
+    job_server, videos = make_server(tmp_path)
+    first = job_server.submit(videos[0], "Q", tmp_path)
+    second = job_server.submit(videos[1], "Q", tmp_path)
+    urgent = job_server.submit(videos[2], "Q", tmp_path, priority=5)
+    job_server.start()
+    try:
+        assert wait_for(
+            lambda: job_server.job(urgent)["status"] == JOB_STATUS.running
+        )
+        job_server.cancel(second)
+        job_server.cancel(urgent)
+        assert wait_for(
+            lambda: job_server.job(first)["status"] == JOB_STATUS.running
+        )
+        DaemonRunner.release.set()
+        assert wait_for(
+            lambda: job_server.job(first)["status"] == JOB_STATUS.done
+        )
+        assert job_server.job(second)["status"] == JOB_STATUS.cancelled
+        assert job_server.job(urgent)["status"] == JOB_STATUS.cancelled
+        assert job_server.stats()["statuses"][JOB_STATUS.done] == 1
+    finally:
+        job_server.stop()
+
+
+def test_shared_input_single_run(tmp_path):
+    """Test queued jobs sharing an input run in one process."""
+    DaemonRunner.release.set()
+    DaemonRunner.commands.clear()
+    job_server, videos = make_server(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    mp4 = job_server.submit(videos[0], "Q", output_dir)
+    webm = job_server.submit(videos[0], "W", output_dir)
+    job_server.start()
+    try:
+        assert wait_for(
+            lambda: all(
+                job_server.job(job_id)["status"] == JOB_STATUS.done
+                for job_id in (mp4, webm)
+            )
+        )
+    finally:
+        job_server.stop()
+
+    assert len(DaemonRunner.commands) == 1
+    cmd = DaemonRunner.commands[0]
+    assert cmd.count("-i") == 1
+    assert str(output_dir / "a.mp4") in cmd
+    assert cmd[-1] == str(output_dir / "a.webm")
+    assert job_server.job(mp4)["run_with"] == [webm]
+    assert job_server.job(webm)["progress"] == 100
+
+
+def test_http_api(tmp_path):
+    """Test the JSON API and the progress page."""
+    DaemonRunner.release.set()
+    job_server, videos = make_server(tmp_path, max_jobs=2)
+    server = create_job_server(job_server, token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    job_server.start()
+    url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    try:
+        body = json.dumps(
+            dict(
+                video_path=str(videos[0]),
+                target_quality="Q",
+                output_dir=str(tmp_path),
+            )
+        ).encode("utf-8")
+        for headers, code in (
+            # A form POST of a web page
+            ({"Content-Type": "text/plain"}, 415),
+            ({"Content-Type": "application/json"}, 401),
+            (
+                {
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer wrong",
+                },
+                401,
+            ),
+        ):
+            with pytest.raises(HTTPError) as error:
+                urlopen(Request(url + "/jobs", data=body, headers=headers))
+            assert error.value.code == code
+        assert not job_server.jobs()
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer secret",
+        }
+        request = Request(url + "/jobs", data=body, headers=headers)
+        with urlopen(request) as response:
+            job_id = json.loads(response.read())["id"]
+        assert wait_for(
+            lambda: job_server.job(job_id)["status"] == JOB_STATUS.done
+        )
+        with urlopen(url + "/jobs/" + job_id) as response:
+            assert json.loads(response.read())["progress"] == 100
+        with urlopen(url + "/") as response:
+            assert b"a.mp4" in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+        job_server.stop()
+
+
+def test_cancel_deletes_own_output(tmp_path):
+    """Test cancelling a job deletes its output, never another file."""
+    DaemonRunner.release.clear()
+    job_server, videos = make_server(tmp_path, max_jobs=2)
+    webm = job_server.submit(videos[0], "W", tmp_path)
+    mp4 = job_server.submit(videos[1], "Q", tmp_path)
+    job_server.start()
+    try:
+        assert wait_for(
+            lambda: all(
+                job_server.job(job_id)["status"] == JOB_STATUS.running
+                for job_id in (webm, mp4)
+            )
+        )
+        partial = tmp_path / "a.webm"
+        partial.touch()
+        assert job_server.job(webm)["output_path"] == str(partial)
+        job_server.cancel(webm)
+        assert wait_for(lambda: not partial.exists())
+    finally:
+        DaemonRunner.release.set()
+        job_server.stop()
+    assert videos[0].exists()
+
+
+def test_socket_path_not_a_socket(tmp_path):
+    """Test create_job_server() refuses to replace a regular file."""
+    job_server, _ = make_server(tmp_path)
+    path = tmp_path / "important.txt"
+    path.write_text("data")
+    with pytest.raises(FileExistsError):
+        create_job_server(job_server, socket_path=str(path))
+    assert path.read_text() == "data"
+
+
+def test_stale_socket_replaced(tmp_path):
+    """Test create_job_server() replaces the socket of a previous run."""
+    job_server, _ = make_server(tmp_path)
+    path = str(tmp_path / "daemon.sock")
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    server = create_job_server(job_server, socket_path=path)
+    try:
+        assert server.token is None
+    finally:
+        server.server_close()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_distributed.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for distributed.py module."""
+
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from videomorph.converter.errors import ERROR_KIND
+from videomorph.converter.distributed import (
+    JOB_STATUS,
+    Coordinator,
+    CoordinatorClient,
+    LeaseLostError,
+    Worker,
+    attempt_path,
+    create_coordinator_server,
+)
+
+
+class FakeClock:
+    """Manually driven clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRunner:
+    """Runner that writes its output after a delay, with an exit code."""
+
+    def __init__(self, exit_code=0, delay=0, output=""):
+        self.exit_code = exit_code
+        self.delay = delay
+        self.output = output
+        self.commands = []
+        self.killed = False
+
+    def run(self, cmd, on_output=None, resources=None):
+        self.commands.append(cmd)
+        on_output("frame=1 size=1kB time=00:00:01.00 bitrate=1kbits/s")
+        if self.output:
+            on_output(self.output)
+        time.sleep(self.delay)
+        Path(cmd[-1]).write_bytes(b"converted")
+        return -9 if self.killed else self.exit_code
+
+    def kill(self):
+        self.killed = True
+
+
+class FakeClient:
+    """Client leasing one job, recording the reports."""
+
+    def __init__(self, output_dir, lease_errors=0, finish_error=None):
+        self.jobs = [
+            dict(
+                id="j1",
+                video_path="a.mov",
+                target_quality="MP4",
+                output_dir=str(output_dir),
+                tagged=False,
+                subtitle=False,
+                attempts=1,
+            )
+        ]
+        self.lease_errors = lease_errors
+        self.finish_error = finish_error
+        self.reports = []
+
+    def lease(self, worker):
+        if self.lease_errors:
+            self.lease_errors -= 1
+            raise URLError("Connection refused")
+        return self.jobs.pop() if self.jobs else None
+
+    def progress(self, job_id, worker, progress):
+        self.reports.append(("progress", progress))
+
+    def finish(self, job_id, worker, status, error=None, error_kind=None):
+        if self.finish_error is not None:
+            raise self.finish_error
+        self.reports.append(("finish", status))
+        self.error_kind = error_kind
+
+
+def fake_task_factory(video_path, output_dir):
+    """Return a task-like object building a trivial command."""
+    output_path = str(Path(output_dir, Path(video_path).stem + ".mp4"))
+    return SimpleNamespace(
+        video=SimpleNamespace(format_info={"duration": "2.0"}),
+        build_conversion_cmd=lambda **kwargs: [
+            "-i",
+            video_path,
+            "-y",
+            output_path,
+        ],
+        get_output_path=lambda tagged: output_path,
+    )
+
+
+def make_worker(client, runner, heartbeat=60):
+    """Return a Worker of fakes."""
+    return Worker(
+        client,
+        name="w1",
+        runner=runner,
+        task_factory=fake_task_factory,
+        heartbeat=heartbeat,
+    )
+
+
+def test_lease_and_finish():
+    """Test a job goes through lease and finish."""
+    coordinator = Coordinator()
+    job_id = coordinator.submit("a.mp4", "MP4", "/out")
+    job = coordinator.lease("w1")
+    assert job["id"] == job_id
+    assert coordinator.lease("w2") is None
+    with pytest.raises(ValueError):
+        coordinator.finish(job_id, "w1", "bogus")
+    coordinator.finish(job_id, "w1", JOB_STATUS.done)
+    assert coordinator.jobs()[0]["status"] == JOB_STATUS.done
+
+
+def test_expired_lease_is_requeued():
+    """Test a dead worker's job goes back to the queue."""
+    clock = FakeClock()
+    coordinator = Coordinator(lease_timeout=10, clock=clock)
+    job_id = coordinator.submit("a.mp4", "MP4", "/out")
+    coordinator.lease("dead")
+    clock.now = 11
+    assert coordinator.lease("alive")["id"] == job_id
+    with pytest.raises(LeaseLostError):
+        coordinator.progress(job_id, "dead", 50)
+
+
+def test_progress_renews_lease():
+    """Test progress reports keep the lease alive."""
+    clock = FakeClock()
+    coordinator = Coordinator(lease_timeout=10, clock=clock)
+    job_id = coordinator.submit("a.mp4", "MP4", "/out")
+    coordinator.lease("w1")
+    clock.now = 8
+    coordinator.progress(job_id, "w1", 40)
+    clock.now = 15
+    assert coordinator.lease("w2") is None
+
+
+def test_worker_local_path():
+    """Test Worker.local_path() maps shared storage prefixes."""
+    worker = Worker(client=None, name="w", path_map={"/mnt/nas": "/nas"})
+    assert worker.local_path("/mnt/nas/a.mp4") == "/nas/a.mp4"
+    assert worker.local_path("/mnt/nasty/a.mp4") == "/mnt/nasty/a.mp4"
+
+
+def test_workers_over_http(tmp_path):
+    """Test several workers drain a queue served over HTTP."""
+    server = create_coordinator_server(token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    try:
+        with pytest.raises(HTTPError) as error:
+            CoordinatorClient(url, "wrong").submit("a.mp4", "MP4", "/out")
+        assert error.value.code == 401
+        client = CoordinatorClient(url, "secret")
+        for name in ("a.mp4", "b.mp4", "c.mp4"):
+            client.submit(name, "MP4", str(tmp_path))
+
+        workers = [
+            Worker(
+                CoordinatorClient(url, "secret"),
+                name="w{0}".format(i),
+                runner=FakeRunner(exit_code=i),
+                task_factory=fake_task_factory,
+                heartbeat=0.01,
+            )
+            for i in range(2)
+        ]
+        threads = [
+            threading.Thread(target=w.run, kwargs={"exit_when_idle": True})
+            for w in workers
+        ]
+        for worker_thread in threads:
+            worker_thread.start()
+        for worker_thread in threads:
+            worker_thread.join(timeout=10)
+
+        statuses = {job["status"] for job in client.jobs()}
+        assert statuses <= {JOB_STATUS.done, JOB_STATUS.failed}
+        assert sum(len(w.runner.commands) for w in workers) == 3
+        done = [
+            Path(job["video_path"]).stem + ".mp4"
+            for job in client.jobs()
+            if job["status"] == JOB_STATUS.done
+        ]
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(done)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_worker_survives_network_errors(tmp_path):
+    """Test an unreachable coordinator doesn't stop the worker."""
+    client = FakeClient(tmp_path, lease_errors=2)
+    worker = make_worker(client, FakeRunner())
+    worker.run(poll_interval=0, exit_when_idle=True)
+    assert client.reports == [("finish", JOB_STATUS.done)]
+    assert (tmp_path / "a.mp4").read_bytes() == b"converted"
+    assert not attempt_path(tmp_path / "a.mp4", "w1", 1).exists()
+
+
+def test_worker_heartbeat_on_timer(tmp_path):
+    """Test a run without output still renews its lease."""
+    client = FakeClient(tmp_path)
+    worker = make_worker(client, FakeRunner(delay=0.2), heartbeat=0.02)
+    worker.run(exit_when_idle=True)
+    assert ("progress", 50) in client.reports
+
+
+def test_worker_lost_lease_keeps_output(tmp_path):
+    """Test a worker that lost its lease never writes the output."""
+    (tmp_path / "a.mp4").write_bytes(b"new leaseholder")
+    client = FakeClient(tmp_path, finish_error=LeaseLostError("j1"))
+    runner = FakeRunner()
+    make_worker(client, runner).run(exit_when_idle=True)
+    assert runner.commands[0][-1] == str(
+        attempt_path(tmp_path / "a.mp4", "w1", 1)
+    )
+    assert (tmp_path / "a.mp4").read_bytes() == b"new leaseholder"
+    assert list(tmp_path.iterdir()) == [tmp_path / "a.mp4"]
+
+
+def test_worker_classifies_errors(tmp_path):
+    """Test a fatal library error kills the job and is classified."""
+    client = FakeClient(tmp_path)
+    runner = FakeRunner(output="Unknown encoder 'libx264'\n")
+    worker = make_worker(client, runner)
+    worker._log_dir = tmp_path / "logs"
+    worker.run(exit_when_idle=True)
+    assert runner.killed
+    assert client.reports[-1] == ("finish", JOB_STATUS.failed)
+    assert client.error_kind == ERROR_KIND.missing_encoder
+    assert list((tmp_path / "logs").iterdir())
+    assert list(tmp_path.iterdir()) == [tmp_path / "logs"]
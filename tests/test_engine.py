@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_engine.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for engine.py module."""
+
+import asyncio
+import sys
+
+from videomorph.converter import JOB_STATUS
+from videomorph.converter.engine import (
+    EVENT,
+    ConversionEngine,
+    EngineJob,
+    ThreadedEngine,
+)
+
+SCRIPT = (
+    "import sys, time\n"
+    "for second in range(1, 3):\n"
+    "    sys.stderr.write('size=1kB time=00:00:0%d.00 \\r' % second)\n"
+    "    sys.stderr.flush()\n"
+    "sys.exit(int(sys.argv[1]))\n"
+)
+
+
+def python_engine(**kwargs):
+    """Return an engine running the Python interpreter as library."""
+    return ConversionEngine(library_path=sys.executable, **kwargs)
+
+
+def test_run_job_events():
+    """Test a job emits started, progress and finished events."""
+    engine = python_engine()
+    events = []
+    engine.add_listener(events.append)
+    job = EngineJob(cmd=["-c", SCRIPT, "0"], duration=2.0)
+
+    exit_code = asyncio.run(engine.run_job(job))
+
+    kinds = [event.kind for event in events]
+    assert exit_code == 0
+    assert kinds[0] == EVENT.started and kinds[-1] == EVENT.finished
+    assert EVENT.progress in kinds
+    assert job.status == JOB_STATUS.done and job.progress == 100
+
+
+def test_failed_job():
+    """Test a non zero exit code marks the job as failed."""
+    job = EngineJob(cmd=["-c", SCRIPT, "3"])
+    assert asyncio.run(python_engine().run_job(job)) == 3
+    assert job.status == JOB_STATUS.failed
+
+
+def test_max_jobs_and_cancel():
+    """Test queued jobs can be cancelled before they start."""
+    engine = python_engine(max_jobs=1)
+    slow = EngineJob(cmd=["-c", "import time; time.sleep(0.2)"])
+    queued = EngineJob(cmd=["-c", SCRIPT, "0"])
+
+    async def scenario():
+        engine.submit(slow)
+        engine.submit(queued)
+        await asyncio.sleep(0)
+        engine.cancel(queued.id)
+        await engine.join()
+
+    asyncio.run(scenario())
+    assert slow.status == JOB_STATUS.done
+    assert queued.status == JOB_STATUS.cancelled
+    assert queued.pid is None
+
+
+def test_threaded_engine():
+    """Test ThreadedEngine.run() from a plain thread."""
+    engine = ThreadedEngine(python_engine())
+    try:
+        assert engine.run(EngineJob(cmd=["-c", SCRIPT, "0"]), timeout=10) == 0
+    finally:
+        engine.close()
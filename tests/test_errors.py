@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_errors.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for errors.py module."""
+
+from videomorph.converter.errors import (
+    ERROR_ACTION,
+    ERROR_KIND,
+    LibraryError,
+    classify_exit,
+    classify_output,
+    error_action,
+    merge_errors,
+)
+
+
+def test_classify_output_none():
+    """Test classify_output() without errors."""
+    assert classify_output("frame=  10 time=00:00:01.00") is None
+    assert classify_output(None) is None
+
+
+def test_classify_output_kinds():
+    """Test classify_output() finds every error kind."""
+    assert classify_output("Unknown encoder 'libfoo'").kind == (
+        ERROR_KIND.missing_encoder
+    )
+    assert classify_output("Unrecognized option 'bar'.").kind == (
+        ERROR_KIND.bad_option
+    )
+    assert classify_output("out.mp4: Permission denied").kind == (
+        ERROR_KIND.io_error
+    )
+    assert classify_output("in.mp4: moov atom not found").kind == (
+        ERROR_KIND.corrupt_input
+    )
+    assert classify_output("No space left on device").kind == (
+        ERROR_KIND.no_space
+    )
+
+
+def test_classify_output_prefers_fatal():
+    """Test classify_output() returns a fatal error before a warning."""
+    error = classify_output(
+        "Error while decoding stream #0:0\nNo space left on device"
+    )
+    assert error == LibraryError(
+        ERROR_KIND.no_space, "No space left on device", True
+    )
+
+
+def test_merge_errors():
+    """Test merge_errors() never replaces a fatal error."""
+    warning = LibraryError(ERROR_KIND.corrupt_input, "warning", False)
+    fatal = LibraryError(ERROR_KIND.io_error, "fatal", True)
+    assert merge_errors(None, warning) == warning
+    assert merge_errors(warning, None) == warning
+    assert merge_errors(warning, fatal) == fatal
+    assert merge_errors(fatal, warning) == fatal
+
+
+def test_classify_exit():
+    """Test classify_exit() with several exit codes."""
+    warning = LibraryError(ERROR_KIND.corrupt_input, "warning", False)
+    assert classify_exit(0, warning) is None
+    assert classify_exit(1, warning) == warning._replace(fatal=True)
+    assert classify_exit(-9).kind == ERROR_KIND.crashed
+    assert classify_exit(None).kind == ERROR_KIND.crashed
+    assert classify_exit(1).kind == ERROR_KIND.unknown
+
+
+def test_error_action():
+    """Test error_action() for each category."""
+    assert error_action(classify_exit(1)) == ERROR_ACTION.skip_task
+    assert error_action(classify_output("Unknown encoder")) == (
+        ERROR_ACTION.skip_quality
+    )
+    assert error_action(classify_output("No space left on device")) == (
+        ERROR_ACTION.stop_queue
+    )
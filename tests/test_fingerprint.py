@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_fingerprint.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for fingerprint.py module."""
+
+from types import SimpleNamespace
+
+from videomorph.converter import tasklist
+from videomorph.converter.fingerprint import (
+    fast_fingerprint,
+    full_hash,
+    full_hash_in_background,
+)
+from videomorph.converter.tasklist import TaskList
+
+
+def test_fast_fingerprint_small_file(tmp_path):
+    """Test small files are fingerprinted by their whole content."""
+    (tmp_path / "a").write_bytes(b"clip")
+    (tmp_path / "b").write_bytes(b"clip")
+    (tmp_path / "c").write_bytes(b"clap")
+    assert fast_fingerprint(tmp_path / "a") == fast_fingerprint(tmp_path / "b")
+    assert fast_fingerprint(tmp_path / "a") != fast_fingerprint(tmp_path / "c")
+    assert fast_fingerprint(tmp_path / "a").startswith("4:")
+
+
+def test_fast_fingerprint_windows(tmp_path):
+    """Test only the head, middle and tail windows are read."""
+    data = bytearray(b"x" * 100)
+    (tmp_path / "a").write_bytes(data)
+    data[10] = ord("y")  # Between the head and the middle window
+    (tmp_path / "b").write_bytes(data)
+    data[50] = ord("y")  # Inside the middle window
+    (tmp_path / "c").write_bytes(data)
+
+    def fingerprint(name):
+        return fast_fingerprint(tmp_path / name, window=8)
+
+    assert fingerprint("a") == fingerprint("b")
+    assert fingerprint("b") != fingerprint("c")
+
+
+def test_full_hash_in_background(tmp_path):
+    """Test the background full hash."""
+    (tmp_path / "a").write_bytes(b"clip")
+    future = full_hash_in_background(tmp_path / "a")
+    assert future.result(timeout=5) == full_hash(tmp_path / "a")
+    # The file is read once
+    assert full_hash_in_background(tmp_path / "a") is future
+
+
+def make_task_list(video_path):
+    """Return a TaskList holding a task of a video."""
+    task_list = TaskList(profile=None, output_dir=video_path.parent)
+    task_list.append(
+        SimpleNamespace(
+            video=SimpleNamespace(
+                path=video_path, fingerprint=fast_fingerprint(video_path)
+            )
+        )
+    )
+    return task_list
+
+
+def test_task_is_added_by_content(tmp_path):
+    """Test links and copies of a listed video are found."""
+    (tmp_path / "a.mov").write_bytes(b"clip")
+    (tmp_path / "copy.mov").write_bytes(b"clip")
+    (tmp_path / "other.mov").write_bytes(b"clap")
+    (tmp_path / "link.mov").symlink_to(tmp_path / "a.mov")
+    task_list = make_task_list(tmp_path / "a.mov")
+
+    assert task_list.task_is_added(str(tmp_path / "a.mov"))
+    assert task_list.task_is_added(str(tmp_path / "link.mov"))
+    assert task_list.task_is_added(str(tmp_path / "copy.mov"))
+    assert not task_list.task_is_added(str(tmp_path / "other.mov"))
+    assert not task_list.task_is_added(str(tmp_path / "missing.mov"))
+
+
+def test_task_is_added_by_full_hash(tmp_path):
+    """Test the full hash tells apart files with the same windows."""
+    data = bytearray(5 * 1024**2)
+    (tmp_path / "a.mov").write_bytes(data)
+    (tmp_path / "copy.mov").write_bytes(data)
+    # Between the head and the middle window
+    data[3 * 1024**2 // 2] = 1
+    (tmp_path / "edited.mov").write_bytes(data)
+    task_list = make_task_list(tmp_path / "a.mov")
+    assert task_list.task_is_added(str(tmp_path / "edited.mov"))
+    task_list.full_hash = True
+    assert task_list.task_is_added(str(tmp_path / "copy.mov"))
+    assert not task_list.task_is_added(str(tmp_path / "edited.mov"))
+
+
+def test_task_is_added_unreadable(tmp_path, monkeypatch):
+    """Test an unreadable file is not a duplicate."""
+
+    def fast_fingerprint(path):
+        raise PermissionError("Permission denied")
+
+    (tmp_path / "a.mov").write_bytes(b"clip")
+    (tmp_path / "b.mov").write_bytes(b"clip")
+    task_list = make_task_list(tmp_path / "a.mov")
+    monkeypatch.setattr(tasklist, "fast_fingerprint", fast_fingerprint)
+    assert not task_list.task_is_added(str(tmp_path / "b.mov"))
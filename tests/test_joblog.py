@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_joblog.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for joblog.py module."""
+
+import gzip
+import os
+
+from videomorph.converter.joblog import JobLog, log_name, prune_logs
+
+
+def test_tail_collapses_progress_lines(tmp_path):
+    """Test JobLog.tail() keeps only the latest progress line."""
+    with JobLog(tmp_path / "job.log", tail_lines=3) as log:
+        log.write("Input #0, mov\n")
+        log.write("frame=  1 size=1kB time=00:00:01.00\r")
+        log.write("frame=  2 size=2kB time=00:00:02.00\r")
+        log.write("Error while decoding\n")
+        assert log.tail() == [
+            "Input #0, mov",
+            "frame=  2 size=2kB time=00:00:02.00",
+            "Error while decoding",
+        ]
+
+
+def test_tail_is_bounded():
+    """Test JobLog keeps a bounded number of lines in memory."""
+    log = JobLog(None, tail_lines=2)
+    log.write("one\ntwo\nthree\n")
+    assert log.tail() == ["two", "three"]
+
+
+def test_rotation(tmp_path):
+    """Test JobLog rotates and compresses the log file."""
+    path = tmp_path / "job.log"
+    with JobLog(path, max_bytes=10, backup_count=2) as log:
+        log.write("a" * 10 + "\n")
+        log.write("b" * 10 + "\n")
+        log.write("c" * 10 + "\n")
+
+    with gzip.open(str(path) + ".1.gz", "rt") as backup:
+        assert backup.read() == "c" * 10 + "\n"
+    with gzip.open(str(path) + ".2.gz", "rt") as backup:
+        assert backup.read() == "b" * 10 + "\n"
+    assert path.read_text() == ""
+
+
+def test_log_name_is_unique():
+    """Test log_name() differs for jobs of a video in the same second."""
+    names = {log_name("/videos/a.mov") for _ in range(3)}
+    assert len(names) == 3
+    assert all(name.startswith("a-") for name in names)
+
+
+def test_prune_logs(tmp_path):
+    """Test prune_logs() deletes the oldest logs over the limits."""
+    for age, name in enumerate(("new.log", "old.log.1.gz", "older.log")):
+        path = tmp_path / name
+        path.write_text("x" * 10)
+        os.utime(path, (1000 - age, 1000 - age))
+    (tmp_path / "notes.txt").write_text("x" * 100)
+
+    prune_logs(tmp_path, max_files=2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "new.log",
+        "notes.txt",
+        "old.log.1.gz",
+    ]
+    prune_logs(tmp_path, max_bytes=15)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "new.log",
+        "notes.txt",
+    ]
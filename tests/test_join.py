@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_join.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for join.py module."""
+
+from pathlib import Path
+
+import pytest
+
+from videomorph.converter.batch import ConversionError
+from videomorph.converter.join import JoinJob, concat_list
+
+from .conftest import (
+    PROGRESS_LINE,
+    FakeProfile,
+    FakeQuality,
+    FakeRunner,
+    fake_video,
+)
+
+
+class JoinRunner(FakeRunner):
+    """Runner writing the output, failing stream copies of bad inputs."""
+
+    commands = []
+    lines = (PROGRESS_LINE.format(2),)
+
+    def run(self, cmd, on_output=None, resources=None):
+        if "copy" in cmd and "bad" in Path(cmd[cmd.index("-i") + 1]).name:
+            self.commands.append(cmd)
+            on_output("Non-monotonous DTS in output stream 0:0")
+            return 1
+        return super().run(cmd, on_output, resources)
+
+    def write_output(self, cmd):
+        Path(cmd[-1]).touch()
+
+
+def join_video(video_path, width="720", acodec="ac3", sample_rate="48000"):
+    """Return a probed video-like object."""
+    return fake_video(
+        video_path,
+        format_info={"duration": "2.0", "nb_streams": "2"},
+        video_info={"codec_name": "mpeg2video", "width": width},
+        audio_info={"codec_name": acodec},
+        pixel_format="yuv420p",
+        audio_format=(sample_rate, "2"),
+    )
+
+
+def make_job(tmp_path, videos, target_quality="Q", name="joined.vob"):
+    """Return a JoinJob of fake videos."""
+    JoinRunner.commands = []
+    return JoinJob(
+        [video.path for video in videos],
+        tmp_path / name,
+        target_quality=target_quality,
+        profile=FakeProfile(),
+        runner_factory=JoinRunner,
+        video_factory={video.path: video for video in videos}.get,
+    )
+
+
+def test_concat_list(tmp_path):
+    """Test concat_list() quotes the paths."""
+    assert concat_list([tmp_path / "it's.vob"]) == "file '{0}'\n".format(
+        str(tmp_path / "it'\\''s.vob")
+    )
+
+
+def test_join_by_stream_copy(tmp_path):
+    """Test compatible inputs are joined by stream copy."""
+    videos = [join_video(tmp_path / name) for name in ("1.vob", "2.vob")]
+    progress = []
+    job = make_job(tmp_path, videos)
+    assert job.can_copy
+    result = job.run(on_progress=progress.append)
+    assert result.copied
+    assert len(JoinRunner.commands) == 1
+    assert JoinRunner.commands[0][:4] == ["-f", "concat", "-safe", "0"]
+    assert JoinRunner.commands[0][6:8] == ["-map", "0"]
+    assert progress == [50, 100]
+    # The list file is removed
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["joined.vob"]
+
+
+def test_join_incompatible_inputs(tmp_path):
+    """Test incompatible inputs are joined with a single encode."""
+    videos = [
+        join_video(tmp_path / "1.mts"),
+        join_video(tmp_path / "2.mts", width="1920"),
+    ]
+    job = make_job(tmp_path, videos, name="joined.mp4")
+    assert job.incompatible_inputs() == [tmp_path / "2.mts"]
+    result = job.run()
+    assert not result.copied
+    cmd = JoinRunner.commands[0]
+    assert cmd.count("-i") == 2
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "concat=n=2:v=1:a=1[vcat][acat]" in graph
+    assert graph.endswith("[vcat]null[v];[acat]anull[a]")
+
+
+def test_join_silent_input(tmp_path):
+    """Test an input without audio gets silence in an encode."""
+    silent = join_video(tmp_path / "2.mts", width="1920")
+    silent.audio_info = {}
+    job = make_job(tmp_path, [join_video(tmp_path / "1.mts"), silent])
+    cmd = job.encode_cmd()
+    assert cmd.count("-i") == 2
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "anullsrc=r=48000:cl=stereo,atrim=duration=2.0[a1]" in graph
+    assert "concat=n=2:v=1:a=1[vcat][acat]" in graph
+    assert cmd[cmd.index("[v]") + 1 :][:2] == ["-map", "[a]"]
+
+
+def test_join_sample_rate_mismatch(tmp_path):
+    """Test inputs with different audio sample rates are not copied."""
+    videos = [
+        join_video(tmp_path / "1.mts"),
+        join_video(tmp_path / "2.mts", sample_rate="44100"),
+    ]
+    job = make_job(tmp_path, videos)
+    assert not job.can_copy
+
+
+def test_join_merges_preset_filters(tmp_path):
+    """Test filters of the preset go into the filter graph."""
+    videos = [
+        join_video(tmp_path / "1.mts"),
+        join_video(tmp_path / "2.mts", width="1920"),
+    ]
+    job = make_job(tmp_path, videos)
+    job._profile.qualities["F"] = FakeQuality(
+        "-vcodec libx264 -vf yadif -af volume=2", ".mp4", ""
+    )
+    job.target_quality = "F"
+    cmd = job.encode_cmd()
+    assert "-vf" not in cmd
+    assert "-af" not in cmd
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.endswith("[vcat]yadif[v];[acat]volume=2[a]")
+
+
+def test_join_falls_back_after_failed_copy(tmp_path):
+    """Test a failed stream copy falls back to an encode."""
+    videos = [join_video(tmp_path / name) for name in ("1.ts", "2.ts")]
+    job = make_job(tmp_path, videos)
+    job.copy_cmd = lambda list_path: ["-c", "copy", "-i", "bad.ts", "out"]
+    result = job.run()
+    assert not result.copied
+    assert len(JoinRunner.commands) == 2
+
+
+def test_join_without_encoding(tmp_path):
+    """Test incompatible inputs fail without a target quality."""
+    videos = [
+        join_video(tmp_path / "1.ts"),
+        join_video(tmp_path / "2.ts", acodec="aac"),
+    ]
+    job = make_job(tmp_path, videos, target_quality=None)
+    with pytest.raises(ValueError):
+        job.run()
+
+
+def test_join_copy_failure_without_encoding(tmp_path):
+    """Test a failed stream copy raises without a target quality."""
+    videos = [join_video(tmp_path / name) for name in ("1.ts", "2.ts")]
+    job = make_job(tmp_path, videos, target_quality=None)
+    job.copy_cmd = lambda list_path: ["-c", "copy", "-i", "bad.ts", "out"]
+    with pytest.raises(ConversionError):
+        job.run()
+
+
+def test_join_rejects_input_as_output(tmp_path):
+    """Test JoinJob() rejects an output overwriting an input."""
+    videos = [join_video(tmp_path / name) for name in ("1.ts", "2.ts")]
+    with pytest.raises(ValueError):
+        make_job(tmp_path, videos, name="2.ts")
+
+
+def test_join_needs_two_videos(tmp_path):
+    """Test JoinJob() rejects a single input."""
+    with pytest.raises(ValueError):
+        make_job(tmp_path, [join_video(tmp_path / "1.ts")])
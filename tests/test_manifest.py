@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_manifest.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for manifest.py module."""
+
+import os
+
+from videomorph.converter.console import search_directory_recursively
+from videomorph.converter.manifest import ScanManifest
+
+NOW = 10**20
+
+
+def make_tree(root):
+    """Create a small directory tree with videos."""
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "top.mp4").touch()
+    (root / "notes.txt").touch()
+    (root / "a" / "clip.MKV").touch()
+    (root / "a" / "b" / "deep.avi").touch()
+
+
+def test_scan_finds_videos(tmp_path):
+    """Test the scan matches os.walk."""
+    make_tree(tmp_path)
+    manifest = ScanManifest(path=None, clock=lambda: NOW)
+    assert sorted(manifest.scan(tmp_path)) == sorted(
+        search_directory_recursively(str(tmp_path))
+    )
+    assert manifest.listed == 3
+
+
+def test_rescan_reuses_unchanged_dirs(tmp_path):
+    """Test only the changed directories are listed again."""
+    make_tree(tmp_path)
+    path = tmp_path / "manifest.json"
+    manifest = ScanManifest(path, clock=lambda: NOW)
+    manifest.scan(tmp_path / "a")
+    manifest.save()
+    assert (manifest.listed, manifest.reused) == (2, 0)
+
+    (tmp_path / "a" / "b" / "new.mov").touch()
+    os.utime(tmp_path / "a" / "b", ns=(1, 1))
+    manifest = ScanManifest(path, clock=lambda: NOW)
+    videos = manifest.scan(tmp_path / "a")
+    assert str(tmp_path / "a" / "b" / "new.mov") in videos
+    assert (manifest.listed, manifest.reused) == (1, 1)
+
+
+def test_recent_dirs_are_listed_again(tmp_path):
+    """Test a directory modified during the scan is not trusted."""
+    make_tree(tmp_path)
+    mtime = os.stat(tmp_path).st_mtime_ns
+    manifest = ScanManifest(path=None, clock=lambda: mtime)
+    manifest.scan(tmp_path)
+    manifest.scan(tmp_path)
+    assert manifest.listed == 6
+
+
+def test_removed_dirs_are_forgotten(tmp_path):
+    """Test the manifest drops the directories removed from the tree."""
+    make_tree(tmp_path)
+    manifest = ScanManifest(path=None, clock=lambda: NOW)
+    manifest.scan(tmp_path)
+    (tmp_path / "a" / "b" / "deep.avi").unlink()
+    (tmp_path / "a" / "b").rmdir()
+    assert str(tmp_path / "a" / "b") in manifest.dirs
+    manifest.scan(tmp_path)
+    assert str(tmp_path / "a" / "b") not in manifest.dirs
+
+
+def test_search_with_manifest(tmp_path):
+    """Test search_directory_recursively() saves the manifest."""
+    make_tree(tmp_path / "tree")
+    manifest = ScanManifest(tmp_path / "manifest.json", clock=lambda: NOW)
+    files = search_directory_recursively(
+        str(tmp_path / "tree"), manifest=manifest
+    )
+    assert len(files) == 3
+    assert (tmp_path / "manifest.json").exists()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_preflight.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for preflight.py module."""
+
+from videomorph.converter.preflight import PREFLIGHT_CHECK, Preflight
+from videomorph.converter.streaming import StreamTarget
+from videomorph.converter.task import Task
+
+from .conftest import FakeProfile, FakeQuality, FakeRunner, fake_video
+
+QUALITIES = {
+    "new": FakeQuality("-an", ".mp4", "[T]-"),
+    "old": FakeQuality("-me_method zero", ".mp4", "[T]-"),
+}
+
+
+class PreflightRunner(FakeRunner):
+    """Runner rejecting the -me_method option."""
+
+    def run(self, cmd, on_output=None, resources=None):
+        assert cmd[-3:] == ["-f", "null", "-"]
+        if "-me_method" in cmd:
+            on_output("Unrecognized option 'me_method'.")
+            return 1
+        return super().run(cmd, on_output, resources)
+
+
+def make_task(path, output_dir):
+    """Return a Task on a fake video."""
+    return Task(fake_video(path), FakeProfile(QUALITIES), output_dir)
+
+
+def test_prepare_null_cmd(tmp_path):
+    """Test prepare() writes to the null muxer, even for stream targets."""
+    (tmp_path / "a.mov").touch()
+    task = make_task(tmp_path / "a.mov", tmp_path)
+    task.stream_target = StreamTarget("/tmp/pipe", None, False)
+    plan = Preflight().prepare([(0, task, "new")])
+    cmd = plan.commands[0][2]
+    assert cmd[-5:] == ["-t", "0.1", "-f", "null", "-"]
+    assert "/tmp/pipe" not in cmd
+    assert plan.report.ok
+
+
+def test_check_ok(tmp_path):
+    """Test a valid queue gives an empty report."""
+    (tmp_path / "a.mov").touch()
+    report = Preflight(runner_factory=PreflightRunner).check(
+        [(0, make_task(tmp_path / "a.mov", tmp_path), "new")]
+    )
+    assert report.ok
+    assert report.checked == 1
+
+
+def test_check_issues(tmp_path):
+    """Test every kind of issue is reported."""
+    for name in ("a.mov", "a.avi", "b.mov"):
+        (tmp_path / name).touch()
+    jobs = [
+        (0, make_task(tmp_path / "a.mov", tmp_path), "new"),
+        (1, make_task(tmp_path / "a.avi", tmp_path), "new"),
+        (2, make_task(tmp_path / "b.mov", tmp_path), "old"),
+        (3, make_task(tmp_path / "missing.mov", tmp_path), "new"),
+    ]
+    report = Preflight(runner_factory=PreflightRunner).check(jobs)
+
+    checks = {(issue.position, issue.check) for issue in report.issues}
+    assert checks == {
+        (0, PREFLIGHT_CHECK.collision),
+        (1, PREFLIGHT_CHECK.collision),
+        (2, PREFLIGHT_CHECK.cmd),
+        (3, PREFLIGHT_CHECK.input),
+    }
+    assert report.failed_positions == [0, 1, 2, 3]
+    assert "b.mov: Conversion command: Bad option" in report.format()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_projector.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for projector.py module."""
+
+from videomorph.converter.projector import SizeProjector
+from videomorph.converter.reader import OutputReader
+
+
+def test_projected_size():
+    """Test SizeProjector.projected_size()."""
+    assert SizeProjector.projected_size(1000, 10.0, 100.0) == 10000
+
+
+def test_projected_size_no_time_read():
+    """Test SizeProjector.projected_size() before any time is read."""
+    assert SizeProjector.projected_size(1000, 0.0, 100.0) is None
+
+
+def test_exceeds_disabled():
+    """Test SizeProjector.exceeds() with no caps configured."""
+    assert not SizeProjector().exceeds(10**9, 10.0, 100.0, 1)
+
+
+def test_exceeds_max_size():
+    """Test SizeProjector.exceeds() with an absolute cap."""
+    projector = SizeProjector(max_size=5000)
+    assert projector.exceeds(1000, 10.0, 100.0, 10**6)
+    assert not projector.exceeds(400, 10.0, 100.0, 10**6)
+
+
+def test_exceeds_max_ratio():
+    """Test SizeProjector.exceeds() with a source size ratio cap."""
+    projector = SizeProjector(max_ratio=1.5)
+    assert projector.exceeds(2000, 10.0, 100.0, 10000)
+    assert not projector.exceeds(1000, 10.0, 100.0, 10000)
+
+
+def test_exceeds_too_early():
+    """Test SizeProjector.exceeds() ignores early projections."""
+    projector = SizeProjector(max_size=1)
+    assert not projector.exceeds(1000, 1.0, 100.0, 10**6)
+
+
+def test_fallback_for():
+    """Test SizeProjector.fallback_for()."""
+    projector = SizeProjector(fallback="MP4 Fast")
+    assert projector.fallback_for("MP4 HQ") == "MP4 Fast"
+    assert projector.fallback_for("MP4 Fast") is None
+    assert SizeProjector().fallback_for("MP4 HQ") is None
+
+
+def test_reader_size():
+    """Test OutputReader.size."""
+    reader = OutputReader()
+    reader.update_read("frame=  10 size=     256kB time=00:00:01.00 ")
+    assert reader.size == 256 * 1024
+    reader.update_read("frame=  10 size=N/A time=00:00:01.00 ")
+    assert reader.size == 0
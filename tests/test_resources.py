@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_resources.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for resources.py module."""
+
+from pathlib import Path
+
+import pytest
+
+from videomorph.converter import resources
+from videomorph.converter.resources import (
+    ResourcePolicy,
+    ResourcePool,
+    cpu_sets,
+    parse_cpu_list,
+    parse_resources,
+)
+
+
+def write_l3(sys_cpu_dir, cpu, shared):
+    """Write a fake L3 shared_cpu_list for a cpu."""
+    cache_dir = Path(sys_cpu_dir, "cpu{0}".format(cpu), "cache", "index3")
+    cache_dir.mkdir(parents=True)
+    cache_dir.joinpath("shared_cpu_list").write_text(shared + "\n")
+
+
+def fake_tool(*installed):
+    """Return a fake _tool() finding only the installed tools."""
+
+    def tool(name):
+        return "/usr/bin/" + name if name in installed else None
+
+    return tool
+
+
+def test_parse_cpu_list():
+    """Test parse_cpu_list()."""
+    assert parse_cpu_list("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+
+
+def test_cpu_sets_follow_cache_domains(tmp_path):
+    """Test cpu_sets() keeps each job inside one L3 domain."""
+    for cpu in (0, 2):
+        write_l3(tmp_path, cpu, "0,2")
+    for cpu in (1, 3):
+        write_l3(tmp_path, cpu, "1,3")
+
+    assert cpu_sets(2, cpus=[0, 1, 2, 3], sys_cpu_dir=tmp_path) == [
+        [0, 2],
+        [1, 3],
+    ]
+
+
+def test_cpu_sets_without_sys_info(tmp_path):
+    """Test cpu_sets() when /sys exposes no cache info."""
+    assert cpu_sets(3, cpus=[0, 1, 2, 3], sys_cpu_dir=tmp_path) == [
+        [0, 1],
+        [2],
+        [3],
+    ]
+
+
+def test_threads():
+    """Test ResourcePolicy.threads follows the CPU set."""
+    assert ResourcePolicy(cpus=[0, 1, 2]).threads == 3
+
+
+def test_wrap_without_options():
+    """Test ResourcePolicy.wrap() with nothing to apply."""
+    assert ResourcePolicy().wrap("ffmpeg", ["-i", "a"]) == (
+        "ffmpeg",
+        ["-i", "a"],
+    )
+
+
+def test_limits_unavailable(tmp_path, monkeypatch, caplog):
+    """Test ResourcePolicy.wrap() without cgroup v2 reports it once."""
+    monkeypatch.setattr(resources, "_tool", fake_tool("sh"))
+    resources._warn_once.cache_clear()
+    policy = ResourcePolicy(cpu_quota=1.5)
+    for _ in range(2):
+        assert policy.wrap(
+            "ffmpeg", ["-i", "a"], cgroup_root=tmp_path / "missing"
+        ) == ("ffmpeg", ["-i", "a"])
+    assert caplog.text.count("not applied") == 1
+
+
+def test_limits_cgroup(tmp_path, monkeypatch):
+    """Test ResourcePolicy.wrap() joins a limited cgroup before exec."""
+    monkeypatch.setattr(resources, "_tool", fake_tool("sh"))
+    monkeypatch.setattr(
+        ResourcePolicy, "_own_cgroup", staticmethod(lambda root: root)
+    )
+    tmp_path.joinpath("cgroup.subtree_control").write_text("io\n")
+    policy = ResourcePolicy(cpu_quota=1.5, memory_max=2**30)
+    program, args = policy.wrap("ffmpeg", ["-i", "a"], cgroup_root=tmp_path)
+    cgroup = Path(args[2])
+    assert program == "/usr/bin/sh"
+    assert args[3:] == ["ffmpeg", "-i", "a"]
+    assert tmp_path.joinpath("cgroup.subtree_control").read_text() == (
+        "+cpu +memory"
+    )
+    assert cgroup.joinpath("cpu.max").read_text() == "150000 100000"
+    assert cgroup.joinpath("memory.max").read_text() == str(2**30)
+    for name in ("cpu.max", "memory.max"):
+        cgroup.joinpath(name).unlink()
+    policy.release(args)
+    assert not cgroup.exists()
+
+
+def test_limits_systemd_scope(monkeypatch):
+    """Test ResourcePolicy.wrap() runs in a transient systemd scope."""
+    monkeypatch.setattr(resources, "_tool", fake_tool("systemd-run"))
+    monkeypatch.setattr(resources, "_user_scopes_work", lambda path: True)
+    policy = ResourcePolicy(cpu_quota=0.5, memory_max=1024)
+    assert policy.wrap("ffmpeg", ["-i", "a"]) == (
+        "/usr/bin/systemd-run",
+        [
+            "--user",
+            "--scope",
+            "--quiet",
+            "--collect",
+            "-p",
+            "CPUQuota=50%",
+            "-p",
+            "MemoryMax=1024",
+            "ffmpeg",
+            "-i",
+            "a",
+        ],
+    )
+
+
+def test_pool_pins_jobs():
+    """Test ResourcePool gives every running job its own CPU set."""
+    pool = ResourcePool(ResourcePolicy(nice=10, cpus=[0, 1, 2, 3]), jobs=2)
+    first, second = pool.acquire(), pool.acquire()
+    assert first.cpus and second.cpus
+    assert not set(first.cpus) & set(second.cpus)
+    assert first.nice == second.nice == 10
+    # Every CPU set is taken
+    assert pool.acquire() is pool.resources
+    pool.release(pool.resources)
+    pool.release(first)
+    assert pool.acquire() is first
+
+
+def test_pool_presets():
+    """Test ResourcePool prefers the policy of the target quality."""
+    preset = ResourcePolicy(nice=19)
+    pool = ResourcePool(presets={"Q": preset})
+    assert pool.acquire("Q") is preset
+    assert pool.acquire("W") is None
+
+
+def test_parse_resources():
+    """Test parse_resources()."""
+    policy = parse_resources("nice=10 ionice=idle memory_max_mib=2")
+    assert (policy.nice, policy.ionice, policy.memory_max) == (
+        10,
+        "idle",
+        2 * 2**20,
+    )
+    with pytest.raises(ValueError):
+        parse_resources("threads=2")
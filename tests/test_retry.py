@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_retry.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for retry.py module."""
+
+from videomorph.converter.errors import ERROR_KIND, LibraryError
+from videomorph.converter.retry import Retry, RetryPolicy, TaskAttempt
+
+IO_ERROR = LibraryError(ERROR_KIND.io_error, "Input/output error", True)
+NO_ENCODER = LibraryError(ERROR_KIND.missing_encoder, "Unknown encoder", True)
+CORRUPT = LibraryError(ERROR_KIND.corrupt_input, "moov atom not found", True)
+
+
+def failed(count, quality="H.265"):
+    """Return a list of failed attempts."""
+    return [
+        TaskAttempt(number, quality, IO_ERROR)
+        for number in range(1, count + 1)
+    ]
+
+
+def test_disabled_by_default():
+    """Test the default policy never retries."""
+    policy = RetryPolicy()
+    assert not policy.is_enabled
+    assert policy.next_retry(failed(1), IO_ERROR) is None
+
+
+def test_exponential_backoff():
+    """Test the delay grows up to max_delay."""
+    policy = RetryPolicy(max_attempts=5, backoff=1, factor=2, max_delay=3)
+    assert [policy.delay(failures) for failures in (1, 2, 3)] == [1, 2, 3]
+    assert policy.next_retry(failed(2), IO_ERROR) == Retry(2, "H.265")
+    assert policy.next_retry(failed(5), IO_ERROR) is None
+
+
+def test_fallback_by_error_kind():
+    """Test the fallback quality is used for encoder errors only."""
+    policy = RetryPolicy(max_attempts=3, fallbacks={"H.265": "H.264"})
+    assert policy.next_retry(failed(1), NO_ENCODER).target_quality == ("H.264")
+    assert policy.next_retry(failed(1), IO_ERROR).target_quality == "H.265"
+    assert policy.next_retry(failed(1), CORRUPT) is None
+    too_big = LibraryError(ERROR_KIND.too_big, "Projected too big", True)
+    assert policy.next_retry(failed(1), too_big) is None
+    assert policy.next_retry(failed(1, "H.264"), NO_ENCODER) is None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_scheduler.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for scheduler.py module."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+from videomorph.converter import STATUS
+from videomorph.converter.scheduler import (
+    JOB_KIND,
+    IOScheduler,
+    device_id,
+    is_audio_only,
+    job_kind,
+    parse_bitrate,
+    task_kind,
+)
+from videomorph.converter.task import Task
+
+from .conftest import FakeProfile, FakeQuality, fake_video
+
+
+class FakeTask:
+    """Minimal task-like object."""
+
+    def __init__(self, video_path, params, output_dir):
+        self.video = SimpleNamespace(path=video_path, format_info={})
+        self.profile = SimpleNamespace(params=params)
+        self.output_dir = output_dir
+        self.status = STATUS.todo
+
+
+def make_task(tmp_path, name, params):
+    """Return a minimal task-like object."""
+    video_path = Path(tmp_path, name)
+    video_path.touch()
+    return FakeTask(video_path, params, str(tmp_path))
+
+
+def test_parse_bitrate():
+    """Test parse_bitrate()."""
+    assert parse_bitrate("1000k") == 1000000
+    assert parse_bitrate("2M") == 2000000
+    assert parse_bitrate("bad") is None
+
+
+def test_job_kind_copy():
+    """Test job_kind() with stream copy."""
+    assert job_kind("-c copy -f mp4") == JOB_KIND.io
+
+
+def test_job_kind_low_bitrate():
+    """Test job_kind() with a low video bitrate."""
+    assert job_kind("-vcodec mpeg4 -b:v 300k") == JOB_KIND.io
+
+
+def test_job_kind_encode():
+    """Test job_kind() with a regular encode."""
+    assert job_kind("-vcodec libx264 -crf 18") == JOB_KIND.cpu
+
+
+def test_device_id_missing_path(tmp_path):
+    """Test device_id() with a path that does not exist yet."""
+    assert device_id(tmp_path / "missing" / "file") == device_id(tmp_path)
+
+
+def test_device_limit(tmp_path):
+    """Test IOScheduler limits the jobs per device."""
+    scheduler = IOScheduler(max_jobs=4, device_limit=1)
+    first = make_task(tmp_path, "a.mp4", "-vcodec libx264")
+    second = make_task(tmp_path, "b.mp4", "-vcodec libx264")
+    scheduler.start(first)
+    assert not scheduler.can_start(second)
+    scheduler.finish(first)
+    assert scheduler.can_start(second)
+
+
+def test_max_jobs(tmp_path):
+    """Test IOScheduler limits the total number of jobs."""
+    scheduler = IOScheduler(max_jobs=1, device_limit=4)
+    first = make_task(tmp_path, "a.mp4", "-vcodec libx264")
+    second = make_task(tmp_path, "b.mp4", "-vcodec libx264")
+    scheduler.start(first)
+    assert scheduler.is_full
+    assert scheduler.next_task([first, second]) is None
+
+
+def test_next_task_interleaves_kinds(tmp_path):
+    """Test IOScheduler.next_task() interleaves I/O and CPU jobs."""
+    scheduler = IOScheduler(max_jobs=4, device_limit=4)
+    encode = make_task(tmp_path, "a.mp4", "-vcodec libx264")
+    other_encode = make_task(tmp_path, "b.mp4", "-vcodec libx264")
+    remux = make_task(tmp_path, "c.mp4", "-c copy")
+    scheduler.start(encode)
+    assert scheduler.next_task([other_encode, remux]) is remux
+
+
+def test_job_kind_audio():
+    """Test job_kind() with audio only targets."""
+    assert job_kind("-acodec libvorbis -vn -ac 2") == JOB_KIND.audio
+    assert job_kind("-q:a 0 -map a", ".mp3") == JOB_KIND.audio
+    assert job_kind("-vcodec libx264", ".m4a") == JOB_KIND.cpu
+    assert not is_audio_only("-acodec aac", ".mp4")
+
+
+def test_light_jobs_run_alongside(tmp_path):
+    """Test IOScheduler runs light jobs when the heavy slots are full."""
+    scheduler = IOScheduler(max_jobs=1, device_limit=1, max_light_jobs=2)
+    encode = make_task(tmp_path, "a.mp4", "-vcodec libx264")
+    other_encode = make_task(tmp_path, "b.mp4", "-vcodec libx264")
+    audio = [
+        make_task(tmp_path, name, "-acodec libmp3lame -vn")
+        for name in ("c.mp4", "d.mp4", "e.mp4")
+    ]
+    scheduler.start(encode)
+    assert scheduler.is_full
+    assert scheduler.next_task([other_encode] + audio) is audio[0]
+    scheduler.start(audio[0])
+    scheduler.start(audio[1])
+    assert scheduler.is_light_full
+    assert scheduler.next_task([other_encode, audio[2]]) is None
+
+
+def test_task_kind_follows_own_quality(tmp_path):
+    """Test task_kind() ignores the quality the shared profile is on."""
+    profile = FakeProfile(
+        {
+            "C": FakeQuality("-c copy", ".mkv", ""),
+            "Q": FakeQuality("-vcodec libx264", ".mp4", ""),
+        }
+    )
+    video_path = Path(tmp_path, "a.mov")
+    video_path.touch()
+    remux, encode = (
+        Task(fake_video(video_path), profile, str(tmp_path)) for _ in "ab"
+    )
+    remux.target_quality = "C"
+    encode.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert task_kind(remux) == JOB_KIND.io
+    assert task_kind(encode) == JOB_KIND.cpu
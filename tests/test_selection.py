@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_selection.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for selection.py module."""
+
+import io
+from types import SimpleNamespace
+
+from videomorph.converter.probe import Probe, Stream, parse_streams
+from videomorph.converter.selection import (
+    StreamRules,
+    language_codes,
+    map_options,
+)
+
+PROBE_OUTPUT = """[STREAM]
+index=0
+codec_name=h264
+codec_type=video
+DISPOSITION:default=1
+[/STREAM]
+[STREAM]
+index=1
+codec_name=dts
+codec_type=audio
+DISPOSITION:comment=0
+TAG:language=eng
+[/STREAM]
+[STREAM]
+index=2
+codec_name=ac3
+codec_type=audio
+TAG:language=eng
+TAG:title=Director's Commentary
+[/STREAM]
+[STREAM]
+index=3
+codec_name=ac3
+codec_type=audio
+TAG:language=spa
+[/STREAM]
+[STREAM]
+index=4
+codec_name=ac3
+codec_type=audio
+TAG:language=fre
+[/STREAM]
+[STREAM]
+index=5
+codec_name=subrip
+codec_type=subtitle
+TAG:language=spa
+[/STREAM]
+[STREAM]
+index=6
+codec_name=mjpeg
+codec_type=video
+DISPOSITION:attached_pic=1
+[/STREAM]
+"""
+
+
+def make_stream(index, codec_type, language=None):
+    """Return a Stream with default dispositions."""
+    return Stream(index, codec_type, None, language, None, False, False, False)
+
+
+def test_parse_streams():
+    """Test parse_streams() builds a Stream per section."""
+    streams = parse_streams(io.StringIO(PROBE_OUTPUT))
+    assert len(streams) == 7
+    assert streams[0].default
+    assert streams[2].title == "Director's Commentary"
+    assert streams[3].language == "spa"
+    assert streams[6].attached_pic
+
+
+def test_probe_streams():
+    """Test Probe.streams probes every stream on the first access."""
+    calls = []
+
+    def probe_runner(args):
+        calls.append(args)
+        output = "" if "-select_streams" in args else PROBE_OUTPUT
+        return SimpleNamespace(stdout=io.StringIO(output))
+
+    probe = Probe("video.mkv", probe_path="ffprobe", probe_runner=probe_runner)
+    assert [stream.index for stream in probe.streams] == list(range(7))
+    assert probe.streams is probe.streams
+    assert len(calls) == 5
+
+
+def test_language_codes():
+    """Test language_codes() adds the probe codes."""
+    assert language_codes(["en", "FR"]) == {"en", "eng", "fr", "fra", "fre"}
+
+
+def test_select_languages_without_commentary():
+    """Test StreamRules.select() keeps the wanted audio only."""
+    streams = parse_streams(io.StringIO(PROBE_OUTPUT))
+    rules = StreamRules(audio_languages=("en", "es"))
+    assert map_options(rules.select(streams)) == [
+        "-map",
+        "0:0",
+        "-map",
+        "0:1",
+        "-map",
+        "0:3",
+    ]
+
+
+def test_select_subtitles_and_max_audio():
+    """Test StreamRules.select() with subtitles and an audio limit."""
+    streams = parse_streams(io.StringIO(PROBE_OUTPUT))
+    rules = StreamRules(subtitle_languages=("es",), max_audio=2)
+    selected = [stream.index for stream in rules.select(streams)]
+    assert selected == [0, 1, 3, 5]
+
+
+def test_select_keeps_some_audio():
+    """Test StreamRules.select() keeps the first audio if none matches."""
+    streams = [make_stream(0, "video"), make_stream(1, "audio", "jpn")]
+    rules = StreamRules(audio_languages=("en",))
+    assert [stream.index for stream in rules.select(streams)] == [0, 1]
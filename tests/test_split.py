@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_split.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for split.py module."""
+
+from pathlib import Path
+
+import pytest
+
+from videomorph.converter.batch import ConversionError
+from videomorph.converter.split import (
+    SplitLimits,
+    Splitter,
+    part_pattern,
+    plan_split,
+)
+
+from .conftest import PROGRESS_LINE, FakeRunner, fake_video
+
+
+class SplitRunner(FakeRunner):
+    """Runner writing the parts of a split."""
+
+    lines = (PROGRESS_LINE.format(50),)
+    failures = {"broken": (1, "")}
+
+    def run(self, cmd, on_output=None, resources=None):
+        if "broken" in cmd[1]:
+            Path(cmd[-1].replace("%03d", "000")).touch()
+        return super().run(cmd, on_output, resources)
+
+    def write_output(self, cmd):
+        segment_seconds = float(cmd[cmd.index("-segment_time") + 1])
+        for part in range(int(100 // segment_seconds) + 1):
+            Path(cmd[-1].replace("%03d", "{0:03d}".format(part))).touch()
+
+
+class VBRRunner(SplitRunner):
+    """Runner writing parts over the planned size."""
+
+    # Bytes per second of the parts, None for parts of a fixed size, like
+    # a single keyframe interval longer than the limit
+    rate = 1.2 * 10**6
+
+    def write_output(self, cmd):
+        segment_seconds = float(cmd[cmd.index("-segment_time") + 1])
+        size = 6 * 10**7 if self.rate is None else segment_seconds * self.rate
+        for part in range(int(100 // segment_seconds) + 1):
+            part_path = cmd[-1].replace("%03d", "{0:03d}".format(part))
+            # Sparse files, only their size matters
+            with open(part_path, "wb") as part_file:
+                part_file.truncate(int(size))
+
+
+def video_factory(video_path):
+    """Return a fake video of 100 seconds and 100 MB."""
+    return fake_video(
+        video_path,
+        format_info={"duration": "100.0", "size": str(100 * 10**6)},
+    )
+
+
+def test_plan_split_by_duration():
+    """Test plan_split() with a duration limit."""
+    plan = plan_split(100, 10**6, SplitLimits(None, 30))
+    assert plan.segment_seconds == 30
+    assert plan.parts == 4
+
+
+def test_plan_split_by_size():
+    """Test plan_split() leaves a margin under a size limit."""
+    plan = plan_split(100, 100 * 10**6, SplitLimits(50 * 10**6, None))
+    assert plan.segment_seconds == 45
+    assert plan.parts == 3
+
+
+def test_plan_split_within_limits():
+    """Test plan_split() doesn't split a small video."""
+    assert plan_split(100, 10, SplitLimits(10**6, 600)).parts == 1
+    assert plan_split(100, 10, SplitLimits(None, None)).parts == 1
+
+
+def test_part_pattern(tmp_path):
+    """Test part_pattern() escapes the % of the video name."""
+    pattern = part_pattern(tmp_path / "100%.mp4")
+    assert pattern == tmp_path / "100%%.part%03d.mp4"
+
+
+def test_split(tmp_path):
+    """Test Splitter.split() returns the parts in order."""
+    video_path = tmp_path / "[T]-a.mp4"
+    video_path.touch()
+    progress = []
+    parts = Splitter(SplitRunner, video_factory).split(
+        video_path,
+        SplitLimits(None, 40),
+        delete_source=True,
+        on_progress=progress.append,
+    )
+    assert [Path(part).name for part in parts] == [
+        "[T]-a.part000.mp4",
+        "[T]-a.part001.mp4",
+        "[T]-a.part002.mp4",
+    ]
+    assert progress == [50, 100]
+    assert not video_path.exists()
+
+
+def test_split_within_limits(tmp_path):
+    """Test Splitter.split() keeps a video within the limits."""
+    video_path = tmp_path / "a.mp4"
+    parts = Splitter(SplitRunner, video_factory).split(
+        video_path, SplitLimits(None, 200)
+    )
+    assert parts == [str(video_path)]
+
+
+def test_split_failure(tmp_path):
+    """Test Splitter.split() removes the parts of a failed split."""
+    video_path = tmp_path / "broken.mp4"
+    video_path.touch()
+    with pytest.raises(ConversionError):
+        Splitter(SplitRunner, video_factory).split(
+            video_path, SplitLimits(None, 40)
+        )
+    assert [path.name for path in tmp_path.iterdir()] == ["broken.mp4"]
+
+
+def test_split_oversized_parts(tmp_path):
+    """Test parts over the size limit are split again shorter."""
+    video_path = tmp_path / "a.mp4"
+    video_path.touch()
+    VBRRunner.commands = []
+    parts = Splitter(VBRRunner, video_factory).split(
+        video_path, SplitLimits(50 * 10**6, None)
+    )
+    assert len(VBRRunner.commands) == 2
+    assert all(Path(part).stat().st_size <= 50 * 10**6 for part in parts)
+
+
+def test_split_parts_over_limit(tmp_path, monkeypatch):
+    """Test Splitter.split() fails if parts can't get under the limit."""
+    video_path = tmp_path / "a.mp4"
+    video_path.touch()
+    monkeypatch.setattr(VBRRunner, "rate", None)
+    with pytest.raises(ValueError):
+        Splitter(VBRRunner, video_factory).split(
+            video_path, SplitLimits(50 * 10**6, None)
+        )
+    assert [path.name for path in tmp_path.iterdir()] == ["a.mp4"]
+
+
+def test_parts_order(tmp_path):
+    """Test the parts are listed in part order past part 999."""
+    video_path = tmp_path / "a.mp4"
+    for part in ("a.part999.mp4", "a.part1000.mp4", "a.parts.mp4"):
+        (tmp_path / part).touch()
+    parts = Splitter._parts(video_path, part_pattern(video_path))
+    assert [part.name for part in parts] == ["a.part999.mp4", "a.part1000.mp4"]
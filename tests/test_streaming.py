@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_streaming.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for streaming.py module."""
+
+import os
+
+import pytest
+
+from videomorph.converter.streaming import (
+    StreamTarget,
+    prepare_target,
+    stream_format,
+    streaming_output_args,
+)
+
+
+def test_stream_format_from_extension():
+    """Test stream_format() picks the format of the output extension."""
+    target = StreamTarget("pipe", None, False)
+    assert stream_format(target, ".MP4") == "mp4"
+    assert stream_format(target, ".mkv") == "matroska"
+    assert stream_format(target, ".avi") == "mpegts"
+    assert stream_format(target._replace(format="webm"), ".mp4") == "webm"
+    with pytest.raises(ValueError):
+        stream_format(target._replace(format="avi"), ".mp4")
+
+
+def test_streaming_output_args_fragmented_mp4():
+    """Test streaming_output_args() fragments MP4 outputs."""
+    target = StreamTarget("http://127.0.0.1:8080/live", None, False)
+    assert streaming_output_args(target, "out/a.mp4", mapped=False) == [
+        "-f",
+        "mp4",
+        "-movflags",
+        "frag_keyframe+empty_moov+default_base_moof",
+        "-y",
+        "http://127.0.0.1:8080/live",
+    ]
+
+
+def test_streaming_output_args_keep_file():
+    """Test streaming_output_args() tees the stream and a file copy."""
+    target = StreamTarget("/tmp/a|b", "mpegts", True)
+    args = streaming_output_args(target, "/out/a.ts", mapped=False)
+    assert args == [
+        "-map",
+        "0:v:0?",
+        "-map",
+        "0:a:0?",
+        "-f",
+        "tee",
+        "-y",
+        "[f=mpegts:onfail=ignore]/tmp/a\\|b|/out/a.ts",
+    ]
+    args = streaming_output_args(
+        target._replace(format="mp4"), "/out/a.mp4", mapped=True
+    )
+    assert args[0] == "-f"
+    assert args[-1].startswith(
+        "[f=mp4:onfail=ignore:movflags=frag_keyframe+empty_moov"
+    )
+
+
+def test_prepare_target(tmp_path):
+    """Test prepare_target() creates the named pipe."""
+    pipe_path = tmp_path / "pipe"
+    prepare_target(StreamTarget(str(pipe_path), None, False))
+    assert pipe_path.is_fifo()
+    # An existing pipe is reused
+    prepare_target(StreamTarget(str(pipe_path), None, False))
+
+    file_path = tmp_path / "file"
+    file_path.touch()
+    with pytest.raises(ValueError):
+        prepare_target(StreamTarget(str(file_path), None, False))
+    prepare_target(StreamTarget("http://127.0.0.1/live", None, False))
+    assert sorted(os.listdir(tmp_path)) == ["file", "pipe"]
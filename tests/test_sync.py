@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_sync.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for sync.py module."""
+
+import os
+from concurrent.futures import Future
+from pathlib import Path
+
+from videomorph.converter.sync import (
+    SYNC_STATE_NAME,
+    MirrorSync,
+    SyncState,
+    params_hash,
+    source_fingerprint,
+)
+
+from .conftest import FakeProfile
+
+
+class FakeConverter:
+    """BatchConverter writing empty outputs."""
+
+    submitted = []
+
+    def __init__(
+        self, max_workers=None, profile_factory=None, cache=None, **options
+    ):
+        self.profile_factory = profile_factory
+
+    def submit(self, video_path, target_quality, output_dir, **options):
+        FakeConverter.submitted.append(Path(video_path).name)
+        output_path = Path(output_dir, Path(video_path).stem + ".mp4")
+        output_path.touch()
+        future = Future()
+        future.set_result(str(output_path))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+def make_sync(source_dir, output_dir):
+    """Return a MirrorSync using fakes."""
+    FakeConverter.submitted = []
+    return MirrorSync(
+        source_dir,
+        output_dir,
+        "Q",
+        profile_factory=FakeProfile,
+        converter_factory=FakeConverter,
+    )
+
+
+def test_params_hash():
+    """Test params_hash() ignores extra spaces only."""
+    assert params_hash("-an  -sn", ".mp4") == params_hash("-an -sn", ".mp4")
+    assert params_hash("-an", ".mp4") != params_hash("-an", ".mkv")
+
+
+def test_state_round_trip(tmp_path):
+    """Test SyncState saves and loads its entries."""
+    output_path = tmp_path / "sub" / "a.mp4"
+    state = SyncState(tmp_path)
+    state.record(output_path, "sub/a.mov", "1-1", "hash")
+    state.save()
+    assert SyncState(tmp_path).entries == {
+        "sub/a.mp4": dict(source="sub/a.mov", fingerprint="1-1", params="hash")
+    }
+
+    assert [path.name for path in tmp_path.iterdir()] == [SYNC_STATE_NAME]
+
+
+def test_state_corrupt(tmp_path):
+    """Test SyncState starts fresh from a corrupt state file."""
+    (tmp_path / SYNC_STATE_NAME).write_text('{"a.mp4": {"sour')
+    assert SyncState(tmp_path).entries == {}
+
+
+def test_source_fingerprint_follows_content(tmp_path):
+    """Test source_fingerprint() sees edits keeping size and mtime."""
+    path = tmp_path / "a.mov"
+    path.write_bytes(b"aaaa")
+    before = source_fingerprint(path)
+    stat = path.stat()
+    path.write_bytes(b"bbbb")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert source_fingerprint(path) != before
+
+
+def test_sync_converts_only_changes(tmp_path):
+    """Test a second run skips the up to date outputs."""
+    source_dir, output_dir = tmp_path / "src", tmp_path / "out"
+    (source_dir / "sub").mkdir(parents=True)
+    (source_dir / "a.mov").write_bytes(b"a")
+    (source_dir / "sub" / "b.avi").write_bytes(b"b")
+
+    report = make_sync(source_dir, output_dir).run()
+    assert len(report.converted) == 2
+    assert (output_dir / "sub" / "b.mp4").exists()
+
+    (source_dir / "a.mov").write_bytes(b"changed")
+    sync = make_sync(source_dir, output_dir)
+    report = sync.run()
+    assert FakeConverter.submitted == ["a.mov"]
+    assert report.skipped == [output_dir / "sub" / "b.mp4"]
+    assert sync.state.entries["a.mp4"]["fingerprint"] == source_fingerprint(
+        source_dir / "a.mov"
+    )
+
+
+def test_sync_prune(tmp_path):
+    """Test outputs of removed sources are pruned on demand."""
+    source_dir, output_dir = tmp_path / "src", tmp_path / "out"
+    source_dir.mkdir()
+    (source_dir / "a.mov").write_bytes(b"a")
+    (source_dir / "b.mov").write_bytes(b"b")
+    make_sync(source_dir, output_dir).run()
+
+    (source_dir / "b.mov").unlink()
+    assert make_sync(source_dir, output_dir).plan().prune == [
+        output_dir / "b.mp4"
+    ]
+    report = make_sync(source_dir, output_dir).run(prune=True)
+    assert report.pruned == [output_dir / "b.mp4"]
+    assert not (output_dir / "b.mp4").exists()
+    assert (output_dir / "a.mp4").exists()
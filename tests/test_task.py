@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# File name: test_task.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides tests for task.py module."""
+
+from pathlib import Path
+
+import pytest
+
+from videomorph.converter import STATUS
+from videomorph.converter.probe import Stream
+from videomorph.converter.selection import StreamRules
+from videomorph.converter.task import (
+    SUBTITLE_MODE,
+    Task,
+    input_args,
+    merge_conversion_cmds,
+)
+from videomorph.converter.tasklist import TaskList
+
+from .conftest import FakeProfile, FakeQuality, fake_video
+
+
+def make_task(tmp_path, params, extension):
+    """Return a Task of a video in tmp_path."""
+    video_path = Path(tmp_path, "a.mov")
+    video_path.touch()
+    video = fake_video(
+        video_path, format_info={"duration": "600.0", "size": "6000"}
+    )
+    profile = FakeProfile({"Q": FakeQuality(params, extension, "[T]-")})
+    return Task(video, profile, str(tmp_path))
+
+
+def test_audio_only_cmd(tmp_path):
+    """Test build_conversion_cmd() skips the video for audio targets."""
+    task = make_task(tmp_path, "-acodec libmp3lame -ab 160k", ".mp3")
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=True)
+    assert cmd[:6] == ["-i", str(tmp_path / "a.mov"), "-vn"] + [
+        "-map",
+        "0:a:0",
+        "-acodec",
+    ]
+    assert cmd[-1] == str(tmp_path / "a.mp3")
+
+
+def test_audio_only_cmd_keeps_preset_map(tmp_path):
+    """Test build_conversion_cmd() keeps the mapping of a preset."""
+    task = make_task(tmp_path, "-q:a 0 -map a", ".mp3")
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[2:7] == ["-vn", "-q:a", "0", "-map", "a"]
+
+
+def test_video_cmd(tmp_path):
+    """Test build_conversion_cmd() leaves video targets as they are."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert "-vn" not in cmd and "-map" not in cmd
+
+
+def test_trim_cmd(tmp_path):
+    """Test build_conversion_cmd() seeks on the input side to trim."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    task.set_trim(90, 120)
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[:4] == ["-ss", "90.000", "-i", str(tmp_path / "a.mov")]
+    assert cmd[cmd.index("-t") + 1] == "30.000"
+    assert task.duration == 30
+    assert task.source_size == 300
+
+
+def test_trim_to_the_end(tmp_path):
+    """Test a trim without end converts up to the end of the video."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    task.set_trim(start=500)
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert "-t" not in cmd
+    assert task.duration == 100
+
+
+def test_trim_out_of_range(tmp_path):
+    """Test set_trim() rejects ranges out of the video."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    with pytest.raises(ValueError):
+        task.set_trim(700)
+    with pytest.raises(ValueError):
+        task.set_trim(20, 10)
+
+
+def test_preview(tmp_path):
+    """Test set_preview() converts some seconds from the middle."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    task.set_preview(10)
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[:2] == ["-ss", "295.000"]
+    assert task.duration == 10
+    assert cmd[-1] == str(tmp_path / "[Preview]-a.mp4")
+    task.clear_trim()
+    assert task.duration == 600
+    assert task.get_output_file_name(tagged=False) == "a.mp4"
+
+
+def test_merge_conversion_cmds():
+    """Test merge_conversion_cmds() requires a shared input."""
+    first = ["-i", "a.mov", "-vn", "-y", "a.mp3"]
+    second = ["-i", "a.mov", "-vcodec", "libx264", "-y", "a.mp4"]
+    assert merge_conversion_cmds([first, second]) == first + second[2:]
+    with pytest.raises(ValueError):
+        merge_conversion_cmds([first, ["-i", "b.mov", "-y", "b.mp4"]])
+    with pytest.raises(ValueError):
+        merge_conversion_cmds([first, ["-ss", "5"] + second])
+
+
+def make_subtitle_task(tmp_path, extension, sidecar=".srt"):
+    """Return a Task of a video with a sidecar subtitle."""
+    task = make_task(tmp_path, "-vcodec libx264", extension)
+    (tmp_path / ("a" + sidecar)).touch()
+    task.subtitle_mode = SUBTITLE_MODE.soft
+    return task
+
+
+def test_soft_subtitles(tmp_path):
+    """Test build_conversion_cmd() muxes subtitles as a soft track."""
+    task = make_subtitle_task(tmp_path, ".mp4")
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=True)
+    assert cmd[:6] == [
+        "-i",
+        str(tmp_path / "a.mov"),
+        "-sub_charenc",
+        "cp1252",
+        "-i",
+        str(tmp_path / "a.srt"),
+    ]
+    assert "-vf" not in cmd
+    assert input_args(cmd) == cmd[:6]
+    assert cmd[8:16] == ["-map", "0:v:0?", "-map", "0:a:0?"] + [
+        "-map",
+        "1:0",
+        "-c:s",
+        "mov_text",
+    ]
+
+
+def test_soft_subtitles_mkv_ssa(tmp_path):
+    """Test build_conversion_cmd() keeps SSA subtitles in MKV files."""
+    task = make_subtitle_task(tmp_path, ".mkv", sidecar=".ssa")
+    task.subtitle_charset = None
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=True)
+    assert "-sub_charenc" not in cmd
+    assert cmd[cmd.index("-c:s") + 1] == "ass"
+
+
+def test_soft_subtitles_fall_back_to_burn_in(tmp_path):
+    """Test containers without soft subtitles get them burnt in."""
+    task = make_subtitle_task(tmp_path, ".avi")
+    task.subtitle_charset = "utf-8"
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=True)
+    assert cmd.count("-i") == 1
+    assert cmd[cmd.index("-vf") + 1].endswith(":charenc=utf-8")
+
+
+def test_stream_rules(tmp_path):
+    """Test build_conversion_cmd() maps the streams chosen by rules."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mkv")
+    task.video.streams = [
+        Stream(0, "video", "h264", None, None, True, False, False),
+        Stream(1, "audio", "dts", "eng", None, True, False, False),
+        Stream(2, "audio", "ac3", "spa", None, False, False, False),
+    ]
+    task.stream_rules = StreamRules(audio_languages=("es",))
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[2:6] == ["-map", "0:0", "-map", "0:2"]
+    task.profile.qualities["A"] = FakeQuality("-acodec libmp3lame", ".mp3", "")
+    cmd = task.build_conversion_cmd("A", tagged=False, subtitle=False)
+    assert cmd[2:5] == ["-vn", "-map", "0:2"]
+
+
+def test_stream_rules_subtitles(tmp_path):
+    """Test build_conversion_cmd() keeps the subtitles the output holds."""
+    task = make_task(tmp_path, "-vcodec libx264", ".mp4")
+    task.video.streams = [
+        Stream(0, "video", "h264", None, None, True, False, False),
+        Stream(1, "audio", "ac3", "eng", None, True, False, False),
+        Stream(2, "subtitle", "subrip", "eng", None, False, False, False),
+        Stream(
+            3,
+            "subtitle",
+            "hdmv_pgs_subtitle",
+            "eng",
+            None,
+            False,
+            False,
+            False,
+        ),
+    ]
+    task.stream_rules = StreamRules(subtitle_languages=("en",))
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[2:10] == [
+        "-map",
+        "0:0",
+        "-map",
+        "0:1",
+        "-map",
+        "0:2",
+        "-c:s",
+        "mov_text",
+    ]
+    task.profile.qualities["V"] = FakeQuality("-vcodec mpeg4", ".avi", "")
+    cmd = task.build_conversion_cmd("V", tagged=False, subtitle=False)
+    assert "0:2" not in cmd
+    assert "-c:s" not in cmd
+
+
+def test_stream_target_cmd(tmp_path):
+    """Test build_conversion_cmd() streams to the target."""
+    from videomorph.converter.streaming import StreamTarget
+
+    task = make_task(tmp_path, "-vcodec libx264", ".mkv")
+    task.stream_target = StreamTarget("/tmp/pipe", None, False)
+    cmd = task.build_conversion_cmd("Q", tagged=False, subtitle=False)
+    assert cmd[-4:] == ["-f", "matroska", "-y", "/tmp/pipe"]
+
+
+def test_failed_task_duration(tmp_path):
+    """Test TaskList.duration() doesn't count the failed tasks."""
+    task_list = TaskList(FakeProfile())
+    task_list += [
+        make_task(tmp_path, "-vcodec libx264", ".mp4") for _ in range(2)
+    ]
+    assert task_list.duration() == 1200.0
+    task_list.position = 0
+    task_list.fail_running_task(None, ["Error"])
+    assert task_list.duration(step=0) == 600.0
+    assert task_list[0].error_tail == ["Error"]
+
+
+def test_running_task_partners(tmp_path):
+    """Test the queued tasks sharing the running task input are merged."""
+    task_list = TaskList(FakeProfile())
+    video_path = Path(tmp_path, "a.mov")
+    video_path.touch()
+    other_path = Path(tmp_path, "b.mov")
+    other_path.touch()
+    for path in (video_path, other_path, video_path, video_path):
+        task_list.append(
+            Task(fake_video(path), task_list._profile, str(tmp_path))
+        )
+    task_list[3].status = STATUS.done
+    task_list.position = 0
+    qualities = {0: "Q", 1: "Q", 2: "W", 3: "W"}
+    cmd = task_list.running_task_conversion_cmd("Q", False, False)
+    partners = task_list.running_task_partners(cmd, qualities, False, False)
+    assert [partner.position for partner in partners] == [2]
+    assert partners[0].output_path == str(tmp_path / "a.webm")
+    # The profile points back to the running task quality
+    assert task_list.running_task_output_path(False) == str(tmp_path / "a.mp4")
+    task_list.merge_inputs = False
+    assert not task_list.running_task_partners(cmd, qualities, False, False)
@@ -126,3 +126,19 @@ def test_write_size_mib():
 def test_write_size_gib():
     """Test write_size() with GiB."""
     assert utils.write_size(1585558454) == "1.5GiB"
+
+
+def test_read_time():
+    """Read times in the supported formats."""
+    assert utils.read_time("90") == 90
+    assert utils.read_time("01:30.5") == 90.5
+    assert utils.read_time("01:00:05") == 3605
+    assert utils.read_time(utils.write_time(3605)) == 3605
+
+
+def test_read_time_invalid():
+    """Read invalid times (raises a ValueError)."""
+    with pytest.raises(ValueError):
+        utils.read_time("ten")
+    with pytest.raises(ValueError):
+        utils.read_time("1:2:3:4")
@@ -42,7 +42,10 @@ VIDEO_FILTERS = (
 
 VALID_VIDEO_EXT = {ext.lstrip("*") for ext in VIDEO_FILTERS.split()}
 
-MediaFileStatus = namedtuple("MediaFileStatus", "todo done stopped")
-STATUS = MediaFileStatus("Todo", "Done", "Stopped")
+MediaFileStatus = namedtuple("MediaFileStatus", "todo done stopped failed")
+STATUS = MediaFileStatus("Todo", "Done", "Stopped", "Failed")
+
+JobStatus = namedtuple("JobStatus", "todo running done failed cancelled")
+JOB_STATUS = JobStatus("Todo", "Running", "Done", "Failed", "Cancelled")
 
 CPU_CORES = cpu_count() - 1 if cpu_count() is not None else 0
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+# File name: abr.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides the adaptive bitrate (ABR) ladder packaging.
+
+The video is decoded and filtered once, split into scaled renditions and
+every rendition is encoded in the same process, then packaged as HLS or
+DASH playlists and segments. The renditions are the rungs of the ladder
+that are not bigger than the source.
+
+Run with: python -m videomorph.converter.abr VIDEO OUTPUT_DIR
+"""
+
+import argparse
+from collections import namedtuple
+from pathlib import Path
+
+from . import APP_NAME, VERSION
+from .batch import ConversionError
+from .errors import classify_exit, merge_errors
+from .joblog import JobLog, log_name
+from .reader import OutputReader
+from .runner import ProcessRunner
+
+Rendition = namedtuple("Rendition", "name height video_bitrate audio_bitrate")
+
+ABR_LADDER = (
+    Rendition("1080p", 1080, 5000, 192),
+    Rendition("720p", 720, 2800, 128),
+    Rendition("480p", 480, 1400, 128),
+    Rendition("360p", 360, 800, 96),
+    Rendition("240p", 240, 400, 64),
+)
+
+PACKAGING = namedtuple("PACKAGING", "hls dash")("hls", "dash")
+PLAYLIST_NAMES = {PACKAGING.hls: "master.m3u8", PACKAGING.dash: "manifest.mpd"}
+
+SEGMENT_SECONDS = 4
+VIDEO_CODEC = "libx264"
+AUDIO_CODEC = "aac"
+# A source slightly smaller than a rung, like a cropped 1080p, still gets
+# it, at the source height
+HEIGHT_TOLERANCE = 0.05
+
+
+def select_renditions(source_height, ladder=ABR_LADDER):
+    """Return the renditions of the ladder for a source height.
+
+    A source smaller than every rung gets the smallest one, at the source
+    height.
+    """
+    if source_height <= 0:
+        raise ValueError("Invalid source height: {0}".format(source_height))
+
+    even_height = max(source_height // 2 * 2, 2)
+    renditions = [
+        rendition._replace(height=min(rendition.height, even_height))
+        for rendition in ladder
+        if rendition.height <= source_height * (1 + HEIGHT_TOLERANCE)
+    ]
+    if not renditions:
+        smallest = min(ladder, key=lambda rendition: rendition.height)
+        renditions = [smallest._replace(height=even_height)]
+    return renditions
+
+
+def ladder_filter(renditions):
+    """Return the filter graph splitting the video into the renditions."""
+    splits = "".join(
+        "[v{0}]".format(index) for index in range(len(renditions))
+    )
+    graph = ["[0:v:0]split={0}{1}".format(len(renditions), splits)]
+    for index, rendition in enumerate(renditions):
+        graph.append(
+            "[v{0}]scale=-2:{1}[v{0}out]".format(index, rendition.height)
+        )
+    return ";".join(graph)
+
+
+def ladder_cmd(
+    video_path,
+    renditions,
+    output_dir,
+    packaging=PACKAGING.hls,
+    has_audio=True,
+    segment_seconds=SEGMENT_SECONDS,
+    video_codec=VIDEO_CODEC,
+):
+    """Return the command to encode and package the renditions.
+
+    Args:
+        video_path (str): Path to the source video
+        renditions (list): Renditions to encode, from select_renditions()
+        output_dir (str): Directory for the playlists and segments
+        packaging (str): One of PACKAGING
+        has_audio (bool): True if the source has an audio stream
+        segment_seconds (int): Duration of the segments
+        video_codec (str): Encoder of the video renditions
+    """
+    if packaging not in PACKAGING:
+        raise ValueError("Unknown packaging: {0}".format(packaging))
+
+    # The segment muxers take % as the start of a format field
+    output_dir = str(output_dir).replace("%", "%%")
+    cmd = ["-i", str(video_path), "-filter_complex", ladder_filter(renditions)]
+
+    for index, rendition in enumerate(renditions):
+        cmd += ["-map", "[v{0}out]".format(index)]
+        cmd += [
+            "-c:v:{0}".format(index),
+            video_codec,
+            "-b:v:{0}".format(index),
+            "{0}k".format(rendition.video_bitrate),
+            "-maxrate:v:{0}".format(index),
+            "{0}k".format(rendition.video_bitrate),
+            "-bufsize:v:{0}".format(index),
+            "{0}k".format(2 * rendition.video_bitrate),
+        ]
+
+    # HLS variants carry their own audio, DASH shares one audio track
+    audio_renditions = []
+    if has_audio:
+        audio_renditions = (
+            renditions if packaging == PACKAGING.hls else renditions[:1]
+        )
+    for index, rendition in enumerate(audio_renditions):
+        cmd += [
+            "-map",
+            "0:a:0",
+            "-c:a:{0}".format(index),
+            AUDIO_CODEC,
+            "-b:a:{0}".format(index),
+            "{0}k".format(rendition.audio_bitrate),
+        ]
+
+    # Keyframes at the segment boundaries, so every rendition switches at
+    # the same points
+    cmd += [
+        "-force_key_frames",
+        "expr:gte(t,n_forced*{0})".format(segment_seconds),
+    ]
+
+    if packaging == PACKAGING.hls:
+        variants = []
+        for index, rendition in enumerate(renditions):
+            variant = "v:{0}".format(index)
+            if has_audio:
+                variant += ",a:{0}".format(index)
+            variants.append(variant + ",name:" + rendition.name)
+        cmd += [
+            "-f",
+            "hls",
+            "-hls_time",
+            str(segment_seconds),
+            "-hls_playlist_type",
+            "vod",
+            "-hls_segment_filename",
+            str(Path(output_dir, "%v", "segment_%05d.ts")),
+            "-master_pl_name",
+            PLAYLIST_NAMES[PACKAGING.hls],
+            "-var_stream_map",
+            " ".join(variants),
+            "-y",
+            str(Path(output_dir, "%v", "index.m3u8")),
+        ]
+    else:
+        adaptation_sets = "id=0,streams=v"
+        if has_audio:
+            adaptation_sets += " id=1,streams=a"
+        cmd += [
+            "-f",
+            "dash",
+            "-seg_duration",
+            str(segment_seconds),
+            "-use_template",
+            "1",
+            "-use_timeline",
+            "1",
+            "-adaptation_sets",
+            adaptation_sets,
+            "-y",
+            str(Path(output_dir, PLAYLIST_NAMES[PACKAGING.dash])),
+        ]
+
+    return cmd
+
+
+class ABRJob:
+    """Class to package a video as an adaptive bitrate ladder."""
+
+    def __init__(
+        self,
+        video_path,
+        output_dir,
+        packaging=PACKAGING.hls,
+        ladder=ABR_LADDER,
+        segment_seconds=SEGMENT_SECONDS,
+        runner_factory=ProcessRunner,
+        video_factory=None,
+        log_dir=None,
+    ):
+        """Class initializer.
+
+        Args:
+            video_path (str): Path to the source video
+            output_dir (str): Directory for the playlists and segments
+            packaging (str): One of PACKAGING
+            ladder (tuple): Renditions to pick from, largest first
+            segment_seconds (int): Duration of the segments
+            runner_factory (callable): Return a new ProcessRunner
+            video_factory (callable): Return a Video from a path
+            log_dir (str): Directory for the log file, None for no file
+        """
+        if packaging not in PACKAGING:
+            raise ValueError("Unknown packaging: {0}".format(packaging))
+        if video_factory is None:
+            from .video import Video
+
+            video_factory = Video
+
+        self.video = video_factory(video_path)
+        if not self.video.is_valid():
+            raise ValueError("Invalid video: {0}".format(video_path))
+
+        self.output_dir = Path(output_dir)
+        self.packaging = packaging
+        self.ladder = ladder
+        self.segment_seconds = segment_seconds
+        self._runner_factory = runner_factory
+        self._log_dir = log_dir
+
+    @property
+    def renditions(self):
+        """Return the renditions for the source resolution."""
+        try:
+            source_height = int(self.video.video_info["height"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(
+                "Unknown resolution: {0}".format(self.video.path)
+            ) from None
+        return select_renditions(source_height, self.ladder)
+
+    @property
+    def playlist_path(self):
+        """Return the path of the master playlist."""
+        return Path(self.output_dir, PLAYLIST_NAMES[self.packaging])
+
+    def cmd(self, renditions=None):
+        """Return the command to encode and package the ladder."""
+        return ladder_cmd(
+            self.video.path,
+            self.renditions if renditions is None else renditions,
+            self.output_dir,
+            packaging=self.packaging,
+            has_audio=bool(self.video.audio_info),
+            segment_seconds=self.segment_seconds,
+        )
+
+    def run(self, on_progress=None):
+        """Encode and package the ladder, return the master playlist path.
+
+        Args:
+            on_progress (callable): Called with the progress percentage
+        """
+        renditions = self.renditions
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.packaging == PACKAGING.hls:
+            for rendition in renditions:
+                Path(self.output_dir, rendition.name).mkdir(exist_ok=True)
+
+        reader = OutputReader()
+        log = JobLog(
+            None
+            if self._log_dir is None
+            else Path(self._log_dir, log_name(self.playlist_path))
+        )
+        try:
+            duration = float(self.video.format_info["duration"])
+        except (KeyError, ValueError):
+            duration = 0
+        library_error = [None]
+        runner = self._runner_factory()
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                runner.kill()
+                return
+            if on_progress is not None and reader.has_time_read and duration:
+                on_progress(min(int(reader.time / duration * 100), 100))
+
+        try:
+            exit_code = runner.run(self.cmd(renditions), on_output=on_output)
+        finally:
+            log.close()
+
+        error = classify_exit(exit_code, library_error[0])
+        if error is not None:
+            # Players must not pick up a partial ladder
+            self.playlist_path.unlink(missing_ok=True)
+            raise ConversionError(
+                self.playlist_path, exit_code, "\n".join(log.tail()), error
+            )
+
+        if on_progress is not None:
+            on_progress(100)
+        return self.playlist_path
+
+
+def main(args=None):
+    """Package a video as an adaptive bitrate ladder."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " ABR ladder"
+    )
+    parser.add_argument("video_path")
+    parser.add_argument("output_dir")
+    parser.add_argument(
+        "--packaging", choices=PACKAGING, default=PACKAGING.hls
+    )
+    parser.add_argument(
+        "--segment-seconds",
+        type=int,
+        default=SEGMENT_SECONDS,
+        help="duration of the segments",
+    )
+    args = parser.parse_args(args)
+
+    try:
+        job = ABRJob(
+            args.video_path,
+            args.output_dir,
+            packaging=args.packaging,
+            segment_seconds=args.segment_seconds,
+        )
+        renditions = job.renditions
+        print(
+            "Renditions: {0}".format(
+                ", ".join(rendition.name for rendition in renditions)
+            )
+        )
+        playlist_path = job.run()
+    except (ConversionError, OSError, ValueError) as error:
+        print("Failed: {0}".format(error))
+        return 1
+
+    print("Packaged into {0}".format(playlist_path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
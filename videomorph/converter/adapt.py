@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# File name: adapt.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides the adaptation of preset params to a source video.
+
+Presets force an output size (-s) and frame rate (-r). Upscaling a small
+source or raising its frame rate costs CPU and adds no quality, so both
+are capped at the source values. Compliance targets, like DVD or VCD,
+keep the preset values because players require them.
+"""
+
+import re
+from fractions import Fraction
+
+# Formats whose size and frame rate are fixed by a standard
+COMPLIANCE_FORMATS = {"dvd", "svcd", "vcd"}
+
+# Frame rates closer than this are the same, like 29.97 and 30000/1001
+FRAME_RATE_TOLERANCE = 0.01
+
+_SIZE_REGEX = re.compile(r"^(\d+)[x:](\d+)$")
+
+
+def is_compliance_target(params):
+    """Return True if the preset params target a strict standard."""
+    if "-target" in params:
+        return True
+    return any(
+        option == "-f" and value in COMPLIANCE_FORMATS
+        for option, value in zip(params, params[1:])
+    )
+
+
+def parse_frame_rate(value):
+    """Convert a frame rate like '30000/1001' or '29.97' to a float."""
+    try:
+        return float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def cap_size(size, source_width, source_height):
+    """Return a preset size that doesn't exceed the source size.
+
+    The preset shape is kept and both sides are rounded to even numbers,
+    as most encoders require.
+    """
+    match = _SIZE_REGEX.match(size)
+    if match is None:
+        return size
+
+    width, height = int(match.group(1)), int(match.group(2))
+    factor = min(source_width / width, source_height / height)
+    if factor >= 1:
+        return size
+
+    return "{0}x{1}".format(
+        max(int(width * factor) // 2 * 2, 2),
+        max(int(height * factor) // 2 * 2, 2),
+    )
+
+
+def adapt_params(params, video):
+    """Return the preset params capped at the source size and frame rate.
+
+    Args:
+        params (list): Preset params, split into arguments
+        video (Video): Source video, probed for its size and frame rate
+    """
+    if is_compliance_target(params):
+        return list(params)
+
+    adapted = []
+    args = iter(params)
+    for option in args:
+        if option == "-s":
+            size = next(args, None)
+            if size is not None:
+                size = _adapt_size(size, video)
+            adapted.extend(["-s", size] if size is not None else ["-s"])
+        elif option == "-r":
+            frame_rate = next(args, None)
+            if frame_rate is None:
+                adapted.append("-r")
+            elif not _exceeds_source_rate(frame_rate, video):
+                adapted.extend(["-r", frame_rate])
+            # Else drop -r, the output keeps the source frame rate
+        else:
+            adapted.append(option)
+
+    return adapted
+
+
+def _adapt_size(size, video):
+    """Cap a preset size using the probed source size."""
+    info = getattr(video, "video_info", None) or {}
+    try:
+        source_width, source_height = int(info["width"]), int(info["height"])
+    except (KeyError, TypeError, ValueError):
+        return size
+
+    if source_width <= 0 or source_height <= 0:
+        return size
+
+    return cap_size(size, source_width, source_height)
+
+
+def _exceeds_source_rate(frame_rate, video):
+    """Return True if a preset frame rate is over the source one."""
+    source_rate = parse_frame_rate(getattr(video, "frame_rate", None))
+    target_rate = parse_frame_rate(frame_rate)
+    if not source_rate or target_rate is None:
+        return False
+
+    return target_rate > source_rate + FRAME_RATE_TOLERANCE
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+# File name: batch.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides a Qt free API for batch conversion.
+
+Example:
+    futures = convert_many(paths, "MP4 Fullscreen 640x480 (4:3)",
+                           output_dir, max_workers=2,
+                           on_progress=lambda path, percent: ...)
+    for future in concurrent.futures.as_completed(futures):
+        print(future.result())  # Output file path
+"""
+
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from pathlib import Path
+
+from . import CPU_CORES, STATUS
+from .errors import classify_exit, merge_errors
+from .joblog import JobLog, log_name
+from .reader import OutputReader
+from .resources import ResourcePool
+from .runner import ProcessRunner
+
+
+class ConversionError(Exception):
+    """Raised when the conversion library fails on a video."""
+
+    def __init__(self, video_path, exit_code, output="", error=None):
+        super(ConversionError, self).__init__(
+            "Conversion of {0} failed with exit code {1}{2}".format(
+                video_path,
+                exit_code,
+                "" if error is None else ": {0}".format(error.kind),
+            )
+        )
+        self.video_path = video_path
+        self.exit_code = exit_code
+        self.output = output
+        self.error = error
+
+
+class BatchConverter:
+    """Class to run conversions in a pool of worker threads."""
+
+    def __init__(
+        self,
+        max_workers=None,
+        profile_factory=None,
+        runner_factory=ProcessRunner,
+        video_factory=None,
+        resources=None,
+        log_dir=None,
+        cache=None,
+        split=None,
+        preset_resources=None,
+        pin_cpus=False,
+    ):
+        """Class initializer.
+
+        Args:
+            max_workers (int): Maximum number of parallel conversions
+            profile_factory (callable): Return a new Profile, every worker
+                thread gets its own one
+            runner_factory (callable): Return a new ProcessRunner
+            video_factory (callable): Return a Video from a path
+            resources (ResourcePolicy): Priority and limits for every job
+            log_dir (str): Directory for per-job log files, None to keep
+                only the last lines in memory
+            cache (OutputCache): Cache of conversion outputs, None for no
+                cache
+            split (SplitLimits): Split every output into parts by stream
+                copy, None to keep whole outputs
+            preset_resources (dict): ResourcePolicy per target quality,
+                used instead of resources
+            pin_cpus (bool): Pin every worker to its own CPU set
+        """
+        if profile_factory is None:
+            from .profile import Profile
+
+            profile_factory = Profile
+        if video_factory is None:
+            from .video import Video
+
+            video_factory = Video
+
+        self._profile_factory = profile_factory
+        self._runner_factory = runner_factory
+        self._video_factory = video_factory
+        max_workers = max_workers or max(CPU_CORES, 1)
+        self._resources = ResourcePool(
+            resources,
+            jobs=max_workers if pin_cpus else None,
+            presets=preset_resources,
+        )
+        self._log_dir = log_dir
+        self._cache = cache
+        self._split = split
+        # update() changes a Profile, so workers must not share one
+        self._local = threading.local()
+        # Running runners, guarded by _lock since workers add and discard
+        # them while shutdown() terminates them
+        self._runners = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="videomorph",
+        )
+
+    def submit(
+        self,
+        video_path,
+        target_quality,
+        output_dir,
+        tagged=False,
+        subtitle=False,
+        on_progress=None,
+    ):
+        """Schedule a conversion and return a Future with the output path.
+
+        With split limits, the Future resolves to the list of part paths.
+        on_progress is called from a worker thread with the video path
+        and the progress percentage.
+        """
+        return self._executor.submit(
+            self._convert,
+            video_path,
+            target_quality,
+            output_dir,
+            tagged,
+            subtitle,
+            on_progress,
+        )
+
+    def shutdown(self, wait=True, cancel=False):
+        """Shutdown the pool, optionally terminating the running jobs."""
+        if cancel:
+            with self._lock:
+                # Jobs starting from now on are refused
+                self._cancelled = True
+                runners = list(self._runners)
+            for runner in runners:
+                runner.terminate()
+        self._executor.shutdown(wait=wait, cancel_futures=cancel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True, cancel=exc_type is not None)
+
+    def _convert(
+        self,
+        video_path,
+        target_quality,
+        output_dir,
+        tagged,
+        subtitle,
+        on_progress,
+    ):
+        resources = self._resources.acquire(target_quality)
+        try:
+            return self._run_conversion(
+                video_path,
+                target_quality,
+                output_dir,
+                tagged,
+                subtitle,
+                on_progress,
+                resources,
+            )
+        finally:
+            self._resources.release(resources)
+
+    def _run_conversion(
+        self,
+        video_path,
+        target_quality,
+        output_dir,
+        tagged,
+        subtitle,
+        on_progress,
+        resources,
+    ):
+        from .task import Task
+
+        video = self._video_factory(video_path)
+        if not video.is_valid():
+            raise ValueError("Invalid video: {0}".format(video_path))
+
+        task = Task(video, self._get_profile(), output_dir)
+        cmd = task.build_conversion_cmd(
+            target_quality=target_quality,
+            tagged=tagged,
+            subtitle=subtitle,
+            resources=resources,
+        )
+        output_path = task.get_output_path(tagged)
+
+        cache_key = None
+        if self._cache is not None:
+            try:
+                cache_key = self._cache.key(
+                    cmd,
+                    video.path,
+                    output_path,
+                    sidecars=task.sidecar_paths(subtitle),
+                )
+            except OSError:
+                # Convert uncached if the inputs can't be fingerprinted
+                cache_key = None
+        if cache_key is not None:
+            if self._cache.fetch(cache_key, output_path):
+                task.status = STATUS.done
+                if on_progress is not None:
+                    on_progress(video_path, 100)
+                return self._split_output(output_path)
+            self._cache.prepare(output_path)
+
+        reader = OutputReader()
+        log = JobLog(
+            None
+            if self._log_dir is None
+            else Path(self._log_dir, log_name(video_path))
+        )
+        duration = float(video.format_info["duration"])
+        last_progress = [-1]
+        library_error = [None]
+        runner = self._runner_factory()
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                # The conversion is doomed, don't wait for it to end
+                runner.kill()
+                return
+            if on_progress is None or not reader.has_time_read:
+                return
+            progress = min(int(reader.time / duration * 100), 100)
+            if progress != last_progress[0]:
+                last_progress[0] = progress
+                on_progress(video_path, progress)
+
+        with self._lock:
+            if self._cancelled:
+                log.close()
+                raise CancelledError("The converter was shut down")
+            self._runners.add(runner)
+        try:
+            exit_code = runner.run(
+                cmd, on_output=on_output, resources=resources
+            )
+        finally:
+            with self._lock:
+                self._runners.discard(runner)
+            log.close()
+
+        error = classify_exit(exit_code, library_error[0])
+        if error is not None:
+            task.status = STATUS.failed
+            # Never derive the path again, it could now be the input
+            Path(output_path).unlink(missing_ok=True)
+            raise ConversionError(
+                video_path, exit_code, "\n".join(log.tail()), error
+            )
+
+        task.status = STATUS.done
+        if cache_key is not None:
+            self._cache.store(cache_key, output_path)
+        if on_progress is not None and last_progress[0] != 100:
+            on_progress(video_path, 100)
+
+        return self._split_output(output_path)
+
+    def _get_profile(self):
+        """Return the Profile of the current worker thread."""
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = self._profile_factory()
+        return profile
+
+    def _split_output(self, output_path):
+        """Split an output into parts if split limits were given."""
+        if self._split is None:
+            return output_path
+
+        from .split import Splitter
+
+        splitter = Splitter(
+            runner_factory=self._runner_factory,
+            video_factory=self._video_factory,
+            log_dir=self._log_dir,
+        )
+        return splitter.split(output_path, self._split, delete_source=True)
+
+
+def convert_many(
+    paths, target_quality, output_dir, max_workers=None, **options
+):
+    """Convert several videos in parallel and return a list of Futures.
+
+    Keyword options (tagged, subtitle, on_progress) are passed to
+    BatchConverter.submit. Every Future resolves to the output path or
+    raises ConversionError.
+    """
+    converter = BatchConverter(max_workers=max_workers)
+    futures = [
+        converter.submit(path, target_quality, output_dir, **options)
+        for path in paths
+    ]
+    converter.shutdown(wait=False)
+
+    return futures
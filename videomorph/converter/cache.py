@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+# File name: cache.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides a content-addressed cache of conversion outputs.
+
+Entries are keyed by the input content, the exact conversion arguments and
+the conversion library version, so the same clip converted with the same
+preset from another path or name is a cache hit.
+
+The cache only speeds conversions up, so its I/O errors are logged and
+the conversion goes on uncached.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from . import SYS_PATHS
+from .fingerprint import fast_fingerprint
+from .vmpath import LIBRARY_PATH
+
+CACHE_DIR = Path(SYS_PATHS["config"], "cache")
+CACHE_MAX_BYTES = 20 * 1024**3
+
+# Linux ioctl to share the data blocks of two files (reflink)
+FICLONE = 0x40049409
+
+_log = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def library_version(library_path=LIBRARY_PATH):
+    """Return the version line of the conversion library."""
+    try:
+        output = subprocess.run(
+            [library_path, "-version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        ).stdout
+    except (OSError, TypeError):
+        return ""
+    return output.decode("utf-8", errors="replace").partition("\n")[0]
+
+
+def clone_file(source, target, link=True):
+    """Copy source to target sharing the data when possible.
+
+    A reflink is tried first, then a hard link if link is True, then a
+    regular copy.
+    """
+    try:
+        import fcntl
+
+        with open(source, "rb") as source_file, open(
+            target, "wb"
+        ) as target_file:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+        return
+    except (ImportError, OSError):
+        Path(target).unlink(missing_ok=True)
+
+    if link:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(source, target)
+
+
+class OutputCache:
+    """Class to store conversion outputs by content, with LRU eviction."""
+
+    def __init__(
+        self,
+        cache_dir=CACHE_DIR,
+        max_bytes=CACHE_MAX_BYTES,
+        version=None,
+        fingerprint=fast_fingerprint,
+    ):
+        """Class initializer.
+
+        Args:
+            cache_dir (str): Directory to store the entries
+            max_bytes (int): Maximum size of the cache
+            version (str): Conversion library version, read if None
+            fingerprint (callable): Return the content fingerprint of an
+                input, use fingerprint.full_fingerprint to read whole
+                files
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._version = version
+        self._fingerprint = fingerprint
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Return the conversion library version the entries depend on."""
+        if self._version is None:
+            self._version = library_version()
+        return self._version
+
+    def key(self, cmd, input_path, output_path, sidecars=()):
+        """Return the cache key of a conversion command.
+
+        The paths are left out, so only the content and the arguments
+        matter.
+
+        Args:
+            cmd (list): Conversion command
+            input_path (str): Path to the input video
+            output_path (str): Path to the output file
+            sidecars (list): Other files the command reads, like subtitles
+        """
+        paths = {str(input_path): "{input}", str(output_path): "{output}"}
+        for index, sidecar in enumerate(sidecars):
+            paths[str(sidecar)] = "{{sidecar{0}}}".format(index)
+        args = []
+        for arg in cmd:
+            # Sidecars may be part of an argument, like a subtitles filter
+            for path, name in paths.items():
+                arg = name if arg == path else arg.replace(path, name)
+            args.append(arg)
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    self._fingerprint(input_path),
+                    [self._fingerprint(sidecar) for sidecar in sidecars],
+                    args,
+                    Path(output_path).suffix.lower(),
+                    self.version,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def entry_path(self, key):
+        """Return the path of a cache entry."""
+        return Path(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """Copy a cached output to output_path, return True on a hit."""
+        entry = self.entry_path(key)
+        if not entry.is_file():
+            return False
+
+        try:
+            # Mark the entry as recently used
+            os.utime(entry)
+            output_path = Path(output_path)
+            output_path.unlink(missing_ok=True)
+            clone_file(entry, output_path)
+        except OSError as error:
+            # The entry may have been evicted since is_file()
+            _log.warning("Cache entry %s not fetched: %s", key, error)
+            return False
+        return True
+
+    def store(self, key, output_path):
+        """Add a conversion output to the cache, return True if stored."""
+        entry = self.entry_path(key)
+        temp_path = entry.with_name(entry.name + ".tmp")
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Never hard link here, the output could be overwritten in place
+            clone_file(output_path, temp_path, link=False)
+            os.replace(temp_path, entry)
+        except OSError as error:
+            _log.warning("Output %s not cached: %s", output_path, error)
+            try:
+                temp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return False
+        self.evict()
+        return True
+
+    def prepare(self, output_path):
+        """Unlink an output sharing its data with an entry before a run."""
+        output_path = Path(output_path)
+        try:
+            if output_path.is_file() and output_path.stat().st_nlink > 1:
+                output_path.unlink()
+        except OSError as error:
+            _log.warning("Output %s not prepared: %s", output_path, error)
+
+    @property
+    def size(self):
+        """Return the size of the cache in bytes."""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self):
+        """Delete the least recently used entries over max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    entry.unlink(missing_ok=True)
+                except OSError as error:
+                    _log.warning("Cache entry not evicted: %s", error)
+                    continue
+                total -= size
+
+    def _entries(self):
+        if not self.cache_dir.is_dir():
+            return []
+        return [
+            entry
+            for entry in self.cache_dir.glob("??/*")
+            if not entry.name.endswith(".tmp")
+        ]
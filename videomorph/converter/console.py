@@ -26,6 +26,7 @@ from os.path import isdir
 from pathlib import Path
 
 from . import APP_NAME, VALID_VIDEO_EXT, VERSION
+from .manifest import ScanManifest
 
 
 def run_on_console(app, main_win):
@@ -52,6 +53,12 @@ def run_on_console(app, main_win):
         dest="input_dir",
     )
 
+    parser.add_argument(
+        "--rescan",
+        help="ignore the scan manifest and list every directory again",
+        action="store_true",
+    )
+
     # Process the command line input
     args = parser.parse_args()
 
@@ -69,9 +76,12 @@ def run_on_console(app, main_win):
                 )
 
     if args.input_dir:
+        manifest = ScanManifest()
+        if args.rescan:
+            manifest.dirs.clear()
         try:
             files = search_directory_recursively(
-                directory=args.input_dir, files=files
+                directory=args.input_dir, files=files, manifest=manifest
             )
         except IsADirectoryError as error:
             print(error, file=sys.stderr)
@@ -88,12 +98,21 @@ def run_on_console(app, main_win):
         sys.exit(app.exec())
 
 
-def search_directory_recursively(directory, files=None):
-    """Search a directory for video files."""
+def search_directory_recursively(directory, files=None, manifest=None):
+    """Search a directory for video files.
+
+    Args:
+        directory (str): Directory to search
+        files (list): List to extend with the video files found
+        manifest (ScanManifest): Skip listing the unchanged directories
+    """
     if files is None:
         files = []
 
-    if isdir(directory):
+    if isdir(directory) and manifest is not None:
+        files.extend(manifest.scan(directory))
+        manifest.save()
+    elif isdir(directory):
         for dir_path, _, files_names in walk(directory):
             for file_name in files_names:
                 path = Path(dir_path, file_name)
@@ -19,61 +19,105 @@
 
 """This module provides Converter Class."""
 
-from PyQt6.QtCore import QProcess
+import threading
 
+from PyQt6.QtCore import QObject, QProcess, pyqtSignal
+
+from . import JOB_STATUS
+from .engine import EVENT, EngineJob, ThreadedEngine
 from .vmpath import LIBRARY_PATH
 
 
-class Converter:
-    """_Converter class to provide conversion functionality."""
+class Converter(QObject):
+    """_Converter class to provide conversion functionality.
 
-    def __init__(self, library_path=LIBRARY_PATH):
-        """Class initializer."""
-        self._library_path = library_path
-        self._process = QProcess()
-        self._process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+    It adapts the asyncio ConversionEngine to Qt: engine events are turned
+    into signals, which Qt delivers in the GUI thread.
+    """
 
-    def setup_converter(self, reader, finisher):#, process_channel):
-        """Set up the QProcess object."""
-        #self._process.setProcessChannelMode(process_channel)
-        self._process.readyRead.connect(reader)
-        self._process.finished.connect(finisher)
+    ready_read = pyqtSignal()
+    finished = pyqtSignal()
 
-    def start_converter(self, cmd):
+    def __init__(self, library_path=LIBRARY_PATH, engine=None):
+        """Class initializer."""
+        super(Converter, self).__init__()
+        self._library_path = library_path
+        self._engine = engine or ThreadedEngine()
+        self._engine.add_listener(self._on_engine_event)
+        self._job = None
+        self._output = []
+        self._output_lock = threading.Lock()
+
+    def setup_converter(self, reader, finisher):
+        """Connect the output reader and the finisher."""
+        self.ready_read.connect(reader)
+        self.finished.connect(finisher)
+
+    def start_converter(self, cmd, resources=None):
         """Start the encoding process."""
-        self._process.start(self._library_path, cmd)
+        self._job = EngineJob(cmd=cmd, resources=resources)
+        self._engine.submit(self._job)
 
     def stop_converter(self):
         """Terminate the encoding process."""
-        self._process.terminate()
-        if self.converter_is_running:
-            self._process.kill()
+        if self._job is not None:
+            self._engine.kill(self._job.id)
 
     def converter_finished_disconnect(self, connected):
-        """Disconnect the QProcess.finished method."""
-        self._process.finished.disconnect(connected)
+        """Disconnect the finished signal."""
+        self.finished.disconnect(connected)
 
     def close_converter(self):
-        """Call QProcess.close method."""
-        self._process.close()
+        """Drop the output of the finished process."""
+        with self._output_lock:
+            self._output.clear()
 
     def kill_converter(self):
-        """Call QProcess.kill method."""
-        self._process.kill()
+        """Kill the encoding process."""
+        self.stop_converter()
 
     def converter_state(self):
-        """Call QProcess.state method."""
-        return self._process.state()
+        """Return the process state as a QProcess.ProcessState."""
+        if self._job is None or self._job.status not in (
+            JOB_STATUS.todo,
+            JOB_STATUS.running,
+        ):
+            return QProcess.ProcessState.NotRunning
+        if self._job.is_running:
+            return QProcess.ProcessState.Running
+        return QProcess.ProcessState.Starting
 
     def converter_exit_status(self):
-        """Call QProcess.exit_status method."""
-        return self._process.exitStatus()
+        """Return the process exit status as a QProcess.ExitStatus."""
+        exit_code = self.converter_exit_code()
+        if exit_code is None or exit_code < 0:
+            return QProcess.ExitStatus.CrashExit
+        return QProcess.ExitStatus.NormalExit
+
+    def converter_exit_code(self):
+        """Return the process exit code, None if it did not exit."""
+        return None if self._job is None else self._job.exit_code
 
     def read_converter_output(self):
-        """Call QProcess.readAll method."""
-        return str(self._process.readAll())
+        """Return the output produced since the last read."""
+        with self._output_lock:
+            output = "".join(self._output)
+            self._output.clear()
+        return output
 
     @property
     def converter_is_running(self):
-        """Return QProcess state."""
-        return self._process.state() == QProcess.ProcessState.Running
+        """Return True if the process is starting or running."""
+        return self.converter_state() != QProcess.ProcessState.NotRunning
+
+    def _on_engine_event(self, event):
+        """Turn engine events into signals (called in the engine thread)."""
+        if event.job is not self._job:
+            return
+
+        if event.kind == EVENT.output:
+            with self._output_lock:
+                self._output.append(event.data)
+            self.ready_read.emit()
+        elif event.kind == EVENT.finished:
+            self.finished.emit()
@@ -0,0 +1,701 @@
+# -*- coding: utf-8 -*-
+
+# File name: daemon.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides a local job server with a JSON API.
+
+The server owns one queue and one IOScheduler, so many clients can submit
+conversions without oversubscribing the machine. Queued jobs sharing an
+input run as one multi-output process, so the input is decoded once. The
+API is served over local HTTP or a Unix socket:
+
+    GET  /                       read-only progress page
+    GET  /jobs                   list the jobs
+    GET  /jobs/<id>              show a job
+    GET  /stats                  queue statistics
+    POST /jobs                   submit {video_path, target_quality,
+                                         output_dir, tagged, subtitle,
+                                         priority}
+    POST /jobs/<id>/cancel       cancel a queued or running job
+    POST /jobs/<id>/priority     set {priority}, higher runs first
+
+POST requests must send a JSON body, and over HTTP they must also send
+the token of the server in an "Authorization: Bearer <token>" header, so
+a web page can't submit or cancel jobs.
+"""
+
+import argparse
+import html
+import hmac
+import json
+import os
+import secrets
+import stat
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from . import APP_NAME, JOB_STATUS, STATUS, VERSION
+from .errors import (
+    ERROR_ACTION,
+    classify_exit,
+    error_action,
+    merge_errors,
+)
+from .joblog import LOGS_DIR, JobLog, log_name
+from .reader import OutputReader
+from .resources import (
+    ResourcePool,
+    add_resource_arguments,
+    resources_from_args,
+)
+from .runner import ProcessRunner
+from .scheduler import LIGHT_KINDS, MAX_LIGHT_JOBS, IOScheduler
+from .task import input_args, merge_conversion_cmds
+
+DISPATCH_INTERVAL = 0.5
+
+
+class JobServer:
+    """Class to own the conversion queue and run its jobs."""
+
+    def __init__(
+        self,
+        scheduler=None,
+        profile=None,
+        runner_factory=ProcessRunner,
+        video_factory=None,
+        log_dir=LOGS_DIR,
+        resources=None,
+        preset_resources=None,
+        pin_cpus=False,
+    ):
+        """Class initializer.
+
+        Args:
+            scheduler (IOScheduler): Decide which jobs run in parallel
+            profile (Profile): Conversion profiles, created if None
+            runner_factory (callable): Return a new ProcessRunner
+            video_factory (callable): Return a Video from a path
+            log_dir (str): Directory for per-job logs, None for no files
+            resources (ResourcePolicy): Priority and limits for every job
+            preset_resources (dict): ResourcePolicy per target quality,
+                used instead of resources
+            pin_cpus (bool): Pin every parallel job to its own CPU set
+        """
+        if profile is None:
+            from .profile import Profile
+
+            profile = Profile()
+        if video_factory is None:
+            from .video import Video
+
+            video_factory = Video
+
+        self.scheduler = scheduler or IOScheduler()
+        self._profile = profile
+        self._runner_factory = runner_factory
+        self._video_factory = video_factory
+        self._log_dir = log_dir
+        self.resources = resources
+        self.preset_resources = dict(preset_resources or {})
+        self.pin_cpus = pin_cpus
+        self._pool = self._resource_pool()
+        # Run the queued jobs sharing an input as one multi output run
+        self.merge_inputs = True
+        self._jobs = {}
+        self._tasks = {}
+        self._runners = {}
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+        self._started = time.time()
+
+    def submit(
+        self,
+        video_path,
+        target_quality,
+        output_dir,
+        tagged=False,
+        subtitle=False,
+        priority=0,
+    ):
+        """Add a job to the queue and return its id."""
+        from .task import Task
+
+        video = self._video_factory(video_path)
+        if not video.is_valid():
+            raise ValueError("Invalid video: {0}".format(video_path))
+
+        task = Task(video, self._profile, output_dir)
+        task.target_quality = target_quality
+        kind = task.kind
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._tasks[job_id] = task
+            self._jobs[job_id] = dict(
+                id=job_id,
+                video_path=str(video.path),
+                target_quality=target_quality,
+                output_dir=str(output_dir),
+                tagged=tagged,
+                subtitle=subtitle,
+                priority=priority,
+                kind=kind,
+                status=JOB_STATUS.todo,
+                progress=0,
+                error=None,
+                error_kind=None,
+                log=None,
+                output_path=None,
+                run_with=[],
+                submitted=time.time(),
+                started=None,
+                finished=None,
+            )
+        self._wakeup.set()
+
+        return job_id
+
+    def jobs(self):
+        """Return a copy of all the jobs in queue order."""
+        with self._lock:
+            return [dict(job) for job in self._queue_order()]
+
+    def job(self, job_id):
+        """Return a copy of a job."""
+        with self._lock:
+            return dict(self._jobs[job_id])
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job."""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] == JOB_STATUS.todo:
+                self._close_job(job_id, JOB_STATUS.cancelled)
+            elif job["status"] == JOB_STATUS.running:
+                job["status"] = JOB_STATUS.cancelled
+                self._runners[job_id].terminate()
+
+    def reprioritize(self, job_id, priority):
+        """Change the priority of a job."""
+        with self._lock:
+            self._jobs[job_id]["priority"] = int(priority)
+        self._wakeup.set()
+
+    def stats(self):
+        """Return queue statistics."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            counts = {status: 0 for status in JOB_STATUS}
+            for job in jobs:
+                counts[job["status"]] += 1
+            finished = [
+                job for job in jobs if job["status"] == JOB_STATUS.done
+            ]
+            busy = sum(job["finished"] - job["started"] for job in finished)
+            return dict(
+                jobs=len(jobs),
+                statuses=counts,
+                running=len(self.scheduler.running),
+                max_jobs=self.scheduler.max_jobs,
+                uptime=time.time() - self._started,
+                average_job_time=busy / len(finished) if finished else None,
+            )
+
+    def start(self):
+        """Start dispatching jobs in a background thread."""
+        # The scheduler limits may have changed since the initializer
+        self._pool = self._resource_pool()
+        self._stop.clear()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def stop(self):
+        """Stop dispatching and terminate the running jobs."""
+        self._stop.set()
+        self._wakeup.set()
+        with self._lock:
+            for runner in self._runners.values():
+                runner.terminate()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+
+    def _resource_pool(self):
+        """Return the ResourcePool sized for the scheduler limits."""
+        jobs = None
+        if self.pin_cpus:
+            jobs = self.scheduler.max_jobs + self.scheduler.max_light_jobs
+        return ResourcePool(
+            self.resources, jobs=jobs, presets=self.preset_resources
+        )
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            self._dispatch()
+            self._wakeup.wait(DISPATCH_INTERVAL)
+            self._wakeup.clear()
+
+    def _dispatch(self):
+        """Start every queued job the scheduler lets run."""
+        with self._lock:
+            for job in self._queue_order():
+                if job["status"] != JOB_STATUS.todo:
+                    continue
+                task = self._tasks[job["id"]]
+                if self.scheduler.is_full and self.scheduler.is_light_full:
+                    break
+                if self.scheduler.can_start(task):
+                    self._start_job(job, task)
+
+    def _start_job(self, job, task):
+        members, cmds = [], []
+        resources = self._pool.acquire(job["target_quality"])
+        for member_job, member_task in [(job, task)] + self._partners(job):
+            try:
+                cmd = member_task.build_conversion_cmd(
+                    target_quality=member_job["target_quality"],
+                    tagged=member_job["tagged"],
+                    subtitle=member_job["subtitle"],
+                    resources=resources,
+                )
+            except (OSError, ValueError) as error:
+                member_job["error"] = str(error)
+                self._close_job(member_job["id"], JOB_STATUS.failed)
+                continue
+            # The profile is shared, so the output path is only right
+            # while the command is built
+            output_path = member_task.get_output_path(member_job["tagged"])
+            # Two outputs to the same file can't share a run, and outputs
+            # of a run share every input, like a subtitle file
+            if any(
+                output_path == other["output_path"] for other, _ in members
+            ) or (cmds and input_args(cmd) != input_args(cmds[0])):
+                continue
+            member_job["output_path"] = output_path
+            members.append((member_job, member_task))
+            cmds.append(cmd)
+
+        if not members:
+            self._pool.release(resources)
+            return
+
+        runner = self._runner_factory()
+        # The first member holds the scheduler slot for the whole run
+        self.scheduler.start(members[0][1])
+        for member_job, member_task in members:
+            self._runners[member_job["id"]] = runner
+            member_task.status = STATUS.todo
+            member_job["status"] = JOB_STATUS.running
+            member_job["started"] = time.time()
+            member_job["run_with"] = [
+                other["id"] for other, _ in members if other is not member_job
+            ]
+        threading.Thread(
+            target=self._run_job,
+            args=(members, runner, merge_conversion_cmds(cmds), resources),
+            daemon=True,
+        ).start()
+
+    def _partners(self, job):
+        """Return the queued (job, task) pairs sharing the job input."""
+        if not self.merge_inputs:
+            return []
+        video_path = os.path.realpath(job["video_path"])
+        # A lightweight job holds a light slot, so it can't take heavy ones
+        light = job["kind"] in LIGHT_KINDS
+        return [
+            (other, self._tasks[other["id"]])
+            for other in self._queue_order()
+            if other is not job
+            and other["status"] == JOB_STATUS.todo
+            and os.path.realpath(other["video_path"]) == video_path
+            and (not light or other["kind"] in LIGHT_KINDS)
+        ]
+
+    def _run_job(self, members, runner, cmd, resources):
+        job_ids = [member_job["id"] for member_job, _ in members]
+        task = members[0][1]
+        reader = OutputReader()
+        log_path = None
+        if self._log_dir is not None:
+            log_path = Path(self._log_dir, log_name(task.video.path))
+            with self._lock:
+                for job_id in job_ids:
+                    self._jobs[job_id]["log"] = str(log_path)
+        log = JobLog(log_path)
+        duration = float(task.video.format_info.get("duration", 0) or 0)
+        library_error = [None]
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                # The conversion is doomed, don't wait for it to end
+                runner.kill()
+                return
+            if duration and reader.has_time_read:
+                progress = min(int(reader.time / duration * 100), 100)
+                with self._lock:
+                    for job_id in job_ids:
+                        self._jobs[job_id]["progress"] = progress
+
+        error = None
+        try:
+            exit_code = runner.run(
+                cmd, on_output=on_output, resources=resources
+            )
+        except OSError as run_error:
+            exit_code, error = None, str(run_error)
+        finally:
+            log.close()
+            self._pool.release(resources)
+
+        with self._lock:
+            self.scheduler.finish(task)
+            cancelled = any(
+                member_job["status"] == JOB_STATUS.cancelled
+                for member_job, _ in members
+            )
+            for member_job, member_task in members:
+                self._runners.pop(member_job["id"], None)
+                member_job["error"] = error
+                if member_job["status"] == JOB_STATUS.cancelled:
+                    self._delete_output(member_job)
+                    self._close_job(member_job["id"], JOB_STATUS.cancelled)
+                elif exit_code == 0:
+                    member_job["progress"] = 100
+                    member_task.status = STATUS.done
+                    self._close_job(member_job["id"], JOB_STATUS.done)
+                elif cancelled:
+                    # Stopped because another output of the run was
+                    # cancelled, so run it again
+                    self._delete_output(member_job)
+                    member_job.update(
+                        status=JOB_STATUS.todo,
+                        progress=0,
+                        started=None,
+                        output_path=None,
+                    )
+                else:
+                    self._fail_job(
+                        member_job,
+                        classify_exit(exit_code, library_error[0]),
+                        log.tail(10),
+                        # Which output caused the error is unknown
+                        skip_quality=len(members) == 1,
+                    )
+        self._wakeup.set()
+
+    def _fail_job(self, job, library_error, tail, skip_quality):
+        job["error_kind"] = library_error.kind
+        if job["error"] is None:
+            job["error"] = "\n".join(
+                ["{0}: {1}".format(*library_error[:2])] + tail
+            )
+        self._close_job(job["id"], JOB_STATUS.failed)
+        if (
+            skip_quality
+            and error_action(library_error) == ERROR_ACTION.skip_quality
+        ):
+            self._skip_quality(job, library_error)
+
+    @staticmethod
+    def _delete_output(job):
+        """Delete the output a stopped job was writing."""
+        if job["output_path"] is not None:
+            Path(job["output_path"]).unlink(missing_ok=True)
+
+    def _close_job(self, job_id, status):
+        job = self._jobs[job_id]
+        job["status"] = status
+        job["finished"] = time.time()
+        if status == JOB_STATUS.failed:
+            self._tasks[job_id].status = STATUS.failed
+        elif status != JOB_STATUS.done:
+            self._tasks[job_id].status = STATUS.stopped
+
+    def _skip_quality(self, failed_job, library_error):
+        """Fail the queued jobs that would fail the same way."""
+        for job in self._jobs.values():
+            if (
+                job["status"] == JOB_STATUS.todo
+                and job["target_quality"] == failed_job["target_quality"]
+            ):
+                job["error"] = "Skipped: {0}".format(library_error.message)
+                job["error_kind"] = library_error.kind
+                self._close_job(job["id"], JOB_STATUS.failed)
+
+    def _queue_order(self):
+        """Return the jobs sorted by priority, then submission time."""
+        return sorted(
+            self._jobs.values(),
+            key=lambda job: (-job["priority"], job["submitted"]),
+        )
+
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="2">
+<title>{title}</title></head>
+<body><h1>{title}</h1><p>{summary}</p>
+<table border="1" cellpadding="4">
+<tr><th>Video</th><th>Quality</th><th>Priority</th><th>Status</th>
+<th>Progress</th></tr>
+{rows}
+</table></body></html>
+"""
+
+_ROW = (
+    "<tr><td>{video_path}</td><td>{target_quality}</td><td>{priority}</td>"
+    "<td>{status}</td><td>{progress}%</td></tr>"
+)
+
+
+def render_progress_page(server):
+    """Return the read-only HTML progress page."""
+    stats = server.stats()
+    summary = ", ".join(
+        "{0}: {1}".format(status, count)
+        for status, count in stats["statuses"].items()
+    )
+    rows = "\n".join(
+        _ROW.format(
+            **{key: html.escape(str(value)) for key, value in job.items()}
+        )
+        for job in server.jobs()
+    )
+    return _PAGE.format(
+        title=APP_NAME + " " + VERSION, summary=summary, rows=rows
+    )
+
+
+class _JobServerHandler(BaseHTTPRequestHandler):
+    """HTTP front end of the JobServer."""
+
+    server_version = APP_NAME + "/" + VERSION
+
+    def do_GET(self):
+        job_server = self.server.job_server
+        parts = self.path.strip("/").split("/")
+        try:
+            if parts == [""]:
+                self._reply(
+                    200,
+                    render_progress_page(job_server),
+                    "text/html; charset=utf-8",
+                )
+            elif parts == ["jobs"]:
+                self._reply(200, job_server.jobs())
+            elif len(parts) == 2 and parts[0] == "jobs":
+                self._reply(200, job_server.job(parts[1]))
+            elif parts == ["stats"]:
+                self._reply(200, job_server.stats())
+            else:
+                self._reply(404, {"error": "Not found"})
+        except KeyError:
+            self._reply(404, {"error": "Unknown job"})
+
+    def do_POST(self):
+        job_server = self.server.job_server
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip() != "application/json":
+            self._reply(415, {"error": "Content-Type must be JSON"})
+            return
+        if not self._authorized():
+            self._reply(401, {"error": "Missing or wrong token"})
+            return
+        body = self._read_body()
+        parts = self.path.strip("/").split("/")
+        try:
+            if parts == ["jobs"]:
+                job_id = job_server.submit(
+                    video_path=body["video_path"],
+                    target_quality=body["target_quality"],
+                    output_dir=body["output_dir"],
+                    tagged=body.get("tagged", False),
+                    subtitle=body.get("subtitle", False),
+                    priority=int(body.get("priority", 0)),
+                )
+                self._reply(201, {"id": job_id})
+            elif len(parts) == 3 and parts[0] == "jobs":
+                if parts[2] == "cancel":
+                    job_server.cancel(parts[1])
+                elif parts[2] == "priority":
+                    job_server.reprioritize(parts[1], body["priority"])
+                else:
+                    self._reply(404, {"error": "Not found"})
+                    return
+                self._reply(200, job_server.job(parts[1]))
+            else:
+                self._reply(404, {"error": "Not found"})
+        except KeyError:
+            self._reply(404, {"error": "Unknown job or missing field"})
+        except (TypeError, ValueError) as error:
+            self._reply(400, {"error": str(error)})
+
+    def _authorized(self):
+        token = self.server.token
+        if token is None:
+            return True
+        sent = self.headers.get("Authorization", "")
+        return hmac.compare_digest(
+            sent.encode("utf-8"), "Bearer {0}".format(token).encode("utf-8")
+        )
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            return {}
+
+    def _reply(self, code, data, content_type="application/json"):
+        if content_type == "application/json":
+            data = json.dumps(data)
+        payload = data.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self):
+        """Unix sockets have no client address."""
+        return str(self.client_address and self.client_address[0])
+
+    def log_message(self, format, *args):
+        """Keep the console quiet."""
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP server listening on a Unix socket."""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def create_job_server(
+    job_server, host="127.0.0.1", port=0, socket_path=None, token=None
+):
+    """Return an HTTP server exposing a JobServer.
+
+    Args:
+        job_server (JobServer): Server running the jobs
+        host (str): Address to listen on over HTTP
+        port (int): Port to listen on over HTTP, 0 for any
+        socket_path (str): Unix socket to listen on instead of HTTP, only
+            the user can connect to it
+        token (str): Token the HTTP clients must send, None for a random
+            one, available as the token attribute of the server
+    """
+    if socket_path is not None:
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(
+                    "{0} exists and is not a socket".format(socket_path)
+                )
+            # A stale socket of a previous run
+            os.unlink(socket_path)
+        server = _UnixHTTPServer(socket_path, _JobServerHandler)
+        os.chmod(socket_path, 0o600)
+        server.token = None
+    else:
+        server = ThreadingHTTPServer((host, port), _JobServerHandler)
+        server.daemon_threads = True
+        server.token = token or secrets.token_urlsafe()
+    server.job_server = job_server
+    return server
+
+
+def main(args=None):
+    """Run the job server daemon."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " job server"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--socket", help="listen on a Unix socket instead")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("VIDEOMORPH_TOKEN"),
+        help="token the HTTP clients must send, random by default",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="maximum number of parallel jobs"
+    )
+    parser.add_argument(
+        "--device-jobs",
+        type=int,
+        default=1,
+        help="maximum number of parallel jobs per device",
+    )
+    parser.add_argument(
+        "--light-jobs",
+        type=int,
+        default=MAX_LIGHT_JOBS,
+        help="maximum number of parallel audio only jobs, on top of --jobs",
+    )
+    add_resource_arguments(parser)
+    args = parser.parse_args(args)
+
+    job_server = JobServer(
+        resources=resources_from_args(args), pin_cpus=args.pin_cpus
+    )
+    job_server.scheduler.max_jobs = args.jobs or job_server.scheduler.max_jobs
+    job_server.scheduler.device_limit = args.device_jobs
+    job_server.scheduler.max_light_jobs = args.light_jobs
+    try:
+        server = create_job_server(
+            job_server, args.host, args.port, args.socket, args.token
+        )
+    except OSError as error:
+        parser.error(str(error))
+    if server.token is not None and args.token is None:
+        print("API token: {0}".format(server.token), file=sys.stderr)
+    job_server.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_server.stop()
+
+
+if __name__ == "__main__":
+    main()
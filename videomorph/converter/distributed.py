@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+
+# File name: distributed.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides a coordinator/worker mode to share one queue.
+
+The coordinator owns the queue and serves it over plain HTTP with JSON
+bodies. Workers lease one job at a time, build the conversion command
+locally with Task.build_conversion_cmd, run it and send a heartbeat with
+the progress, which also renews the lease. Jobs whose lease expires (dead
+worker) go back to the queue. Every attempt writes to its own temporary
+file, moved in place only once the coordinator accepts the result. Input
+and output paths must be reachable from every worker, optionally through
+a path prefix mapping. Every request must carry the token of the
+coordinator in an "Authorization: Bearer <token>" header.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from . import APP_NAME, JOB_STATUS, VERSION
+from .errors import classify_exit, merge_errors
+from .joblog import JobLog, log_name
+from .reader import OutputReader
+from .resources import add_resource_arguments, resources_from_args
+from .runner import ProcessRunner
+
+LEASE_TIMEOUT = 60.0
+POLL_INTERVAL = 2.0
+
+# Final statuses a worker can report
+FINISH_STATUSES = (JOB_STATUS.done, JOB_STATUS.failed)
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker reports on a job it does not hold anymore."""
+
+
+def attempt_path(output_path, worker, attempt):
+    """Return the temporary output path of a job attempt."""
+    output_path = Path(output_path)
+    return output_path.with_name(
+        ".{0}.{1}-{2}{3}".format(
+            output_path.stem, worker, attempt, output_path.suffix
+        )
+    )
+
+
+class Coordinator:
+    """Class to hold the shared queue and the worker leases."""
+
+    def __init__(self, lease_timeout=LEASE_TIMEOUT, clock=time.monotonic):
+        """Class initializer."""
+        self.lease_timeout = lease_timeout
+        self._clock = clock
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        video_path,
+        target_quality,
+        output_dir,
+        tagged=False,
+        subtitle=False,
+    ):
+        """Add a job to the queue and return its id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = dict(
+                id=job_id,
+                video_path=str(video_path),
+                target_quality=target_quality,
+                output_dir=str(output_dir),
+                tagged=tagged,
+                subtitle=subtitle,
+                status=JOB_STATUS.todo,
+                worker=None,
+                lease_expires=None,
+                progress=0,
+                attempts=0,
+                error=None,
+                error_kind=None,
+            )
+
+        return job_id
+
+    def jobs(self):
+        """Return a copy of all the jobs."""
+        with self._lock:
+            self._expire_leases()
+            return [dict(job) for job in self._jobs.values()]
+
+    def lease(self, worker):
+        """Lease the next job to a worker, None if the queue is empty."""
+        with self._lock:
+            self._expire_leases()
+            for job in self._jobs.values():
+                if job["status"] == JOB_STATUS.todo:
+                    job["status"] = JOB_STATUS.running
+                    job["worker"] = worker
+                    job["attempts"] += 1
+                    job["progress"] = 0
+                    self._renew(job)
+                    return dict(job)
+
+        return None
+
+    def progress(self, job_id, worker, progress):
+        """Record the progress of a job and renew its lease."""
+        with self._lock:
+            job = self._held_job(job_id, worker)
+            job["progress"] = progress
+            self._renew(job)
+
+    def finish(self, job_id, worker, status, error=None, error_kind=None):
+        """Record the final status of a job."""
+        if status not in FINISH_STATUSES:
+            raise ValueError("Unknown final status: {0}".format(status))
+        with self._lock:
+            job = self._held_job(job_id, worker)
+            job["status"] = status
+            job["error"] = error
+            job["error_kind"] = error_kind
+            job["worker"] = None
+            job["lease_expires"] = None
+            if status == JOB_STATUS.done:
+                job["progress"] = 100
+
+    def _held_job(self, job_id, worker):
+        """Return a running job only if the worker still holds its lease."""
+        self._expire_leases()
+        job = self._jobs.get(job_id)
+        if (
+            job is None
+            or job["status"] != JOB_STATUS.running
+            or job["worker"] != worker
+        ):
+            raise LeaseLostError(job_id)
+
+        return job
+
+    def _renew(self, job):
+        job["lease_expires"] = self._clock() + self.lease_timeout
+
+    def _expire_leases(self):
+        """Put back in the queue the jobs of dead workers."""
+        now = self._clock()
+        for job in self._jobs.values():
+            if (
+                job["status"] == JOB_STATUS.running
+                and job["lease_expires"] < now
+            ):
+                job["status"] = JOB_STATUS.todo
+                job["worker"] = None
+                job["lease_expires"] = None
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    """HTTP front end of the Coordinator."""
+
+    server_version = APP_NAME + "/" + VERSION
+
+    def do_GET(self):
+        if not self._authorized():
+            self._reply(401, {"error": "Missing or wrong token"})
+        elif self.path == "/jobs":
+            self._reply(200, self.server.coordinator.jobs())
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip() != "application/json":
+            self._reply(415, {"error": "Content-Type must be JSON"})
+            return
+        if not self._authorized():
+            self._reply(401, {"error": "Missing or wrong token"})
+            return
+        body = self._read_body()
+        parts = self.path.strip("/").split("/")
+        try:
+            if parts == ["jobs"]:
+                job_id = coordinator.submit(
+                    video_path=body["video_path"],
+                    target_quality=body["target_quality"],
+                    output_dir=body["output_dir"],
+                    tagged=body.get("tagged", False),
+                    subtitle=body.get("subtitle", False),
+                )
+                self._reply(201, {"id": job_id})
+            elif parts == ["lease"]:
+                job = coordinator.lease(body["worker"])
+                self._reply(200, job)
+            elif len(parts) == 3 and parts[0] == "jobs":
+                if parts[2] == "progress":
+                    coordinator.progress(
+                        parts[1], body["worker"], body["progress"]
+                    )
+                elif parts[2] == "finish":
+                    coordinator.finish(
+                        parts[1],
+                        body["worker"],
+                        body["status"],
+                        body.get("error"),
+                        body.get("error_kind"),
+                    )
+                else:
+                    raise KeyError(parts[2])
+                self._reply(200, {})
+            else:
+                self._reply(404, {"error": "Not found"})
+        except LeaseLostError:
+            self._reply(409, {"error": "Lease lost"})
+        except (KeyError, TypeError, ValueError):
+            self._reply(400, {"error": "Bad request"})
+
+    def _authorized(self):
+        sent = self.headers.get("Authorization", "")
+        return hmac.compare_digest(
+            sent.encode("utf-8"),
+            "Bearer {0}".format(self.server.token).encode("utf-8"),
+        )
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            return {}
+
+    def _reply(self, code, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        """Keep the console quiet."""
+
+
+def create_coordinator_server(
+    host="127.0.0.1", port=0, lease_timeout=LEASE_TIMEOUT, token=None
+):
+    """Return an HTTP server exposing a new Coordinator.
+
+    The clients must send the token, a random one if None, available as
+    the token attribute of the server.
+    """
+    server = ThreadingHTTPServer((host, port), _CoordinatorHandler)
+    server.daemon_threads = True
+    server.coordinator = Coordinator(lease_timeout=lease_timeout)
+    server.token = token or secrets.token_urlsafe()
+    return server
+
+
+class CoordinatorClient:
+    """Class to talk to a coordinator server."""
+
+    def __init__(self, url, token, timeout=10.0):
+        """Class initializer."""
+        self._url = url.rstrip("/")
+        self._token = token
+        self._timeout = timeout
+
+    def submit(self, video_path, target_quality, output_dir, **options):
+        """Submit a job and return its id."""
+        body = dict(
+            video_path=str(video_path),
+            target_quality=target_quality,
+            output_dir=str(output_dir),
+            **options
+        )
+        return self._request("/jobs", body)["id"]
+
+    def jobs(self):
+        """Return the list of jobs."""
+        return self._request("/jobs")
+
+    def lease(self, worker):
+        """Lease a job, None if the queue is empty."""
+        return self._request("/lease", {"worker": worker})
+
+    def progress(self, job_id, worker, progress):
+        """Report the progress of a job."""
+        self._request(
+            "/jobs/{0}/progress".format(job_id),
+            {"worker": worker, "progress": progress},
+        )
+
+    def finish(self, job_id, worker, status, error=None, error_kind=None):
+        """Report the end of a job."""
+        self._request(
+            "/jobs/{0}/finish".format(job_id),
+            {
+                "worker": worker,
+                "status": status,
+                "error": error,
+                "error_kind": error_kind,
+            },
+        )
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        request = Request(
+            self._url + path,
+            data=data,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": "Bearer {0}".format(self._token),
+            },
+        )
+        try:
+            with urlopen(request, timeout=self._timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except HTTPError as error:
+            if error.code == 409:
+                raise LeaseLostError(path)
+            raise
+
+
+class Worker:
+    """Class to lease jobs from a coordinator and run them locally."""
+
+    def __init__(
+        self,
+        client,
+        name=None,
+        path_map=None,
+        runner=None,
+        task_factory=None,
+        heartbeat=LEASE_TIMEOUT / 3,
+        resources=None,
+        log_dir=None,
+    ):
+        """Class initializer.
+
+        Args:
+            client (CoordinatorClient): Connection to the coordinator
+            name (str): Unique worker name
+            path_map (dict): Coordinator path prefixes mapped to local ones
+            runner (ProcessRunner): Runs the conversion library
+            task_factory (callable): Build a Task from a video path and an
+                output directory
+            heartbeat (float): Seconds between progress reports, keep it
+                well below the lease timeout
+            resources (ResourcePolicy): Priority and limits for every job
+            log_dir (str): Directory for per-job log files, None to keep
+                only the last lines in memory
+        """
+        self.client = client
+        self.name = name or "{0}-{1}".format(
+            socket.gethostname(), uuid.uuid4().hex[:8]
+        )
+        self.path_map = path_map or {}
+        self.runner = runner or ProcessRunner()
+        self._task_factory = task_factory or _default_task_factory
+        self.heartbeat = heartbeat
+        self.resources = resources
+        self._log_dir = log_dir
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ask the worker to stop after the running job."""
+        self._stop.set()
+
+    def run(self, poll_interval=POLL_INTERVAL, exit_when_idle=False):
+        """Lease and run jobs until stopped."""
+        while not self._stop.is_set():
+            try:
+                job = self.client.lease(self.name)
+            except OSError:
+                # The coordinator is unreachable, try again later
+                self._stop.wait(poll_interval)
+                continue
+            if job is None:
+                if exit_when_idle:
+                    return
+                self._stop.wait(poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        """Run a leased job and report its result."""
+        try:
+            task = self._task_factory(
+                self.local_path(job["video_path"]),
+                self.local_path(job["output_dir"]),
+            )
+            cmd = task.build_conversion_cmd(
+                target_quality=job["target_quality"],
+                tagged=job["tagged"],
+                subtitle=job["subtitle"],
+                resources=self.resources,
+            )
+            output_path = Path(task.get_output_path(job["tagged"]))
+        except (OSError, ValueError) as error:
+            self._finish(job, JOB_STATUS.failed, str(error))
+            return
+
+        # After an expired lease the job may run on another worker, so
+        # attempts never write to the same file
+        temp_path = attempt_path(output_path, self.name, job["attempts"])
+        cmd = [
+            str(temp_path) if arg == str(output_path) else arg for arg in cmd
+        ]
+        reader = OutputReader()
+        log = JobLog(
+            None
+            if self._log_dir is None
+            else Path(self._log_dir, log_name(job["video_path"]))
+        )
+        library_error = [None]
+        duration = float(task.video.format_info.get("duration", 0) or 0)
+        done = threading.Event()
+        lease_lost = threading.Event()
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                # The conversion is doomed, don't wait for it to end
+                self.runner.kill()
+
+        def send_heartbeats():
+            # On a timer, a first pass with no output keeps its lease too
+            while not done.wait(self.heartbeat):
+                progress = 0
+                if duration and reader.has_time_read:
+                    progress = min(int(reader.time / duration * 100), 100)
+                try:
+                    self.client.progress(job["id"], self.name, progress)
+                except LeaseLostError:
+                    lease_lost.set()
+                    self.runner.kill()
+                    return
+                except OSError:
+                    # Keep converting, the next heartbeat may get through
+                    continue
+
+        heartbeat = threading.Thread(
+            target=send_heartbeats, name="heartbeat", daemon=True
+        )
+        heartbeat.start()
+        exit_code, error = None, None
+        try:
+            exit_code = self.runner.run(
+                cmd, on_output=on_output, resources=self.resources
+            )
+        except OSError as run_error:
+            error = str(run_error)
+        finally:
+            done.set()
+            heartbeat.join()
+            log.close()
+            if exit_code is None:
+                # Never leave the library running behind a failed run
+                self.runner.kill()
+
+        if exit_code == 0 and not temp_path.exists():
+            exit_code, error = None, "Missing output {0}".format(temp_path)
+
+        library_error = classify_exit(exit_code, library_error[0])
+        if lease_lost.is_set():
+            pass
+        elif library_error is None and error is None:
+            if self._finish(job, JOB_STATUS.done):
+                os.replace(temp_path, output_path)
+                return
+        elif error is not None:
+            self._finish(job, JOB_STATUS.failed, error)
+        else:
+            self._finish(
+                job,
+                JOB_STATUS.failed,
+                "\n".join(
+                    ["{0}: {1}".format(*library_error[:2])] + log.tail(10)
+                ),
+                library_error.kind,
+            )
+        temp_path.unlink(missing_ok=True)
+
+    def local_path(self, path):
+        """Map a coordinator path to a local path."""
+        for remote, local in self.path_map.items():
+            if path == remote or path.startswith(remote.rstrip("/") + "/"):
+                return local.rstrip("/") + path[len(remote.rstrip("/")) :]
+        return path
+
+    def _finish(self, job, status, error=None, error_kind=None):
+        """Report the end of a job, return True if the coordinator took it."""
+        try:
+            self.client.finish(job["id"], self.name, status, error, error_kind)
+        except (LeaseLostError, OSError):
+            return False
+        return True
+
+
+def _default_task_factory(video_path, output_dir):
+    """Build a Task using the local profiles."""
+    from .profile import Profile
+    from .task import Task
+    from .video import Video
+
+    return Task(Video(video_path), Profile(), output_dir)
+
+
+def main(args=None):
+    """Run a coordinator or a worker from the command line."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " distributed mode"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = commands.add_parser("coordinator")
+    coordinator.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on, 0.0.0.0 to serve other machines",
+    )
+    coordinator.add_argument("--port", type=int, default=8765)
+    coordinator.add_argument(
+        "--lease-timeout", type=float, default=LEASE_TIMEOUT
+    )
+
+    worker = commands.add_parser("worker")
+    worker.add_argument("url")
+    worker.add_argument("--name")
+    worker.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="REMOTE=LOCAL",
+        help="map a coordinator path prefix to a local one",
+    )
+    worker.add_argument("--exit-when-idle", action="store_true")
+    worker.add_argument("--log-dir", help="directory for per-job log files")
+    add_resource_arguments(worker)
+
+    submit = commands.add_parser("submit")
+    submit.add_argument("url")
+    submit.add_argument("quality")
+    submit.add_argument("output_dir")
+    submit.add_argument("files", nargs="+")
+
+    for command in (coordinator, worker, submit):
+        command.add_argument(
+            "--token",
+            default=os.environ.get("VIDEOMORPH_TOKEN"),
+            help="token shared by the coordinator and its clients",
+        )
+
+    args = parser.parse_args(args)
+
+    if args.command != "coordinator" and args.token is None:
+        parser.error("--token or VIDEOMORPH_TOKEN is required")
+
+    if args.command == "coordinator":
+        server = create_coordinator_server(
+            args.host, args.port, args.lease_timeout, args.token
+        )
+        if args.token is None:
+            print("Token: {0}".format(server.token), file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    elif args.command == "worker":
+        path_map = dict(item.split("=", 1) for item in args.map)
+        Worker(
+            CoordinatorClient(args.url, args.token),
+            name=args.name,
+            path_map=path_map,
+            resources=resources_from_args(args),
+            log_dir=args.log_dir,
+        ).run(exit_when_idle=args.exit_when_idle)
+    else:
+        client = CoordinatorClient(args.url, args.token)
+        for file in args.files:
+            print(
+                client.submit(
+                    Path(file).absolute(),
+                    args.quality,
+                    Path(args.output_dir).absolute(),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+# File name: engine.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the asyncio conversion engine.
+
+The engine owns the conversion processes: it starts them, streams their
+merged output, tracks progress, cancels them and reports completion as
+EngineEvents to its listeners. It needs no Qt event loop, so headless code
+can drive many lightweight jobs (probes, remuxes) from a single thread.
+ThreadedEngine runs an engine in a background thread for callers that have
+their own event loop, like the GUI.
+"""
+
+import asyncio
+import threading
+import uuid
+from collections import namedtuple
+from subprocess import DEVNULL, PIPE, STDOUT
+
+from . import JOB_STATUS
+from .reader import OutputReader
+from .vmpath import LIBRARY_PATH
+
+CHUNK_SIZE = 4096
+
+EventKinds = namedtuple("EventKinds", "started output progress finished")
+EVENT = EventKinds("started", "output", "progress", "finished")
+
+EngineEvent = namedtuple("EngineEvent", "kind job data")
+
+
+class EngineJob:
+    """Class to represent a process run by the engine."""
+
+    def __init__(self, cmd, job_id=None, duration=None, resources=None):
+        """Class initializer.
+
+        Args:
+            cmd (list): Conversion library arguments
+            job_id (str): Job identifier, generated if None
+            duration (float): Media duration in seconds to compute progress
+            resources (ResourcePolicy): Priority and limits for the process
+        """
+        self.id = job_id or uuid.uuid4().hex
+        self.cmd = cmd
+        self.duration = duration
+        self.resources = resources
+        self.status = JOB_STATUS.todo
+        self.exit_code = None
+        self.progress = 0
+        self.pid = None
+        self._process = None
+        self._cancelled = False
+
+    @property
+    def is_running(self):
+        """Return True if the job process is running."""
+        return self.status == JOB_STATUS.running
+
+    @property
+    def is_cancelled(self):
+        """Return True if the job was cancelled."""
+        return self._cancelled
+
+
+class ConversionEngine:
+    """Class to run conversion processes with asyncio."""
+
+    def __init__(self, library_path=LIBRARY_PATH, max_jobs=None):
+        """Class initializer.
+
+        Args:
+            library_path (str): Path to the conversion library
+            max_jobs (int): Maximum number of processes at the same time,
+                None for no limit
+        """
+        self._library_path = library_path
+        self.max_jobs = max_jobs
+        self._semaphore = None
+        self._jobs = {}
+        self._tasks = {}
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Register a callable receiving every EngineEvent."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregister an event listener."""
+        self._listeners.remove(listener)
+
+    def job(self, job_id):
+        """Return a job by id."""
+        return self._jobs[job_id]
+
+    @property
+    def jobs(self):
+        """Return all the jobs."""
+        return list(self._jobs.values())
+
+    def submit(self, job):
+        """Schedule a job in the running loop and return its asyncio.Task."""
+        self._jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(self.run_job(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return task
+
+    async def run_job(self, job):
+        """Run a job until it finishes and return its exit code."""
+        self._jobs[job.id] = job
+        if self.max_jobs is None:
+            return await self._run(job)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_jobs)
+        async with self._semaphore:
+            return await self._run(job)
+
+    async def join(self):
+        """Wait for every scheduled job."""
+        while self._tasks:
+            await asyncio.gather(
+                *list(self._tasks.values()), return_exceptions=True
+            )
+
+    def cancel(self, job_id):
+        """Terminate a job, or drop it if it is still queued."""
+        job = self._jobs[job_id]
+        job._cancelled = True
+        if job._process is not None and job.exit_code is None:
+            job._process.terminate()
+
+    def kill(self, job_id):
+        """Kill a job process."""
+        job = self._jobs[job_id]
+        job._cancelled = True
+        if job._process is not None and job.exit_code is None:
+            job._process.kill()
+
+    async def _run(self, job):
+        if job.is_cancelled:
+            return self._finish(job, None)
+
+        program, args = self._library_path, list(job.cmd)
+        if job.resources is not None:
+            program, args = job.resources.wrap(program, args)
+
+        try:
+            job._process = await asyncio.create_subprocess_exec(
+                program, *args, stdin=DEVNULL, stdout=PIPE, stderr=STDOUT
+            )
+        except OSError as error:
+            if job.resources is not None:
+                job.resources.release(args)
+            self._emit(EVENT.output, job, str(error))
+            return self._finish(job, None)
+
+        job.pid = job._process.pid
+        job.status = JOB_STATUS.running
+        self._emit(EVENT.started, job, job.pid)
+
+        reader = OutputReader()
+        try:
+            while True:
+                chunk = await job._process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                text = chunk.decode("utf-8", errors="replace")
+                self._emit(EVENT.output, job, text)
+                self._update_progress(job, reader, text)
+            exit_code = await job._process.wait()
+        except asyncio.CancelledError:
+            job._process.kill()
+            await job._process.wait()
+            raise
+        finally:
+            if job.resources is not None:
+                job.resources.release(args)
+
+        return self._finish(job, exit_code)
+
+    def _update_progress(self, job, reader, text):
+        if not job.duration:
+            return
+        reader.update_read(text)
+        if not reader.has_time_read:
+            return
+        progress = min(int(reader.time / job.duration * 100), 100)
+        if progress != job.progress:
+            job.progress = progress
+            self._emit(EVENT.progress, job, progress)
+
+    def _finish(self, job, exit_code):
+        job.exit_code = exit_code
+        if job.is_cancelled:
+            job.status = JOB_STATUS.cancelled
+        elif exit_code == 0:
+            job.status = JOB_STATUS.done
+            job.progress = 100
+        else:
+            job.status = JOB_STATUS.failed
+        self._emit(EVENT.finished, job, exit_code)
+        return exit_code
+
+    def _emit(self, kind, job, data):
+        event = EngineEvent(kind, job, data)
+        for listener in list(self._listeners):
+            listener(event)
+
+
+class ThreadedEngine:
+    """Class to run a ConversionEngine in a background thread.
+
+    Listeners are called from the engine thread.
+    """
+
+    def __init__(self, engine=None):
+        """Class initializer."""
+        self.engine = engine or ConversionEngine()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="engine", daemon=True
+        )
+        self._thread.start()
+
+    def __getattr__(self, attr):
+        """Delegate to the engine."""
+        return getattr(self.engine, attr)
+
+    def submit(self, job):
+        """Schedule a job from any thread and return it."""
+        self._loop.call_soon_threadsafe(self.engine.submit, job)
+        return job
+
+    def run(self, job, timeout=None):
+        """Run a job from any thread and wait for its exit code."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.engine.run_job(job), self._loop
+        )
+        return future.result(timeout)
+
+    def cancel(self, job_id):
+        """Terminate a job from any thread."""
+        self._loop.call_soon_threadsafe(self.engine.cancel, job_id)
+
+    def kill(self, job_id):
+        """Kill a job from any thread."""
+        self._loop.call_soon_threadsafe(self.engine.kill, job_id)
+
+    def close(self):
+        """Stop the engine thread."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
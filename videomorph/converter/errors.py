@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# File name: errors.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the conversion library error classification."""
+
+import re
+from collections import namedtuple
+
+ErrorKinds = namedtuple(
+    "ErrorKinds",
+    "missing_encoder bad_option io_error corrupt_input no_space "
+    "too_big crashed unknown",
+)
+ERROR_KIND = ErrorKinds(
+    "Missing encoder",
+    "Bad option",
+    "I/O error",
+    "Corrupt input",
+    "Out of space",
+    "Output too big",
+    "Crashed",
+    "Unknown error",
+)
+
+ErrorActions = namedtuple("ErrorActions", "skip_task skip_quality stop_queue")
+ERROR_ACTION = ErrorActions("skip_task", "skip_quality", "stop_queue")
+
+LibraryError = namedtuple("LibraryError", "kind message fatal")
+
+# (message, kind, fatal). Fatal errors doom the conversion, so the process
+# is killed as soon as they show up in the output
+_LIBRARY_ERRORS = (
+    ("Unknown encoder", ERROR_KIND.missing_encoder, True),
+    ("Encoder not found", ERROR_KIND.missing_encoder, True),
+    ("Automatic encoder selection failed", ERROR_KIND.missing_encoder, True),
+    ("Unknown output format", ERROR_KIND.missing_encoder, True),
+    ("Unrecognized option", ERROR_KIND.bad_option, True),
+    ("Option not found", ERROR_KIND.bad_option, True),
+    ("Error splitting the argument list", ERROR_KIND.bad_option, True),
+    ("Invalid argument", ERROR_KIND.bad_option, False),
+    ("No space left on device", ERROR_KIND.no_space, True),
+    ("Disk quota exceeded", ERROR_KIND.no_space, True),
+    ("File too large", ERROR_KIND.no_space, True),
+    ("Permission denied", ERROR_KIND.io_error, True),
+    ("No such file or directory", ERROR_KIND.io_error, True),
+    ("Read-only file system", ERROR_KIND.io_error, True),
+    ("Input/output error", ERROR_KIND.io_error, True),
+    ("Error opening output", ERROR_KIND.io_error, True),
+    (
+        "Invalid data found when processing input",
+        ERROR_KIND.corrupt_input,
+        True,
+    ),
+    ("moov atom not found", ERROR_KIND.corrupt_input, True),
+    ("Error while decoding stream", ERROR_KIND.corrupt_input, False),
+    ("corrupt decoded frame", ERROR_KIND.corrupt_input, False),
+)
+
+_ERRORS_REGEX = re.compile(
+    "|".join(re.escape(message) for message, _, _ in _LIBRARY_ERRORS)
+)
+_ERRORS = {message: (kind, fatal) for message, kind, fatal in _LIBRARY_ERRORS}
+
+_ACTIONS = {
+    ERROR_KIND.missing_encoder: ERROR_ACTION.skip_quality,
+    ERROR_KIND.bad_option: ERROR_ACTION.skip_quality,
+    ERROR_KIND.no_space: ERROR_ACTION.stop_queue,
+}
+
+
+def classify_output(process_output):
+    """Return the first LibraryError found in process_output, or None."""
+    found = None
+    for match in _ERRORS_REGEX.finditer(process_output or ""):
+        kind, fatal = _ERRORS[match.group()]
+        error = LibraryError(kind, match.group(), fatal)
+        if fatal:
+            return error
+        if found is None:
+            found = error
+
+    return found
+
+
+def merge_errors(error, new_error):
+    """Return the error to keep, a fatal error is never replaced."""
+    if new_error is None or (error is not None and error.fatal):
+        return error
+    return new_error
+
+
+def classify_exit(exit_code, error=None):
+    """Return the LibraryError of a finished process, None on success.
+
+    Args:
+        exit_code (int): Process exit code, negative or None if it crashed
+        error (LibraryError): Error read from the process output, if any
+    """
+    if exit_code == 0:
+        return None
+    if error is not None:
+        return error._replace(fatal=True)
+    if exit_code is None or exit_code < 0:
+        return LibraryError(
+            ERROR_KIND.crashed, "Process crashed or was killed", True
+        )
+
+    return LibraryError(
+        ERROR_KIND.unknown, "Exit code {0}".format(exit_code), True
+    )
+
+
+def error_action(error):
+    """Return what the queue should do after a task failed with error."""
+    return _ACTIONS.get(error.kind, ERROR_ACTION.skip_task)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# File name: fingerprint.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides content fingerprints of media files.
+
+The fast fingerprint reads only the size and three windows of the file
+(head, middle and tail), so it costs the same for any file size. The full
+hash reads the whole file and runs in a background thread.
+"""
+
+import hashlib
+import mmap
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+WINDOW_SIZE = 1024**2
+
+_HASH_BLOCK = 1024**2
+# Futures of the full hashes by (path, size, mtime), so a file is read once
+_FULL_HASHES = {}
+_QUEUE = queue.Queue()
+_LOCK = threading.Lock()
+_HASHER = None
+
+
+def fast_fingerprint(path, window=WINDOW_SIZE):
+    """Return a fingerprint of the size, head, middle and tail of a file."""
+    size = Path(path).stat().st_size
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    if size <= 3 * window:
+        with open(path, "rb") as media_file:
+            digest.update(media_file.read())
+    else:
+        with open(path, "rb") as media_file, mmap.mmap(
+            media_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            middle = (size - window) // 2
+            for start in (0, middle, size - window):
+                digest.update(data[start : start + window])
+
+    return "{0}:{1}".format(size, digest.hexdigest())
+
+
+def full_hash(path):
+    """Return a hash of the whole content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as media_file:
+        for block in iter(lambda: media_file.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _hash_files():
+    """Hash the queued files, one at a time."""
+    while True:
+        future, path = _QUEUE.get()
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            future.set_result(full_hash(path))
+        except OSError as error:
+            future.set_exception(error)
+
+
+def full_hash_in_background(path):
+    """Return a Future with the full hash of a file.
+
+    Files are hashed one at a time, so the disks are not thrashed. The
+    hashing thread is a daemon, so a pending hash never delays the exit.
+    """
+    global _HASHER
+
+    stat = Path(path).stat()
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    with _LOCK:
+        future = _FULL_HASHES.get(key)
+        if future is None:
+            future = _FULL_HASHES[key] = Future()
+            _QUEUE.put((future, path))
+        if _HASHER is None:
+            _HASHER = threading.Thread(
+                target=_hash_files, name="fingerprint", daemon=True
+            )
+            _HASHER.start()
+    return future
+
+
+def full_fingerprint(path):
+    """Return the full hash of a file, reusing a background one."""
+    return full_hash_in_background(path).result()
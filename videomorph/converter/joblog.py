@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# File name: joblog.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides JobLog, a bounded per-job output capture."""
+
+import gzip
+import itertools
+import os
+import re
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+
+from . import SYS_PATHS
+
+LOGS_DIR = Path(SYS_PATHS["config"], "logs")
+
+MAX_BYTES = 10 * 1024**2
+BACKUP_COUNT = 3
+TAIL_LINES = 200
+# Limits of a log directory, the oldest logs are deleted first
+MAX_LOG_FILES = 500
+MAX_LOGS_BYTES = 200 * 1024**2
+
+_LINE_SPLIT = re.compile(r"[\r\n]+")
+_PROGRESS_PREFIXES = ("frame=", "size=")
+_LOG_PATTERNS = ("*.log", "*.log.*")
+_counter = itertools.count()
+
+
+def log_name(video_path):
+    """Return a unique log file name for a conversion of video_path.
+
+    Parallel jobs of the same video in the same second, even in several
+    processes, get different names.
+    """
+    return "{0}-{1}-{2}-{3}.log".format(
+        Path(video_path).stem,
+        time.strftime("%Y%m%d-%H%M%S"),
+        os.getpid(),
+        next(_counter),
+    )
+
+
+def prune_logs(log_dir, max_files=MAX_LOG_FILES, max_bytes=MAX_LOGS_BYTES):
+    """Delete the oldest log files over max_files or max_bytes."""
+    logs = []
+    for pattern in _LOG_PATTERNS:
+        for path in Path(log_dir).glob(pattern):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            logs.append((stat.st_mtime, stat.st_size, path))
+
+    logs.sort(reverse=True)
+    total = 0
+    for count, (_, size, path) in enumerate(logs, start=1):
+        total += size
+        if count > max_files or total > max_bytes:
+            path.unlink(missing_ok=True)
+
+
+class JobLog:
+    """Class to stream a job output to a rotating log file.
+
+    The last lines are also kept in memory for error reporting. Repeated
+    progress lines are collapsed so they don't push diagnostics out.
+    """
+
+    def __init__(
+        self,
+        path,
+        max_bytes=MAX_BYTES,
+        backup_count=BACKUP_COUNT,
+        compress=True,
+        tail_lines=TAIL_LINES,
+        prune=True,
+    ):
+        """Class initializer.
+
+        Args:
+            path (str): Path to the log file, None to keep only the last
+                lines in memory
+            max_bytes (int): Size that triggers a rotation, 0 for no limit
+            backup_count (int): Number of rotated files to keep
+            compress (bool): Compress rotated files with gzip
+            tail_lines (int): Number of lines kept in memory
+            prune (bool): Delete the oldest logs of the directory over the
+                MAX_LOG_FILES and MAX_LOGS_BYTES limits
+        """
+        self.path = None if path is None else Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self._tail = deque(maxlen=tail_lines)
+        self._partial = ""
+        self._file = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if prune:
+                prune_logs(self.path.parent)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, text):
+        """Append some output to the log."""
+        if not text:
+            return
+
+        self._update_tail(text)
+        if self._file is None:
+            return
+
+        self._file.write(text)
+        self._file.flush()
+
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def tail(self, lines=None):
+        """Return the last lines of output."""
+        tail = list(self._tail)
+        if self._partial:
+            tail.append(self._partial)
+        return tail if lines is None else tail[-lines:]
+
+    def close(self):
+        """Close the log file."""
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _update_tail(self, text):
+        *lines, self._partial = _LINE_SPLIT.split(self._partial + text)
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if (
+                line.startswith(_PROGRESS_PREFIXES)
+                and self._tail
+                and self._tail[-1].startswith(_PROGRESS_PREFIXES)
+            ):
+                self._tail[-1] = line
+            else:
+                self._tail.append(line)
+
+    def _backup_path(self, index):
+        suffix = ".{0}.gz" if self.compress else ".{0}"
+        return self.path.with_name(self.path.name + suffix.format(index))
+
+    def _rotate(self):
+        """Shift the backups and start a new log file."""
+        self._file.close()
+
+        if self.backup_count:
+            oldest = self._backup_path(self.backup_count)
+            if oldest.exists():
+                oldest.unlink()
+            for index in range(self.backup_count - 1, 0, -1):
+                backup = self._backup_path(index)
+                if backup.exists():
+                    backup.rename(self._backup_path(index + 1))
+
+            if self.compress:
+                with open(self.path, "rb") as source, gzip.open(
+                    self._backup_path(1), "wb"
+                ) as target:
+                    shutil.copyfileobj(source, target)
+            else:
+                shutil.copyfile(self.path, self._backup_path(1))
+
+        self._file = open(self.path, "w", encoding="utf-8")
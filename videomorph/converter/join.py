@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+
+# File name: join.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides the join of several videos into one.
+
+Inputs with the same streams, like the VOB files of a DVD or the chunks
+of a camera recording, are concatenated with the concat demuxer and
+stream copy, so nothing is encoded. Incompatible inputs are joined with
+a single encode through the concat filter.
+
+Run with: python -m videomorph.converter.join OUTPUT INPUT [INPUT ...]
+"""
+
+import argparse
+import os
+import shlex
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from . import APP_NAME, VERSION
+from .batch import ConversionError
+from .errors import ERROR_KIND, classify_exit, merge_errors
+from .joblog import JobLog, log_name
+from .reader import OutputReader
+from .runner import ProcessRunner
+
+# Streams that must match in every input to join them by stream copy
+StreamSignature = namedtuple(
+    "StreamSignature",
+    "streams vcodec width height frame_rate pix_fmt"
+    " acodec sample_rate channels",
+)
+JoinResult = namedtuple("JoinResult", "output_path copied")
+
+# Audio format of every input in a join by encoding
+JOIN_AUDIO_FILTER = "aresample=48000,aformat=channel_layouts=stereo"
+# Silence standing in for the audio of an input without any
+JOIN_SILENCE = "anullsrc=r=48000:cl=stereo"
+
+# Errors an encode would fail with too after a failed stream copy
+NO_FALLBACK_ERRORS = (ERROR_KIND.no_space, ERROR_KIND.io_error)
+
+# Preset filter options, merged into the filter graph of an encode
+VIDEO_FILTER_OPTIONS = ("-vf", "-filter:v")
+AUDIO_FILTER_OPTIONS = ("-af", "-filter:a")
+
+
+def stream_signature(video):
+    """Return the StreamSignature of a probed video."""
+    video_info = video.video_info
+    return StreamSignature(
+        video.format_info.get("nb_streams"),
+        video_info.get("codec_name"),
+        video_info.get("width"),
+        video_info.get("height"),
+        getattr(video, "frame_rate", None),
+        getattr(video, "pixel_format", None),
+        video.audio_info.get("codec_name"),
+        *getattr(video, "audio_format", (None, None)),
+    )
+
+
+def pop_filters(params, options):
+    """Remove the filter options from params, return the filters."""
+    filters = []
+    index = 0
+    while index < len(params):
+        if params[index] in options and index + 1 < len(params):
+            filters.append(params[index + 1])
+            del params[index : index + 2]
+        else:
+            index += 1
+    return filters
+
+
+def concat_list(paths):
+    """Return the concat demuxer list of some files."""
+    lines = []
+    for path in paths:
+        # Quote the path, a quote inside it is closed, escaped and reopened
+        escaped = str(Path(path).absolute()).replace("'", "'\\''")
+        lines.append("file '{0}'\n".format(escaped))
+    return "".join(lines)
+
+
+class JoinJob:
+    """Class to join several videos into one output."""
+
+    def __init__(
+        self,
+        paths,
+        output_path,
+        target_quality=None,
+        profile=None,
+        runner_factory=ProcessRunner,
+        video_factory=None,
+        log_dir=None,
+    ):
+        """Class initializer.
+
+        Args:
+            paths (list): Input videos, in playing order
+            output_path (str): Path to the joined video
+            target_quality (str): Target quality of the encode used if the
+                inputs can't be joined by stream copy, None to never encode
+            profile (Profile): Conversion profiles, created if needed
+            runner_factory (callable): Return a new ProcessRunner
+            video_factory (callable): Return a Video from a path
+            log_dir (str): Directory for the log file, None for no file
+        """
+        if len(paths) < 2:
+            raise ValueError("At least two videos are needed to join them")
+        if video_factory is None:
+            from .video import Video
+
+            video_factory = Video
+
+        self.videos = [video_factory(path) for path in paths]
+        for video in self.videos:
+            if not video.is_valid():
+                raise ValueError("Invalid video: {0}".format(video.path))
+
+        self.output_path = Path(output_path)
+        inputs = {Path(video.path).resolve() for video in self.videos}
+        if self.output_path.resolve() in inputs:
+            raise ValueError(
+                "Output overwrites an input: {0}".format(self.output_path)
+            )
+        self.target_quality = target_quality
+        self._profile = profile
+        self._runner_factory = runner_factory
+        self._log_dir = log_dir
+
+    @property
+    def duration(self):
+        """Return the duration of the joined video in seconds."""
+        return sum(
+            float(video.format_info["duration"]) for video in self.videos
+        )
+
+    def incompatible_inputs(self):
+        """Return the inputs whose streams differ from the first input."""
+        first = stream_signature(self.videos[0])
+        return [
+            video.path
+            for video in self.videos[1:]
+            if stream_signature(video) != first
+        ]
+
+    @property
+    def can_copy(self):
+        """Return True if the inputs can be joined by stream copy."""
+        return not self.incompatible_inputs()
+
+    def copy_cmd(self, list_path):
+        """Return the command to join the inputs by stream copy."""
+        return [
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            str(list_path),
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-y",
+            str(self.output_path),
+        ]
+
+    def encode_cmd(self):
+        """Return the command to join the inputs with a single encode.
+
+        Every input is scaled and padded to the size of the first one, so
+        the concat filter gets a uniform video. Inputs without audio get
+        silence if any other input has audio. Filters of the preset are
+        applied to the concat output, since ffmpeg refuses -vf and -af
+        along with -filter_complex.
+        """
+        if self.target_quality is None:
+            raise ValueError("Inputs can't be joined without encoding")
+
+        profile = self._get_profile()
+        profile.update(new_quality=self.target_quality)
+        first = self.videos[0].video_info
+        width, height = first.get("width"), first.get("height")
+        audio = any(video.audio_info for video in self.videos)
+        params = shlex.split(profile.params)
+        video_filters = pop_filters(params, VIDEO_FILTER_OPTIONS)
+        audio_filters = pop_filters(params, AUDIO_FILTER_OPTIONS)
+
+        cmd, filters, pads = [], [], []
+        for index, video in enumerate(self.videos):
+            cmd += ["-i", str(video.path)]
+            filters.append(
+                "[{0}:v:0]scale={1}:{2}:force_original_aspect_ratio="
+                "decrease,pad={1}:{2}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+                "[v{0}]".format(index, width, height)
+            )
+            pads.append("[v{0}]".format(index))
+            if audio and video.audio_info:
+                filters.append(
+                    "[{0}:a:0]{1}[a{0}]".format(index, JOIN_AUDIO_FILTER)
+                )
+            elif audio:
+                filters.append(
+                    "{1},atrim=duration={2}[a{0}]".format(
+                        index, JOIN_SILENCE, video.format_info["duration"]
+                    )
+                )
+            if audio:
+                pads.append("[a{0}]".format(index))
+
+        filters.append(
+            "{0}concat=n={1}:v=1:a={2}[vcat]{3}".format(
+                "".join(pads),
+                len(self.videos),
+                int(audio),
+                "[acat]" if audio else "",
+            )
+        )
+        filters.append(
+            "[vcat]{0}[v]".format(",".join(video_filters or ["null"]))
+        )
+        if audio:
+            filters.append(
+                "[acat]{0}[a]".format(",".join(audio_filters or ["anull"]))
+            )
+        cmd += ["-filter_complex", ";".join(filters), "-map", "[v]"]
+        if audio:
+            cmd += ["-map", "[a]"]
+
+        cmd += params
+        return cmd + ["-y", str(self.output_path)]
+
+    def run(self, on_progress=None):
+        """Join the inputs and return a JoinResult.
+
+        Stream copy is tried first when the inputs are compatible. If it
+        fails, the inputs are encoded if a target quality was given.
+
+        Args:
+            on_progress (callable): Called with the progress percentage
+        """
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.can_copy:
+            list_fd, list_path = tempfile.mkstemp(
+                suffix=".txt", prefix=".join-", dir=self.output_path.parent
+            )
+            try:
+                with os.fdopen(list_fd, "w", encoding="utf-8") as list_file:
+                    list_file.write(
+                        concat_list(video.path for video in self.videos)
+                    )
+                error = self._run_cmd(self.copy_cmd(list_path), on_progress)
+            finally:
+                os.unlink(list_path)
+
+            if error is None:
+                return JoinResult(str(self.output_path), True)
+            if (
+                error.error.kind in NO_FALLBACK_ERRORS
+                or self.target_quality is None
+            ):
+                raise error
+
+        error = self._run_cmd(self.encode_cmd(), on_progress)
+        if error is not None:
+            raise error
+        return JoinResult(str(self.output_path), False)
+
+    def _get_profile(self):
+        if self._profile is None:
+            from .profile import Profile
+
+            self._profile = Profile()
+        return self._profile
+
+    def _run_cmd(self, cmd, on_progress):
+        """Run a command, return a ConversionError if it failed."""
+        reader = OutputReader()
+        log = JobLog(
+            None
+            if self._log_dir is None
+            else Path(self._log_dir, log_name(self.output_path))
+        )
+        duration = self.duration
+        library_error = [None]
+        runner = self._runner_factory()
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                runner.kill()
+                return
+            if on_progress is not None and reader.has_time_read and duration:
+                on_progress(min(int(reader.time / duration * 100), 100))
+
+        try:
+            exit_code = runner.run(cmd, on_output=on_output)
+        finally:
+            log.close()
+
+        error = classify_exit(exit_code, library_error[0])
+        if error is None:
+            if on_progress is not None:
+                on_progress(100)
+            return None
+
+        self.output_path.unlink(missing_ok=True)
+        return ConversionError(
+            self.output_path, exit_code, "\n".join(log.tail()), error
+        )
+
+
+def main(args=None):
+    """Join several videos into one."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " join"
+    )
+    parser.add_argument("output_path")
+    parser.add_argument("input_paths", nargs="+")
+    parser.add_argument(
+        "--quality",
+        help="target quality to encode inputs that can't be stream copied",
+    )
+    args = parser.parse_args(args)
+
+    try:
+        job = JoinJob(
+            args.input_paths, args.output_path, target_quality=args.quality
+        )
+        incompatible = job.incompatible_inputs()
+        for path in incompatible:
+            print("Incompatible streams: {0}".format(path))
+        result = job.run()
+    except (ConversionError, ValueError) as error:
+        print("Failed: {0}".format(error))
+        return 1
+
+    print(
+        "Joined {0} videos into {1} ({2})".format(
+            len(args.input_paths),
+            result.output_path,
+            "stream copy" if result.copied else "encoded",
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
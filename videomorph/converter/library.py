@@ -19,8 +19,13 @@
 
 """This module provides the definition of the Library class."""
 
+from pathlib import Path
+
 from .converter import Converter
+from .errors import classify_exit, merge_errors
+from .joblog import LOGS_DIR, JobLog, log_name
 from .launchers import launcher_factory
+from .projector import SizeProjector
 from .reader import OutputReader
 from .timer import ConversionTimer
 
@@ -32,20 +37,62 @@ class Library:
         """Class initializer."""
         self._converter = Converter()
         self.error = None
+        # (file name, LibraryError, log tail) of the failed tasks
+        self.failures = []
+        self.log = None
         self.reader = OutputReader()
         self.timer = ConversionTimer()
+        self.projector = SizeProjector()
+        self.cache = None
 
     def __getattr__(self, attr):
         """Delegate to use instance member objects."""
         return getattr(self._converter, attr)
 
     def catch_errors(self):
-        """Catch the library error when running."""
-        self.error = self.reader.catch_library_error()
+        """Catch the library error when running.
+
+        A fatal error is never replaced by a later one.
+        """
+        self.error = merge_errors(self.error, self.reader.classify_error())
+        return self.error
+
+    def finish_error(self):
+        """Return the LibraryError of the finished conversion, or None."""
+        return classify_exit(self.converter_exit_code(), self.error)
+
+    def open_log(self, video_path, log_dir=LOGS_DIR):
+        """Start capturing the output of a conversion to a log file."""
+        self.close_log()
+        self.log = JobLog(Path(log_dir, log_name(video_path)))
+
+    def write_log(self, process_output):
+        """Append the process output to the running log."""
+        if self.log is not None:
+            self.log.write(process_output)
+
+    def close_log(self):
+        """Close the running log."""
+        if self.log is not None:
+            self.log.close()
+
+    def log_tail(self, lines=10):
+        """Return the last lines of the running (or last) log."""
+        if self.log is None:
+            return []
+        return self.log.tail(lines)
+
+    def output_is_oversized(self, file_duration, source_size):
+        """Return True if the running output is projected to be too big."""
+        return self.projector.exceeds(
+            size_read=self.reader.size,
+            time_read=self.reader.time,
+            duration=file_duration,
+            source_size=source_size,
+        )
 
     @staticmethod
     def run_player(file_path):
         """Play a video file with user default player."""
         launcher = launcher_factory()
         launcher.open_with_user_app(url=file_path)
-
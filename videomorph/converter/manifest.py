@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# File name: manifest.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the directory scan manifest.
+
+Adding or removing an entry changes the mtime of its directory, so the
+child list of a directory whose mtime didn't change since the last scan
+is read from the manifest instead of the file system. A rescan costs one
+stat per directory instead of a listing plus a stat per entry.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+from . import SYS_PATHS, VALID_VIDEO_EXT
+
+MANIFEST_PATH = Path(SYS_PATHS["config"], "scan-manifest.json")
+
+# Changes in the same mtime tick as the scan can't be detected, so the
+# directories modified this recently are listed again on the next scan
+RACY_NS = 2 * 10**9
+
+
+class ScanManifest:
+    """Class to cache the video files found in a directory tree."""
+
+    def __init__(self, path=MANIFEST_PATH, clock=time.time_ns):
+        """Class initializer.
+
+        Args:
+            path (str): Path to the manifest file, None to keep it in memory
+            clock (callable): Return the current time in nanoseconds
+        """
+        self.path = None if path is None else Path(path)
+        self.dirs = {}
+        self.listed = 0
+        self.reused = 0
+        self._clock = clock
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """Load the manifest file, if any."""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as manifest_file:
+                self.dirs = json.load(manifest_file)
+        except (OSError, ValueError):
+            self.dirs = {}
+
+    def save(self):
+        """Save the manifest file atomically if it changed."""
+        if self.path is None or not self._changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.dirs, manifest_file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+        self._changed = False
+
+    def scan(self, directory):
+        """Return the paths of the video files in a directory tree."""
+        root = Path(directory)
+        videos = []
+        seen = set()
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            key = str(dir_path)
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = self.dirs.get(key)
+            if entry is None or entry["mtime_ns"] != mtime:
+                entry = self._list_dir(dir_path, mtime)
+                self.dirs[key] = entry
+                self._changed = True
+                self.listed += 1
+            else:
+                self.reused += 1
+
+            seen.add(key)
+            videos.extend(
+                str(Path(dir_path, name)) for name in entry["videos"]
+            )
+            stack.extend(
+                Path(dir_path, name) for name in reversed(entry["dirs"])
+            )
+
+        # Forget the directories removed from the tree
+        prefix = str(root).rstrip(os.sep) + os.sep
+        for key in list(self.dirs):
+            if key in seen:
+                continue
+            if key == str(root) or key.startswith(prefix):
+                del self.dirs[key]
+                self._changed = True
+
+        return videos
+
+    def _list_dir(self, dir_path, mtime):
+        dirs, videos = [], []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, don't follow linked directories
+                        if not entry.is_symlink():
+                            dirs.append(entry.name)
+                    elif Path(entry.name).suffix.lower() in VALID_VIDEO_EXT:
+                        videos.append(entry.name)
+        except OSError:
+            mtime = None
+
+        if mtime is not None and self._clock() - mtime < RACY_NS:
+            mtime = None
+
+        return dict(mtime_ns=mtime, dirs=sorted(dirs), videos=sorted(videos))
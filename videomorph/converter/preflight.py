@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+# File name: preflight.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the pre-flight validation of conversion tasks.
+
+Every command is run for a fraction of a second against the null muxer, so
+options rejected by the installed conversion library show up before any
+real encoding starts. prepare() is quick and builds the commands with the
+shared profile, run_commands() runs them and may be called from another
+thread.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import CPU_CORES
+from .errors import classify_exit, classify_output, merge_errors
+from .runner import ProcessRunner
+
+PREFLIGHT_SECONDS = 0.1
+
+PreflightChecks = namedtuple("PreflightChecks", "input output collision cmd")
+PREFLIGHT_CHECK = PreflightChecks(
+    "Input", "Output", "Name collision", "Conversion command"
+)
+
+PreflightIssue = namedtuple("PreflightIssue", "position video_path check msg")
+
+# commands holds (position, video_path, cmd) tuples
+PreflightPlan = namedtuple("PreflightPlan", "report commands")
+
+
+class PreflightReport:
+    """Class to collect the issues found by a pre-flight check."""
+
+    def __init__(self):
+        """Class initializer."""
+        self.issues = []
+        self.checked = 0
+
+    def add(self, position, video_path, check, msg):
+        """Add an issue to the report."""
+        self.issues.append(
+            PreflightIssue(position, str(video_path), check, msg)
+        )
+
+    @property
+    def ok(self):
+        """Return True if no issue was found."""
+        return not self.issues
+
+    @property
+    def failed_positions(self):
+        """Return the positions of the tasks with issues."""
+        return sorted({issue.position for issue in self.issues})
+
+    def format(self):
+        """Return the report as text, one issue per line."""
+        return "\n".join(
+            "{0}: {1}: {2}".format(
+                Path(issue.video_path).name, issue.check, issue.msg
+            )
+            for issue in sorted(self.issues)
+        )
+
+
+class Preflight:
+    """Class to validate a queue of conversion tasks in parallel."""
+
+    def __init__(self, max_workers=None, runner_factory=ProcessRunner):
+        """Class initializer.
+
+        Args:
+            max_workers (int): Maximum number of parallel checks
+            runner_factory (callable): Return a new ProcessRunner
+        """
+        self.max_workers = max_workers or max(CPU_CORES, 1)
+        self._runner_factory = runner_factory
+
+    def check(self, jobs, tagged=False, subtitle=False):
+        """Validate the jobs and return a PreflightReport.
+
+        Args:
+            jobs (iterable): (position, task, target_quality) tuples
+            tagged (bool): Tag the output file names with the quality
+            subtitle (bool): Burn the subtitles into the video
+        """
+        return self.run_commands(self.prepare(jobs, tagged, subtitle))
+
+    def prepare(self, jobs, tagged=False, subtitle=False):
+        """Check the files of the jobs and return a PreflightPlan.
+
+        The arguments are the ones of check().
+        """
+        report = PreflightReport()
+        commands = []
+        outputs = {}
+
+        # The profile is shared by the tasks, so commands are built serially
+        for position, task, target_quality in jobs:
+            report.checked += 1
+            video_path = task.video.path
+            if not self._is_readable(video_path):
+                report.add(
+                    position,
+                    video_path,
+                    PREFLIGHT_CHECK.input,
+                    "Can not read the input video",
+                )
+                continue
+            try:
+                cmd = task.build_conversion_cmd(
+                    target_quality=target_quality,
+                    tagged=tagged,
+                    subtitle=subtitle,
+                    null_seconds=PREFLIGHT_SECONDS,
+                )
+            except PermissionError:
+                report.add(
+                    position,
+                    video_path,
+                    PREFLIGHT_CHECK.output,
+                    "Can not write to the output folder",
+                )
+                continue
+            except FileNotFoundError:
+                report.add(
+                    position,
+                    video_path,
+                    PREFLIGHT_CHECK.input,
+                    "Input video not found",
+                )
+                continue
+
+            output_path = Path(task.get_output_path(tagged))
+            if self._check_output(report, position, task, output_path):
+                commands.append((position, video_path, cmd))
+            outputs.setdefault(output_path, []).append((position, video_path))
+
+        self._check_collisions(report, outputs)
+
+        return PreflightPlan(report, commands)
+
+    def run_commands(self, plan):
+        """Run the commands of a PreflightPlan and return its report."""
+        report, commands = plan
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="preflight"
+        ) as executor:
+            results = executor.map(
+                lambda command: self._run_cmd(command[2]), commands
+            )
+            for (position, video_path, _), error in zip(commands, results):
+                if error is not None:
+                    report.add(
+                        position,
+                        video_path,
+                        PREFLIGHT_CHECK.cmd,
+                        "{0}: {1}".format(error.kind, error.message),
+                    )
+
+        return report
+
+    @staticmethod
+    def _is_readable(video_path):
+        try:
+            with open(video_path, "rb") as video_file:
+                video_file.read(1)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _check_output(report, position, task, output_path):
+        video_path = task.video.path
+        if output_path.resolve() == Path(video_path).resolve():
+            report.add(
+                position,
+                video_path,
+                PREFLIGHT_CHECK.collision,
+                "The output would overwrite the input video",
+            )
+            return False
+        if output_path.exists() and (
+            output_path.is_dir() or not os.access(output_path, os.W_OK)
+        ):
+            report.add(
+                position,
+                video_path,
+                PREFLIGHT_CHECK.output,
+                "Can not overwrite {0}".format(output_path),
+            )
+            return False
+        return True
+
+    @staticmethod
+    def _check_collisions(report, outputs):
+        for output_path, sources in outputs.items():
+            if len(sources) < 2:
+                continue
+            for position, video_path in sources:
+                report.add(
+                    position,
+                    video_path,
+                    PREFLIGHT_CHECK.collision,
+                    "{0} tasks write {1}".format(
+                        len(sources), output_path.name
+                    ),
+                )
+
+    def _run_cmd(self, cmd):
+        """Run a short null muxer conversion and return its error."""
+        error = [None]
+
+        def on_output(chunk):
+            error[0] = merge_errors(error[0], classify_output(chunk))
+
+        try:
+            exit_code = self._runner_factory().run(cmd, on_output=on_output)
+        except OSError as run_error:
+            return classify_output(str(run_error)) or classify_exit(None)
+
+        return classify_exit(exit_code, error[0])
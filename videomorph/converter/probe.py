@@ -19,9 +19,51 @@
 
 """This module provides Probe Class."""
 
+from collections import namedtuple
+
 from .launchers import spawn_process
 from .vmpath import PROBE_PATH
 
+# One stream of a video, language and title are None if not tagged
+Stream = namedtuple(
+    "Stream",
+    "index codec_type codec_name language title default comment "
+    "attached_pic",
+)
+
+
+def parse_streams(probe_lines):
+    """Return the Streams of a -show_streams probe output."""
+    streams = []
+    fields = None
+    for line in probe_lines:
+        line = line.strip()
+        if line == "[STREAM]":
+            fields = {}
+        elif line == "[/STREAM]" and fields is not None:
+            streams.append(_make_stream(fields, len(streams)))
+            fields = None
+        elif fields is not None and "=" in line:
+            key, _, value = line.partition("=")
+            fields[key.lower()] = value
+
+    return streams
+
+
+def _make_stream(fields, position):
+    """Return the Stream of the fields of a probe stream section."""
+    language = fields.get("tag:language", "").lower()
+    return Stream(
+        index=int(fields.get("index", position)),
+        codec_type=fields.get("codec_type"),
+        codec_name=fields.get("codec_name"),
+        language=language if language not in ("", "und") else None,
+        title=fields.get("tag:title") or None,
+        default=fields.get("disposition:default") == "1",
+        comment=fields.get("disposition:comment") == "1",
+        attached_pic=fields.get("disposition:attached_pic") == "1",
+    )
+
 
 class Probe:
     """Probe Class to get info about a video."""
@@ -33,12 +75,72 @@ class Probe:
         self._probe_path = probe_path
         self._video_path = video_path
         self._probe_runner = probe_runner
+        self._frame_rate = None
+        self._pixel_format = None
+        self._audio_format = None
+        self._streams = None
 
         self.format_info = self._parse_probe_format()
         self.video_info = self._parse_probe_video_stream()
         self.audio_info = self._parse_probe_audio_stream()
         self.subtitle_info = self._parse_probe_sub_stream()
 
+    @property
+    def frame_rate(self):
+        """Return the average frame rate of the video stream, like 25/1.
+
+        The video stream is probed again on the first access only.
+        """
+        if self._frame_rate is None:
+            info = self._parse_probe(
+                selected_params={"avg_frame_rate"},
+                cmd=["-show_streams", "-select_streams", "v"],
+            )
+            self._frame_rate = info.get("avg_frame_rate", "")
+        return self._frame_rate
+
+    @property
+    def pixel_format(self):
+        """Return the pixel format of the video stream, like yuv420p.
+
+        The video stream is probed again on the first access only.
+        """
+        if self._pixel_format is None:
+            info = self._parse_probe(
+                selected_params={"pix_fmt"},
+                cmd=["-show_streams", "-select_streams", "v"],
+            )
+            self._pixel_format = info.get("pix_fmt", "")
+        return self._pixel_format
+
+    @property
+    def audio_format(self):
+        """Return the sample rate and channels of the audio stream.
+
+        The audio stream is probed again on the first access only.
+        """
+        if self._audio_format is None:
+            info = self._parse_probe(
+                selected_params={"sample_rate", "channels"},
+                cmd=["-show_streams", "-select_streams", "a"],
+            )
+            self._audio_format = (
+                info.get("sample_rate", ""),
+                info.get("channels", ""),
+            )
+        return self._audio_format
+
+    @property
+    def streams(self):
+        """Return a Stream for every stream of the video, in file order.
+
+        The video is probed again on the first access only.
+        """
+        if self._streams is None:
+            with self._probe(["-show_streams"]) as probe_file:
+                self._streams = parse_streams(probe_file)
+        return self._streams
+
     def _probe(self, args):
         """Return the probe output as a file like object."""
         process_args = [self._probe_path, self._video_path.__str__()]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# File name: projector.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the output SizeProjector."""
+
+
+class SizeProjector:
+    """Class to project the final output size while converting."""
+
+    def __init__(
+        self, max_size=None, max_ratio=None, fallback=None, min_progress=0.05
+    ):
+        """Class initializer.
+
+        Args:
+            max_size (int): Maximum output size in bytes, None for no cap
+            max_ratio (float): Maximum output/source size ratio, None for
+                no cap
+            fallback (str): Target quality to requeue oversized tasks with,
+                None to abort them
+            min_progress (float): Fraction of the video that must be encoded
+                before trusting the projection
+        """
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self.fallback = fallback
+        self.min_progress = min_progress
+
+    @property
+    def is_enabled(self):
+        """Return True if some size cap is configured."""
+        return bool(self.max_size or self.max_ratio)
+
+    @staticmethod
+    def projected_size(size_read, time_read, duration):
+        """Return the estimated final output size in bytes."""
+        if time_read <= 0 or duration <= 0:
+            return None
+
+        return int(size_read * duration / time_read)
+
+    def size_limit(self, source_size):
+        """Return the effective size limit in bytes for a source size."""
+        limits = []
+        if self.max_size:
+            limits.append(self.max_size)
+        if self.max_ratio and source_size:
+            limits.append(int(self.max_ratio * source_size))
+
+        return min(limits) if limits else None
+
+    def exceeds(self, size_read, time_read, duration, source_size):
+        """Return True if the projected output size exceeds the limit."""
+        if not self.is_enabled or duration <= 0:
+            return False
+
+        # Container headers make early projections unreliable
+        if time_read / duration < self.min_progress:
+            return False
+
+        limit = self.size_limit(source_size)
+        projected = self.projected_size(size_read, time_read, duration)
+        if limit is None or projected is None:
+            return False
+
+        return projected > limit
+
+    def fallback_for(self, target_quality):
+        """Return the quality to requeue an oversized task with, if any."""
+        if self.fallback is None or self.fallback == target_quality:
+            return None
+
+        return self.fallback
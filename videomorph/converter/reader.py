@@ -21,6 +21,8 @@
 
 import re
 
+from .errors import classify_output
+
 
 class OutputReader:
     """Read the converter output."""
@@ -30,12 +32,17 @@ class OutputReader:
         self._params_regex = {
             "bitrate": r"bitrate=[ ]*[0-9]*\.[0-9]*[a-z]*./[a-z]*",
             "time": r"time=([0-9.:]+) ",
+            "size": r"size=\s*([0-9]+)([kKMG]i?B)?",
+        }
+        self._size_units = {
+            "": 1,
+            "kB": 1024,
+            "KiB": 1024,
+            "MB": 1024**2,
+            "MiB": 1024**2,
+            "GB": 1024**3,
+            "GiB": 1024**3,
         }
-        self._library_errors = (
-            "Unknown encoder",
-            "Unrecognized option",
-            "Invalid argument",
-        )
         self._process_output = None
 
     def update_read(self, process_output):
@@ -44,11 +51,17 @@ class OutputReader:
 
     def catch_library_error(self):
         """Process the library errors."""
-        for error in self._library_errors:
-            if error in self._process_output:
-                return error
+        error = self.classify_error()
+        return None if error is None else error.message
+
+    def classify_error(self):
+        """Return the LibraryError found in the last output, or None."""
+        return classify_output(self._process_output)
 
-        return None
+    @property
+    def output(self):
+        """Return the last output read."""
+        return self._process_output or ""
 
     @property
     def has_time_read(self):
@@ -62,6 +75,16 @@ class OutputReader:
 
         return bitrate_read[0].split("=")[-1].strip()
 
+    @property
+    def size(self):
+        """Return the output size read in bytes, 0 if not available."""
+        size_read = self._read_output_param(param="size")
+        if not size_read:
+            return 0
+
+        value, unit = size_read[-1]
+        return int(value) * self._size_units.get(unit, 1)
+
     @property
     def time(self):
         """Convert time read to seconds."""
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+
+# File name: resources.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides scheduling and resource controls for conversions."""
+
+import logging
+import os
+import subprocess
+import threading
+from functools import lru_cache
+from pathlib import Path
+from sys import platform
+
+from . import CPU_CORES
+from .utils import which
+
+SYS_CPU_DIR = Path("/sys/devices/system/cpu")
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+CGROUP_PERIOD = 100000
+
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+_log = logging.getLogger(__name__)
+
+
+def parse_cpu_list(cpu_list):
+    """Convert a kernel cpu list like '0-3,8' to a sorted list of ints."""
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+
+    return sorted(cpus)
+
+
+def available_cpus():
+    """Return the CPUs this process is allowed to run on."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def cache_domains(cpus=None, sys_cpu_dir=SYS_CPU_DIR):
+    """Group CPUs sharing the last level cache (L3) as exposed in /sys."""
+    cpus = available_cpus() if cpus is None else cpus
+    domains = []
+    seen = set()
+    for cpu in cpus:
+        if cpu in seen:
+            continue
+        shared = Path(
+            sys_cpu_dir, "cpu{0}".format(cpu), "cache", "index3"
+        ).joinpath("shared_cpu_list")
+        try:
+            domain = [
+                c for c in parse_cpu_list(shared.read_text()) if c in cpus
+            ]
+        except (OSError, ValueError):
+            domain = [cpu]
+        domain = [c for c in domain if c not in seen] or [cpu]
+        seen.update(domain)
+        domains.append(domain)
+
+    return domains
+
+
+def cpu_sets(jobs, cpus=None, sys_cpu_dir=SYS_CPU_DIR):
+    """Split the CPUs in one affinity set per parallel job.
+
+    CPUs are ordered by cache domain, so each set stays within a single L3
+    cache (and NUMA node) whenever the number of jobs allows it.
+    """
+    ordered = [
+        cpu for domain in cache_domains(cpus, sys_cpu_dir) for cpu in domain
+    ]
+    jobs = max(1, min(jobs, len(ordered)))
+    size, extra = divmod(len(ordered), jobs)
+    sets = []
+    start = 0
+    for job in range(jobs):
+        end = start + size + (1 if job < extra else 0)
+        sets.append(ordered[start:end])
+        start = end
+
+    return sets
+
+
+def _tool(name):
+    """Return the path to a system tool or None if not installed."""
+    try:
+        return which(name)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _user_scopes_work(systemd_run):
+    """Return True if transient scopes of the user manager can be run."""
+    try:
+        return (
+            subprocess.run(
+                [systemd_run, "--user", "--scope", "--quiet", "true"],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=10,
+                check=False,
+            ).returncode
+            == 0
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+@lru_cache(maxsize=None)
+def _warn_once(message):
+    """Log a warning the first time only."""
+    _log.warning(message)
+
+
+class ResourcePolicy:
+    """Class to define the priority and limits of a conversion process."""
+
+    def __init__(
+        self,
+        cpus=None,
+        nice=None,
+        ionice=None,
+        cpu_quota=None,
+        memory_max=None,
+    ):
+        """Class initializer.
+
+        Args:
+            cpus (list): CPUs the process is pinned to, None for all
+            nice (int): Niceness of the process, None for default
+            ionice (str): I/O class: 'idle', 'best-effort' or 'realtime'
+            cpu_quota (float): Number of CPUs worth of time allowed by
+                cgroup v2, None for unlimited
+            memory_max (int): Maximum memory in bytes allowed by cgroup v2,
+                None for unlimited
+        """
+        self.cpus = cpus
+        self.nice = nice
+        self.ionice = ionice
+        self.cpu_quota = cpu_quota
+        self.memory_max = memory_max
+        self._cgroups = []
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_parallel_jobs(cls, jobs, cpus=None, **kwargs):
+        """Return one policy per parallel job, each with its own CPU set."""
+        return [
+            cls(cpus=cpu_set, **kwargs) for cpu_set in cpu_sets(jobs, cpus)
+        ]
+
+    @property
+    def threads(self):
+        """Return the number of threads to give the encoder."""
+        if self.cpus:
+            return len(self.cpus)
+        return CPU_CORES
+
+    def wrap(self, program, args, cgroup_root=CGROUP_ROOT):
+        """Return program and args prefixed with the priority tools.
+
+        The CPU and memory limits are in place before the conversion
+        library starts, so it never runs unlimited.
+        """
+        if platform == "win32":
+            return program, list(args)
+
+        prefix = self._limits_prefix(cgroup_root)
+        taskset = _tool("taskset")
+        if self.cpus and taskset is not None:
+            prefix += [taskset, "-c", ",".join(str(c) for c in self.cpus)]
+
+        ionice = _tool("ionice")
+        if self.ionice is not None and ionice is not None:
+            io_class = IONICE_CLASSES.get(self.ionice, self.ionice)
+            prefix += [ionice, "-c", str(io_class)]
+
+        nice = _tool("nice")
+        if self.nice is not None and nice is not None:
+            prefix += [nice, "-n", str(self.nice)]
+
+        if not prefix:
+            return program, list(args)
+
+        return prefix[0], prefix[1:] + [program] + list(args)
+
+    def release(self, args):
+        """Remove the cgroup a finished process ran in.
+
+        Args:
+            args (list): Arguments returned by wrap()
+        """
+        with self._lock:
+            cgroups = [
+                cgroup for cgroup in self._cgroups if str(cgroup) in args
+            ]
+            for cgroup in cgroups:
+                self._cgroups.remove(cgroup)
+
+        for cgroup in cgroups:
+            self._remove_cgroup(cgroup)
+
+    def _limits_prefix(self, cgroup_root):
+        """Return the prefix running a command with the CPU and memory limits.
+
+        A transient systemd scope is used if the user manager runs, else a
+        cgroup v2 of its own that the process joins before exec. Limits
+        that can't be applied are reported once.
+        """
+        if self.cpu_quota is None and self.memory_max is None:
+            return []
+
+        systemd_run = _tool("systemd-run")
+        if systemd_run is not None and _user_scopes_work(systemd_run):
+            prefix = [systemd_run, "--user", "--scope", "--quiet", "--collect"]
+            if self.cpu_quota is not None:
+                prefix += [
+                    "-p",
+                    "CPUQuota={0}%".format(int(self.cpu_quota * 100)),
+                ]
+            if self.memory_max is not None:
+                prefix += ["-p", "MemoryMax={0}".format(int(self.memory_max))]
+            return prefix
+
+        cgroup = self._create_cgroup(cgroup_root)
+        shell = _tool("sh")
+        if cgroup is None or shell is None:
+            return []
+        # The shell joins the cgroup, then execs the command with its pid
+        return [
+            shell,
+            "-c",
+            'echo $$ > "$0/cgroup.procs"; exec "$@"',
+            str(cgroup),
+        ]
+
+    def _create_cgroup(self, cgroup_root):
+        """Return a new cgroup v2 with the limits, None if unavailable."""
+        parent = self._own_cgroup(cgroup_root)
+        controllers = []
+        if self.cpu_quota is not None:
+            controllers.append("cpu")
+        if self.memory_max is not None:
+            controllers.append("memory")
+        try:
+            enabled = (
+                parent.joinpath("cgroup.subtree_control").read_text().split()
+            )
+            missing = [name for name in controllers if name not in enabled]
+            if missing:
+                # Fails if the parent holds processes itself, the cgroup v2
+                # no internal process rule
+                parent.joinpath("cgroup.subtree_control").write_text(
+                    " ".join("+" + name for name in missing)
+                )
+        except OSError as error:
+            _warn_once(
+                "CPU and memory limits not applied, the {0} controllers "
+                "can't be enabled in {1}: {2}".format(
+                    "+".join(controllers), parent, error
+                )
+            )
+            return None
+
+        with self._lock:
+            self._serial += 1
+            cgroup = Path(
+                parent, "videomorph-{0}-{1}".format(os.getpid(), self._serial)
+            )
+        try:
+            cgroup.mkdir()
+            if self.cpu_quota is not None:
+                cgroup.joinpath("cpu.max").write_text(
+                    "{0} {1}".format(
+                        int(self.cpu_quota * CGROUP_PERIOD), CGROUP_PERIOD
+                    )
+                )
+            if self.memory_max is not None:
+                cgroup.joinpath("memory.max").write_text(
+                    str(int(self.memory_max))
+                )
+        except OSError as error:
+            _warn_once(
+                "CPU and memory limits not applied in {0}: {1}".format(
+                    cgroup, error
+                )
+            )
+            self._remove_cgroup(cgroup)
+            return None
+
+        with self._lock:
+            self._cgroups.append(cgroup)
+        return cgroup
+
+    @staticmethod
+    def _own_cgroup(cgroup_root):
+        """Return the cgroup v2 directory of the current process."""
+        try:
+            with open("/proc/self/cgroup") as cgroup_file:
+                for line in cgroup_file:
+                    if line.startswith("0::"):
+                        relative = line[3:].strip().lstrip("/")
+                        return Path(cgroup_root, relative)
+        except OSError:
+            pass
+
+        return Path(cgroup_root)
+
+    @staticmethod
+    def _remove_cgroup(cgroup):
+        """Remove a cgroup directory, ignoring errors."""
+        try:
+            cgroup.rmdir()
+        except OSError:
+            pass
+
+
+class ResourcePool:
+    """Class to hand out the ResourcePolicy of every running job."""
+
+    def __init__(self, resources=None, jobs=None, presets=None):
+        """Class initializer.
+
+        Args:
+            resources (ResourcePolicy): Default policy, None for none
+            jobs (int): Number of parallel jobs to give their own CPU set,
+                None to not pin the jobs to CPUs
+            presets (dict): ResourcePolicy per target quality, used instead
+                of the default one
+        """
+        self.resources = resources
+        self.presets = dict(presets or {})
+        self._free = []
+        if jobs:
+            base = resources or ResourcePolicy()
+            self._free = ResourcePolicy.for_parallel_jobs(
+                jobs,
+                cpus=base.cpus,
+                nice=base.nice,
+                ionice=base.ionice,
+                cpu_quota=base.cpu_quota,
+                memory_max=base.memory_max,
+            )
+        self._pinned = list(self._free)
+        self._lock = threading.Lock()
+
+    def acquire(self, target_quality=None):
+        """Return the policy of a starting job.
+
+        A preset policy comes first, then a free CPU set, then the default
+        policy when every CPU set is taken.
+        """
+        if target_quality in self.presets:
+            return self.presets[target_quality]
+        with self._lock:
+            if self._free:
+                return self._free.pop(0)
+        return self.resources
+
+    def release(self, policy):
+        """Give back the policy of a finished job."""
+        if any(policy is pinned for pinned in self._pinned):
+            with self._lock:
+                self._free.append(policy)
+
+
+def parse_resources(spec):
+    """Return the ResourcePolicy of a spec like 'nice=10 ionice=idle'.
+
+    Known keys are nice, ionice, cpu_quota and memory_max_mib.
+    """
+    options = {}
+    for item in spec.split():
+        key, _, value = item.partition("=")
+        if key == "nice":
+            options["nice"] = int(value)
+        elif key == "ionice":
+            options["ionice"] = value
+        elif key == "cpu_quota":
+            options["cpu_quota"] = float(value)
+        elif key == "memory_max_mib":
+            options["memory_max"] = float(value) * 2**20
+        else:
+            raise ValueError("Unknown resource option: {0}".format(key))
+    return ResourcePolicy(**options)
+
+
+def add_resource_arguments(parser):
+    """Add the priority and CPU pinning options to a command line parser."""
+    parser.add_argument(
+        "--nice", type=int, help="niceness of the conversion processes"
+    )
+    parser.add_argument(
+        "--ionice",
+        choices=sorted(IONICE_CLASSES),
+        help="I/O class of the conversion processes",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="pin every parallel job to its own CPU set",
+    )
+
+
+def resources_from_args(args):
+    """Return the ResourcePolicy of the parsed options, None for default."""
+    if args.nice is None and args.ionice is None:
+        return None
+    return ResourcePolicy(nice=args.nice, ionice=args.ionice)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# File name: retry.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the retry policy for failed conversion tasks."""
+
+from collections import namedtuple
+
+from .errors import ERROR_KIND
+
+# Errors that may not happen again, like a network file system hiccup
+TRANSIENT_ERRORS = (
+    ERROR_KIND.io_error,
+    ERROR_KIND.crashed,
+    ERROR_KIND.unknown,
+)
+# Errors a different preset can avoid, like a missing encoder
+FALLBACK_ERRORS = (
+    ERROR_KIND.missing_encoder,
+    ERROR_KIND.bad_option,
+    ERROR_KIND.crashed,
+)
+
+# outcome is the LibraryError of a failed attempt, None if it succeeded
+TaskAttempt = namedtuple("TaskAttempt", "number target_quality outcome")
+
+Retry = namedtuple("Retry", "delay target_quality")
+
+
+class RetryPolicy:
+    """Class to decide if and when a failed task runs again."""
+
+    def __init__(
+        self,
+        max_attempts=1,
+        backoff=5.0,
+        factor=2.0,
+        max_delay=300.0,
+        fallbacks=None,
+        transient_errors=TRANSIENT_ERRORS,
+        fallback_errors=FALLBACK_ERRORS,
+    ):
+        """Class initializer.
+
+        Args:
+            max_attempts (int): Maximum number of runs per task, 1 for no
+                retries
+            backoff (float): Seconds to wait before the first retry
+            factor (float): Multiplier of the wait for every new retry
+            max_delay (float): Maximum seconds to wait before a retry
+            fallbacks (dict): Fallback target quality for a target quality
+            transient_errors (tuple): Error kinds retried with the same
+                target quality
+            fallback_errors (tuple): Error kinds retried with the fallback
+                target quality
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_delay = max_delay
+        self.fallbacks = fallbacks or {}
+        self.transient_errors = transient_errors
+        self.fallback_errors = fallback_errors
+
+    @property
+    def is_enabled(self):
+        """Return True if failed tasks may run again."""
+        return self.max_attempts > 1
+
+    def delay(self, failures):
+        """Return the seconds to wait after a number of failed attempts."""
+        return min(
+            self.backoff * self.factor ** max(failures - 1, 0), self.max_delay
+        )
+
+    def next_retry(self, attempts, error):
+        """Return the Retry after the last failed attempt, None to give up.
+
+        Args:
+            attempts (list): TaskAttempts of the task, the last one failed
+            error (LibraryError): Error of the last attempt
+        """
+        if not attempts or len(attempts) >= self.max_attempts:
+            return None
+
+        target_quality = attempts[-1].target_quality
+        fallback = self.fallbacks.get(target_quality)
+        if error.kind in self.fallback_errors and fallback is not None:
+            target_quality = fallback
+        elif error.kind not in self.transient_errors:
+            return None
+
+        return Retry(self.delay(len(attempts)), target_quality)
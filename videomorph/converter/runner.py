@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# File name: runner.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the ProcessRunner, a Qt free converter."""
+
+import os
+from subprocess import DEVNULL, PIPE, STDOUT, Popen
+
+from .vmpath import LIBRARY_PATH
+
+CHUNK_SIZE = 4096
+
+
+class ProcessRunner:
+    """Class to run the conversion library in a subprocess."""
+
+    def __init__(self, library_path=LIBRARY_PATH):
+        """Class initializer."""
+        self._library_path = library_path
+        self._process = None
+
+    def run(self, cmd, on_output=None, resources=None):
+        """Run a conversion command and return the process exit code.
+
+        Args:
+            cmd (list): Conversion library arguments
+            on_output (callable): Called with every chunk of merged output
+            resources (ResourcePolicy): Priority and limits for the process
+        """
+        program, args = self._library_path, cmd
+        if resources is not None:
+            program, args = resources.wrap(program, args)
+
+        try:
+            self._process = Popen(
+                [program] + list(args),
+                stdin=DEVNULL,
+                stdout=PIPE,
+                stderr=STDOUT,
+            )
+        except OSError:
+            if resources is not None:
+                resources.release(args)
+            raise
+
+        try:
+            fd = self._process.stdout.fileno()
+            while True:
+                chunk = os.read(fd, CHUNK_SIZE)
+                if not chunk:
+                    break
+                if on_output is not None:
+                    on_output(chunk.decode("utf-8", errors="replace"))
+            return self._process.wait()
+        finally:
+            self._process.stdout.close()
+            if resources is not None:
+                resources.release(args)
+
+    @property
+    def is_running(self):
+        """Return True if the process is running."""
+        return self._process is not None and self._process.poll() is None
+
+    def terminate(self):
+        """Terminate the running process."""
+        if self.is_running:
+            self._process.terminate()
+
+    def kill(self):
+        """Kill the running process."""
+        if self.is_running:
+            self._process.kill()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+# File name: scheduler.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the I/O aware conversion Scheduler.
+
+IOScheduler is a library component for the front ends running several
+conversions at once, like the job server daemon. The GUI queue converts
+one task at a time, so it doesn't use it.
+"""
+
+import os
+import shlex
+from collections import namedtuple
+from pathlib import Path
+
+from . import CPU_CORES, STATUS
+
+JobKinds = namedtuple("JobKinds", "io cpu audio")
+JOB_KIND = JobKinds("io", "cpu", "audio")
+# Lightweight kinds run in their own slots, alongside the heavy jobs
+LIGHT_KINDS = (JOB_KIND.audio,)
+MAX_LIGHT_JOBS = 4
+
+AUDIO_EXTENSIONS = {
+    ".aac",
+    ".ac3",
+    ".flac",
+    ".m4a",
+    ".mp3",
+    ".oga",
+    ".ogg",
+    ".opus",
+    ".wav",
+}
+
+# Video bitrate (bits/s) under which an encode is considered I/O bound
+LOW_BITRATE = 500 * 1000
+# How many times faster than real time an I/O bound job reads its input
+IO_SPEEDUP = 8
+
+_COPY_OPTIONS = {"-c", "-codec", "-c:v", "-codec:v", "-vcodec"}
+_VIDEO_BITRATE_OPTIONS = {"-b:v", "-vb"}
+_VIDEO_CODEC_OPTIONS = {"-c:v", "-codec:v", "-vcodec"}
+_UNITS = {"k": 1000, "K": 1000, "m": 1000**2, "M": 1000**2}
+
+
+def device_id(path):
+    """Return the id of the device holding path or its nearest parent."""
+    path = Path(path).absolute()
+    for candidate in (path, *path.parents):
+        try:
+            return os.stat(candidate).st_dev
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+    return None
+
+
+def parse_bitrate(value):
+    """Convert an ffmpeg bitrate string like '1000k' to bits/s."""
+    try:
+        if value[-1] in _UNITS:
+            return float(value[:-1]) * _UNITS[value[-1]]
+        return float(value)
+    except (IndexError, TypeError, ValueError):
+        return None
+
+
+def is_audio_only(params, extension=None):
+    """Return True if ffmpeg params and extension target an audio file."""
+    args = shlex.split(params) if isinstance(params, str) else list(params)
+    if "-vn" in args:
+        return True
+
+    if any(option in _VIDEO_CODEC_OPTIONS for option in args):
+        return False
+
+    return extension is not None and extension.lower() in AUDIO_EXTENSIONS
+
+
+def job_kind(params, extension=None):
+    """Return whether a job with these ffmpeg params is I/O or CPU bound.
+
+    Audio only jobs are of their own lightweight kind.
+    """
+    args = shlex.split(params) if isinstance(params, str) else list(params)
+    if is_audio_only(args, extension):
+        return JOB_KIND.audio
+
+    for option, value in zip(args, args[1:]):
+        if option in _COPY_OPTIONS and value == "copy":
+            return JOB_KIND.io
+        if option in _VIDEO_BITRATE_OPTIONS:
+            bitrate = parse_bitrate(value)
+            if bitrate is not None and bitrate <= LOW_BITRATE:
+                return JOB_KIND.io
+
+    return JOB_KIND.cpu
+
+
+def task_kind(task):
+    """Return the kind of a task using its own target quality.
+
+    The profile is shared by the tasks of a queue, so its params are the
+    fallback of tasks without a target quality only.
+    """
+    kind = getattr(task, "kind", None)
+    if kind is not None:
+        return kind
+    return job_kind(
+        task.profile.params or "", getattr(task.profile, "extension", None)
+    )
+
+
+def task_bandwidth(task, kind):
+    """Estimate the bytes/s a task reads from its input device."""
+    try:
+        bitrate = float(task.video.format_info["bit_rate"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+    speedup = IO_SPEEDUP if kind == JOB_KIND.io else 1
+    return bitrate / 8 * speedup
+
+
+_Job = namedtuple("_Job", "devices kind bandwidth")
+
+
+class IOScheduler:
+    """Class to decide which tasks can run in parallel.
+
+    Tasks are limited per device (the one holding the input video and the
+    one holding the output directory), both in number of concurrent jobs
+    and in estimated read bandwidth. I/O bound jobs (remuxes, low bitrate
+    encodes) are interleaved with CPU bound encodes. Lightweight jobs, like
+    audio extractions, run in their own slots and ignore the device limits.
+    """
+
+    def __init__(
+        self,
+        max_jobs=None,
+        device_limit=1,
+        kind_of=task_kind,
+        max_light_jobs=MAX_LIGHT_JOBS,
+    ):
+        """Class initializer.
+
+        Args:
+            max_jobs (int): Maximum number of jobs running at the same time
+            device_limit (int): Default number of jobs allowed per device
+            kind_of (callable): Return the JOB_KIND of a task
+            max_light_jobs (int): Maximum number of lightweight jobs running
+                at the same time, on top of max_jobs
+        """
+        self.max_jobs = max_jobs or max(CPU_CORES, 1)
+        self.max_light_jobs = max_light_jobs
+        self.device_limit = device_limit
+        self._kind_of = kind_of
+        self._device_limits = {}
+        self._bandwidth_limits = {}
+        self._running = {}
+
+    def set_device_limit(self, path, jobs=None, bandwidth=None):
+        """Set the jobs and bytes/s limits for the device holding path."""
+        device = device_id(path)
+        if jobs is not None:
+            self._device_limits[device] = jobs
+        if bandwidth is not None:
+            self._bandwidth_limits[device] = bandwidth
+
+    @property
+    def running(self):
+        """Return the tasks currently running."""
+        return list(self._running)
+
+    @property
+    def is_full(self):
+        """Return True if no more heavy jobs can run at this moment."""
+        return self._count(light=False) >= self.max_jobs
+
+    @property
+    def is_light_full(self):
+        """Return True if no more lightweight jobs can run at this moment."""
+        return self._count(light=True) >= self.max_light_jobs
+
+    def device_load(self, device):
+        """Return the number of running heavy jobs and bytes/s on a device."""
+        jobs = [job for job in self._running.values() if device in job.devices]
+        heavy = [job for job in jobs if job.kind not in LIGHT_KINDS]
+        return len(heavy), sum(job.bandwidth for job in jobs)
+
+    def can_start(self, task):
+        """Return True if the task fits in the current device limits."""
+        if task in self._running:
+            return False
+
+        job = self._describe(task)
+        if job.kind in LIGHT_KINDS:
+            return not self.is_light_full
+
+        if self.is_full:
+            return False
+
+        for device in job.devices:
+            jobs, bandwidth = self.device_load(device)
+            if jobs >= self._device_limits.get(device, self.device_limit):
+                return False
+            limit = self._bandwidth_limits.get(device)
+            if limit is None or not jobs:
+                continue
+            if bandwidth + job.bandwidth > limit:
+                return False
+
+        return True
+
+    def next_task(self, tasks):
+        """Return the next task to start, or None if nothing can start."""
+        candidates = [
+            task
+            for task in tasks
+            if task.status == STATUS.todo and self.can_start(task)
+        ]
+        if not candidates:
+            return None
+
+        # Lightweight jobs don't compete with the heavy ones
+        for task in candidates:
+            if self._kind_of(task) in LIGHT_KINDS:
+                return task
+
+        # Interleave: prefer the kind that is less represented right now
+        kinds = [job.kind for job in self._running.values()]
+        wanted = min(
+            (kind for kind in JOB_KIND if kind not in LIGHT_KINDS),
+            key=kinds.count,
+        )
+        for task in candidates:
+            if self._kind_of(task) == wanted:
+                return task
+
+        return candidates[0]
+
+    def start(self, task):
+        """Register a task as running."""
+        self._running[task] = self._describe(task)
+
+    def finish(self, task):
+        """Register a task as finished."""
+        self._running.pop(task, None)
+
+    def _count(self, light):
+        """Return the number of running light or heavy jobs."""
+        return sum(
+            (job.kind in LIGHT_KINDS) == light
+            for job in self._running.values()
+        )
+
+    def _describe(self, task):
+        """Return the scheduling info of a task."""
+        kind = self._kind_of(task)
+        devices = {device_id(task.video.path), device_id(task.output_dir)}
+        devices.discard(None)
+        return _Job(devices, kind, task_bandwidth(task, kind))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# File name: selection.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides the rules to select the streams to convert.
+
+Without -map, the conversion library picks one stream of every kind by
+itself. Rules choose the streams explicitly, like the first video, the
+English and Spanish audio and no commentary, so the extra tracks of a
+multi-language source are neither decoded nor encoded.
+"""
+
+# Probes tag languages with ISO 639-2 codes, rules may use ISO 639-1
+LANGUAGE_CODES = {
+    "ar": ("ara",),
+    "de": ("deu", "ger"),
+    "en": ("eng",),
+    "es": ("spa",),
+    "fr": ("fra", "fre"),
+    "it": ("ita",),
+    "ja": ("jpn",),
+    "ko": ("kor",),
+    "nl": ("nld", "dut"),
+    "pl": ("pol",),
+    "pt": ("por",),
+    "ru": ("rus",),
+    "sv": ("swe",),
+    "zh": ("zho", "chi"),
+}
+
+
+def language_codes(languages):
+    """Return every probe code of some ISO 639-1 or 639-2 languages."""
+    codes = set()
+    for language in languages:
+        language = language.strip().lower()
+        codes.add(language)
+        codes.update(LANGUAGE_CODES.get(language, ()))
+    return codes
+
+
+def is_commentary(stream):
+    """Return True if a stream is a commentary track."""
+    return stream.comment or "commentary" in (stream.title or "").lower()
+
+
+def map_options(streams, input_index=0):
+    """Return the -map options of some streams of an input."""
+    options = []
+    for stream in streams:
+        options += ["-map", "{0}:{1}".format(input_index, stream.index)]
+    return options
+
+
+class StreamRules:
+    """Class to choose the streams of a video to convert."""
+
+    def __init__(
+        self,
+        audio_languages=(),
+        subtitle_languages=(),
+        skip_commentary=True,
+        max_audio=None,
+    ):
+        """Class initializer.
+
+        Args:
+            audio_languages (tuple): Languages of the audio to keep, like
+                ("en", "es"), empty to keep every audio stream
+            subtitle_languages (tuple): Languages of the subtitles to keep,
+                empty to drop the subtitle streams
+            skip_commentary (bool): Drop the commentary tracks
+            max_audio (int): Maximum number of audio streams to keep, None
+                for no limit
+        """
+        self.audio_languages = language_codes(audio_languages)
+        self.subtitle_languages = language_codes(subtitle_languages)
+        self.skip_commentary = skip_commentary
+        self.max_audio = max_audio
+
+    def select(self, streams):
+        """Return the Streams to convert, in file order.
+
+        The first video stream is kept, cover pictures are not videos. If
+        no audio stream matches the rules, the first one is kept, so the
+        output is never silent by mistake.
+        """
+        videos = [
+            stream
+            for stream in streams
+            if stream.codec_type == "video" and not stream.attached_pic
+        ]
+        audios = [stream for stream in streams if stream.codec_type == "audio"]
+        selected = videos[:1]
+
+        kept = [
+            stream
+            for stream in audios
+            if self._keeps(stream, self.audio_languages, keep_all=True)
+        ]
+        if not kept and audios:
+            kept = audios[:1]
+        selected += kept[: self.max_audio]
+
+        selected += [
+            stream
+            for stream in streams
+            if stream.codec_type == "subtitle"
+            and self._keeps(stream, self.subtitle_languages)
+        ]
+
+        return sorted(selected, key=lambda stream: stream.index)
+
+    def _keeps(self, stream, languages, keep_all=False):
+        if self.skip_commentary and is_commentary(stream):
+            return False
+        if not languages:
+            return keep_all
+        return stream.language in languages
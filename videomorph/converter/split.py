@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+# File name: split.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides the split of a video into parts.
+
+The parts are cut by the segment muxer with stream copy, so nothing is
+encoded and every part starts at a keyframe. The part length is planned
+from the probed duration and size of the video, and the split is done
+again with shorter parts if a part still exceeds the size limit.
+
+Run with: python -m videomorph.converter.split VIDEO [--max-mib N]
+[--max-minutes N]
+"""
+
+import argparse
+import glob
+import math
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from . import APP_NAME, VERSION
+from .batch import ConversionError
+from .errors import classify_exit, merge_errors
+from .joblog import JobLog, log_name
+from .reader import OutputReader
+from .runner import ProcessRunner
+
+# Cuts happen at the first keyframe after the planned time, so parts are
+# planned this much shorter to stay under a size limit
+SIZE_MARGIN = 0.9
+# Splits tried with shorter parts before giving up on a size limit
+MAX_SPLIT_ATTEMPTS = 3
+
+# max_bytes or max_seconds may be None for no limit
+SplitLimits = namedtuple("SplitLimits", "max_bytes max_seconds")
+SplitPlan = namedtuple("SplitPlan", "duration segment_seconds parts")
+
+
+def plan_split(duration, size, limits):
+    """Return the SplitPlan of a video.
+
+    Args:
+        duration (float): Duration of the video in seconds
+        size (int): Size of the video in bytes
+        limits (SplitLimits): Maximum size and duration of every part
+    """
+    if duration <= 0:
+        return SplitPlan(duration, duration, 1)
+
+    candidates = []
+    if limits.max_seconds:
+        candidates.append(float(limits.max_seconds))
+    if limits.max_bytes and size:
+        bytes_per_second = size / duration
+        candidates.append(limits.max_bytes / bytes_per_second * SIZE_MARGIN)
+
+    if not candidates or min(candidates) >= duration:
+        return SplitPlan(duration, duration, 1)
+
+    segment_seconds = min(candidates)
+    return SplitPlan(
+        duration, segment_seconds, math.ceil(duration / segment_seconds)
+    )
+
+
+def part_pattern(video_path, output_dir=None):
+    """Return the segment muxer pattern of the part files of a video."""
+    video_path = Path(video_path)
+    output_dir = video_path.parent if output_dir is None else output_dir
+    # The segment muxer takes % as the start of a format field
+    stem = video_path.stem.replace("%", "%%")
+    return Path(output_dir, "{0}.part%03d{1}".format(stem, video_path.suffix))
+
+
+def split_cmd(video_path, pattern, segment_seconds):
+    """Return the command to split a video by stream copy."""
+    return [
+        "-i",
+        str(video_path),
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-f",
+        "segment",
+        "-segment_time",
+        "{0:.3f}".format(segment_seconds),
+        "-reset_timestamps",
+        "1",
+        "-y",
+        str(pattern),
+    ]
+
+
+class Splitter:
+    """Class to split videos into parts without encoding."""
+
+    def __init__(
+        self, runner_factory=ProcessRunner, video_factory=None, log_dir=None
+    ):
+        """Class initializer.
+
+        Args:
+            runner_factory (callable): Return a new ProcessRunner
+            video_factory (callable): Return a Video from a path
+            log_dir (str): Directory for the log files, None for no files
+        """
+        if video_factory is None:
+            from .video import Video
+
+            video_factory = Video
+
+        self._runner_factory = runner_factory
+        self._video_factory = video_factory
+        self._log_dir = log_dir
+
+    def plan(self, video_path, limits):
+        """Return the SplitPlan of a video."""
+        video = self._video_factory(video_path)
+        duration = float(video.format_info["duration"])
+        try:
+            size = int(video.format_info["size"])
+        except (KeyError, TypeError, ValueError):
+            size = Path(video_path).stat().st_size
+        return plan_split(duration, size, limits)
+
+    def split(
+        self,
+        video_path,
+        limits,
+        output_dir=None,
+        delete_source=False,
+        on_progress=None,
+    ):
+        """Split a video and return the paths of its parts.
+
+        A video within the limits is not split, its own path is returned.
+
+        Args:
+            video_path (str): Path to the video to split
+            limits (SplitLimits): Maximum size and duration of every part
+            output_dir (str): Directory for the parts, the video one if None
+            delete_source (bool): Delete the video once it is split
+            on_progress (callable): Called with the progress percentage
+        """
+        video_path = Path(video_path)
+        plan = self.plan(video_path, limits)
+        if plan.parts <= 1:
+            return [str(video_path)]
+
+        pattern = part_pattern(video_path, output_dir)
+        pattern.parent.mkdir(parents=True, exist_ok=True)
+        segment_seconds = plan.segment_seconds
+        for attempt in range(MAX_SPLIT_ATTEMPTS):
+            # Don't mix the parts with those of an older split
+            for part in self._parts(video_path, pattern):
+                part.unlink()
+
+            self._run_cmd(
+                video_path,
+                split_cmd(video_path, pattern, segment_seconds),
+                plan.duration,
+                pattern,
+                on_progress,
+            )
+            parts = self._parts(video_path, pattern)
+            largest = max((part.stat().st_size for part in parts), default=0)
+            if not limits.max_bytes or largest <= limits.max_bytes:
+                break
+            # Peaks of bitrate or long GOPs made a part too big
+            segment_seconds *= limits.max_bytes / largest * SIZE_MARGIN
+        else:
+            for part in parts:
+                part.unlink()
+            raise ValueError(
+                "Parts of {0} exceed {1} bytes, a part of {2} bytes "
+                "can't be cut at a keyframe".format(
+                    video_path, limits.max_bytes, largest
+                )
+            )
+
+        if delete_source:
+            video_path.unlink()
+
+        return [str(part) for part in parts]
+
+    @staticmethod
+    def _parts(video_path, pattern):
+        """Return the part files of a video, in part order."""
+        # Part numbers have 3 digits at least, like %03d writes them
+        part_glob = "{0}.part*{1}".format(
+            glob.escape(video_path.stem), glob.escape(video_path.suffix)
+        )
+        part_name = re.compile(
+            r"{0}\.part([0-9]{{3,}}){1}$".format(
+                re.escape(video_path.stem), re.escape(video_path.suffix)
+            )
+        )
+        parts = []
+        for part in pattern.parent.glob(part_glob):
+            match = part_name.match(part.name)
+            if match is not None:
+                parts.append((int(match.group(1)), part))
+        return [part for _, part in sorted(parts)]
+
+    def _run_cmd(self, video_path, cmd, duration, pattern, on_progress):
+        reader = OutputReader()
+        log = JobLog(
+            None
+            if self._log_dir is None
+            else Path(self._log_dir, log_name(video_path))
+        )
+        library_error = [None]
+        runner = self._runner_factory()
+
+        def on_output(chunk):
+            reader.update_read(chunk)
+            log.write(chunk)
+            library_error[0] = merge_errors(
+                library_error[0], reader.classify_error()
+            )
+            if library_error[0] is not None and library_error[0].fatal:
+                runner.kill()
+                return
+            if on_progress is not None and reader.has_time_read:
+                on_progress(min(int(reader.time / duration * 100), 100))
+
+        try:
+            exit_code = runner.run(cmd, on_output=on_output)
+        finally:
+            log.close()
+
+        error = classify_exit(exit_code, library_error[0])
+        if error is not None:
+            for part in self._parts(video_path, pattern):
+                part.unlink()
+            raise ConversionError(
+                video_path, exit_code, "\n".join(log.tail()), error
+            )
+
+        if on_progress is not None:
+            on_progress(100)
+
+
+def main(args=None):
+    """Split videos into parts without encoding."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " split"
+    )
+    parser.add_argument("video_paths", nargs="+")
+    parser.add_argument(
+        "--max-mib", type=float, help="maximum size of every part in MiB"
+    )
+    parser.add_argument(
+        "--max-minutes", type=float, help="maximum duration of every part"
+    )
+    parser.add_argument("--output-dir", help="directory for the parts")
+    args = parser.parse_args(args)
+
+    if not (args.max_mib or args.max_minutes):
+        parser.error("--max-mib or --max-minutes is required")
+
+    limits = SplitLimits(
+        args.max_mib * 2**20 if args.max_mib else None,
+        args.max_minutes * 60 if args.max_minutes else None,
+    )
+    splitter = Splitter()
+    failed = 0
+    for video_path in args.video_paths:
+        try:
+            parts = splitter.split(video_path, limits, args.output_dir)
+        except (ConversionError, OSError, KeyError, ValueError) as error:
+            print("Failed: {0}: {1}".format(video_path, error))
+            failed += 1
+            continue
+        print("{0}: {1} parts".format(video_path, len(parts)))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# File name: streaming.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""This module provides streaming output while encoding.
+
+The output is written as a streamable format (fragmented MP4, MPEG-TS or
+Matroska) to a named pipe or posted to a local HTTP endpoint, so the
+consumers can start as soon as the first fragments are out. A file copy
+can be kept through the tee muxer, without encoding twice.
+
+Run with: python -m videomorph.converter.streaming VIDEO QUALITY TARGET
+"""
+
+import argparse
+import os
+import stat
+from collections import namedtuple
+from pathlib import Path
+
+from . import APP_NAME, VERSION
+from .errors import classify_exit
+from .reader import OutputReader
+from .runner import ProcessRunner
+
+# Muxer options to make a format streamable
+STREAM_FORMATS = {
+    "mp4": ["-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "mpegts": [],
+    "matroska": [],
+    "webm": [],
+}
+# Streamable format of an output extension
+EXTENSION_FORMATS = {
+    ".m4v": "mp4",
+    ".mkv": "matroska",
+    ".mov": "mp4",
+    ".mp4": "mp4",
+    ".webm": "webm",
+}
+DEFAULT_FORMAT = "mpegts"
+
+# url is a FIFO path or an http:// URL, format is None to use the one of
+# the output extension
+StreamTarget = namedtuple("StreamTarget", "url format keep_file")
+
+_TEE_SPECIAL = "\\|[]"
+
+
+def is_http(url):
+    """Return True if a stream target is an HTTP endpoint."""
+    return str(url).startswith(("http://", "https://"))
+
+
+def stream_format(target, extension):
+    """Return the streamable format of a target and an output extension."""
+    if target.format is not None:
+        if target.format not in STREAM_FORMATS:
+            raise ValueError("Not a streamable format: " + target.format)
+        return target.format
+    return EXTENSION_FORMATS.get(extension.lower(), DEFAULT_FORMAT)
+
+
+def prepare_target(target):
+    """Create the named pipe of a target if it doesn't exist."""
+    if is_http(target.url):
+        return
+    path = Path(target.url)
+    try:
+        if not stat.S_ISFIFO(path.stat().st_mode):
+            raise ValueError("Not a named pipe: {0}".format(path))
+    except FileNotFoundError:
+        os.mkfifo(path)
+
+
+def _tee_escape(url):
+    """Escape the characters the tee muxer takes as separators."""
+    for char in _TEE_SPECIAL:
+        url = url.replace(char, "\\" + char)
+    return url
+
+
+def streaming_output_args(target, output_path, mapped):
+    """Return the output arguments streaming to a target.
+
+    Args:
+        target (StreamTarget): Where to stream the output
+        output_path (str): Path to the file copy, if target.keep_file
+        mapped (bool): True if the command already maps its streams
+    """
+    output_path = Path(output_path)
+    muxer = stream_format(target, output_path.suffix)
+    options = STREAM_FORMATS[muxer]
+    if not target.keep_file:
+        return ["-f", muxer] + options + ["-y", str(target.url)]
+
+    # The stream keeps going if the consumer stops reading, so the file
+    # copy is always complete
+    slave_options = ["f=" + muxer, "onfail=ignore"]
+    for option, value in zip(options[::2], options[1::2]):
+        slave_options.append("{0}={1}".format(option.lstrip("-"), value))
+    slaves = "[{0}]{1}|{2}".format(
+        ":".join(slave_options),
+        _tee_escape(str(target.url)),
+        _tee_escape(str(output_path)),
+    )
+    # The tee muxer takes only mapped streams
+    maps = [] if mapped else ["-map", "0:v:0?", "-map", "0:a:0?"]
+    return maps + ["-f", "tee", "-y", slaves]
+
+
+def main(args=None):
+    """Convert a video streaming the output while encoding."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " streaming"
+    )
+    parser.add_argument("video_path")
+    parser.add_argument("target_quality")
+    parser.add_argument(
+        "target", help="named pipe path or http:// URL to stream to"
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(STREAM_FORMATS),
+        help="streamable format, from the preset extension by default",
+    )
+    parser.add_argument(
+        "--keep-file", action="store_true", help="also write a file copy"
+    )
+    parser.add_argument(
+        "--output-dir", default=".", help="directory for the file copy"
+    )
+    args = parser.parse_args(args)
+
+    from .profile import Profile
+    from .task import Task
+    from .video import Video
+
+    video = Video(args.video_path)
+    if not video.is_valid():
+        print("Invalid video: {0}".format(args.video_path))
+        return 1
+
+    task = Task(video, Profile(), args.output_dir)
+    task.stream_target = StreamTarget(args.target, args.format, args.keep_file)
+    try:
+        prepare_target(task.stream_target)
+        cmd = task.build_conversion_cmd(
+            args.target_quality, tagged=False, subtitle=False
+        )
+    except (OSError, ValueError) as error:
+        print("Failed: {0}".format(error))
+        return 1
+
+    reader = OutputReader()
+    print("Streaming to {0}".format(args.target))
+    exit_code = ProcessRunner().run(cmd, on_output=reader.update_read)
+    error = classify_exit(exit_code, reader.classify_error())
+    if error is not None:
+        print("Failed: {0}".format(error.message))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
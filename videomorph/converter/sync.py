@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+
+# File name: sync.py
+#
+#   VideoMorph - A PyQt6 frontend to ffmpeg.
+#   Copyright 2016-2022 VideoMorph Development Team
+
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+
+#       http://www.apache.org/licenses/LICENSE-2.0
+
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""This module provides the incremental mirror sync of a source tree.
+
+A state file in the output tree records, for every output, the source it
+comes from, the source fingerprint and a hash of the preset params. Only
+new or changed sources are converted again.
+
+Run with: python -m videomorph.converter.sync SOURCE_DIR OUTPUT_DIR QUALITY
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import as_completed
+from pathlib import Path
+
+from . import APP_NAME, VERSION
+from .batch import BatchConverter, ConversionError
+from .cache import OutputCache
+from .console import search_directory_recursively
+from .fingerprint import fast_fingerprint
+from .resources import add_resource_arguments, resources_from_args
+
+SYNC_STATE_NAME = ".videomorph-sync.json"
+
+# convert holds (source_path, output_path, fingerprint) tuples
+SyncPlan = namedtuple("SyncPlan", "convert skip prune")
+SyncReport = namedtuple("SyncReport", "converted skipped pruned failed")
+
+
+def source_fingerprint(path):
+    """Return a cheap fingerprint of the content of a source file."""
+    return fast_fingerprint(path)
+
+
+def params_hash(params, extension):
+    """Return a hash of the preset params producing an output."""
+    return hashlib.sha1(
+        "{0}|{1}".format(" ".join(params.split()), extension).encode("utf-8")
+    ).hexdigest()
+
+
+class SyncState:
+    """Class to store what produced every output of a mirror."""
+
+    def __init__(self, output_dir, name=SYNC_STATE_NAME):
+        """Class initializer."""
+        self.output_dir = Path(output_dir)
+        self.path = Path(output_dir, name)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the state file, if any, start fresh if it is corrupt."""
+        try:
+            with open(self.path, encoding="utf-8") as state_file:
+                self.entries = json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+        if not isinstance(self.entries, dict):
+            self.entries = {}
+
+    def save(self):
+        """Save the state file atomically."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(
+                prefix=self.path.name + ".", dir=self.path.parent
+            )
+            try:
+                with open(fd, "w", encoding="utf-8") as state_file:
+                    json.dump(
+                        self.entries, state_file, indent=1, sort_keys=True
+                    )
+                    state_file.flush()
+                    os.fsync(state_file.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def is_up_to_date(self, output_path, fingerprint, params):
+        """Return True if output_path was made from the same source."""
+        entry = self.entries.get(self._key(output_path))
+        return (
+            entry is not None
+            and entry["fingerprint"] == fingerprint
+            and entry["params"] == params
+            and Path(output_path).exists()
+        )
+
+    def record(self, output_path, source, fingerprint, params):
+        """Record what produced output_path.
+
+        Args:
+            output_path (str): Path to the output file
+            source (str): Source path, relative to the source tree
+            fingerprint (str): Fingerprint of the source file
+            params (str): Hash of the preset params
+        """
+        with self._lock:
+            self.entries[self._key(output_path)] = dict(
+                source=source, fingerprint=fingerprint, params=params
+            )
+
+    def forget(self, output_path):
+        """Remove the record of output_path."""
+        with self._lock:
+            self.entries.pop(self._key(output_path), None)
+
+    def outputs(self):
+        """Return (output_path, source) for every recorded output."""
+        return [
+            (self.output_dir / key, entry["source"])
+            for key, entry in self.entries.items()
+        ]
+
+    def _key(self, output_path):
+        return Path(output_path).relative_to(self.output_dir).as_posix()
+
+
+class MirrorSync:
+    """Class to keep an output tree in sync with a source tree."""
+
+    def __init__(
+        self,
+        source_dir,
+        output_dir,
+        target_quality,
+        profile_factory=None,
+        converter_factory=BatchConverter,
+        cache=None,
+        resources=None,
+        pin_cpus=False,
+    ):
+        """Class initializer.
+
+        Args:
+            source_dir (str): Root of the source tree
+            output_dir (str): Root of the output tree
+            target_quality (str): Target quality for every output
+            profile_factory (callable): Return a new Profile
+            converter_factory (callable): Return a new BatchConverter
+            cache (OutputCache): Cache of conversion outputs, None for no
+                cache
+            resources (ResourcePolicy): Priority and limits for every job
+            pin_cpus (bool): Pin every parallel job to its own CPU set
+        """
+        if profile_factory is None:
+            from .profile import Profile
+
+            profile_factory = Profile
+
+        self.source_dir = Path(source_dir)
+        self.output_dir = Path(output_dir)
+        self.target_quality = target_quality
+        self.state = SyncState(output_dir)
+        self._profile_factory = profile_factory
+        self._profile = profile_factory()
+        self._converter_factory = converter_factory
+        self.cache = cache
+        self.resources = resources
+        self.pin_cpus = pin_cpus
+
+    @property
+    def params_hash(self):
+        """Return the hash of the target quality params."""
+        self._profile.update(new_quality=self.target_quality)
+        return params_hash(self._profile.params, self._profile.extension)
+
+    def output_path(self, source_path):
+        """Return the mirror output path of a source file."""
+        relative = Path(source_path).relative_to(self.source_dir)
+        return Path(
+            self.output_dir,
+            relative.parent,
+            relative.stem + self._profile.extension,
+        )
+
+    def plan(self):
+        """Return the SyncPlan of the source tree."""
+        params = self.params_hash
+        convert, skip, outputs = [], [], set()
+        try:
+            sources = search_directory_recursively(str(self.source_dir))
+        except FileNotFoundError:
+            sources = []
+
+        for source_path in sorted(map(Path, sources)):
+            output_path = self.output_path(source_path)
+            if output_path in outputs:
+                # Same name, different extension: keep the first source
+                continue
+            outputs.add(output_path)
+            fingerprint = source_fingerprint(source_path)
+            if self.state.is_up_to_date(output_path, fingerprint, params):
+                skip.append(output_path)
+            else:
+                convert.append((source_path, output_path, fingerprint))
+
+        prune = [
+            output_path
+            for output_path, source in self.state.outputs()
+            if not Path(self.source_dir, source).exists()
+        ]
+
+        return SyncPlan(convert, skip, prune)
+
+    def run(self, prune=False, max_workers=None, on_progress=None):
+        """Convert the new or changed sources and return a SyncReport.
+
+        Args:
+            prune (bool): Delete the outputs whose source disappeared
+            max_workers (int): Maximum number of parallel conversions
+            on_progress (callable): Called with a source path and the
+                progress percentage
+        """
+        plan = self.plan()
+        params = self.params_hash
+        converted, failed = [], []
+
+        pruned = []
+        if prune:
+            for output_path in plan.prune:
+                try:
+                    output_path.unlink()
+                except FileNotFoundError:
+                    pass
+                self.state.forget(output_path)
+                pruned.append(output_path)
+
+        with self._converter_factory(
+            max_workers=max_workers,
+            profile_factory=self._profile_factory,
+            cache=self.cache,
+            resources=self.resources,
+            pin_cpus=self.pin_cpus,
+        ) as converter:
+            futures = {}
+            for source_path, output_path, fingerprint in plan.convert:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                future = converter.submit(
+                    source_path,
+                    self.target_quality,
+                    output_path.parent,
+                    on_progress=on_progress,
+                )
+                futures[future] = (source_path, output_path, fingerprint)
+
+            for future in as_completed(futures):
+                source_path, output_path, fingerprint = futures[future]
+                try:
+                    future.result()
+                except (ConversionError, ValueError) as error:
+                    failed.append((source_path, error))
+                    continue
+                self.state.record(
+                    output_path,
+                    source_path.relative_to(self.source_dir).as_posix(),
+                    fingerprint,
+                    params,
+                )
+                # Save often, so an interrupted sync is not lost
+                self.state.save()
+                converted.append(output_path)
+
+        self.state.save()
+
+        return SyncReport(converted, plan.skip, pruned, failed)
+
+
+def main(args=None):
+    """Sync a converted mirror of a source tree."""
+    parser = argparse.ArgumentParser(
+        description=APP_NAME + " " + VERSION + " mirror sync"
+    )
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("target_quality")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete outputs whose source disappeared",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="maximum number of parallel conversions"
+    )
+    parser.add_argument(
+        "--cache-mib",
+        type=float,
+        help="reuse outputs from a cache of this size in MiB",
+    )
+    add_resource_arguments(parser)
+    args = parser.parse_args(args)
+
+    cache = None
+    if args.cache_mib:
+        cache = OutputCache(max_bytes=args.cache_mib * 2**20)
+    report = MirrorSync(
+        args.source_dir,
+        args.output_dir,
+        args.target_quality,
+        cache=cache,
+        resources=resources_from_args(args),
+        pin_cpus=args.pin_cpus,
+    ).run(prune=args.prune, max_workers=args.jobs)
+
+    for source_path, error in report.failed:
+        print("Failed: {0}: {1}".format(source_path, error))
+    print(
+        "Converted: {0}, up to date: {1}, pruned: {2}, failed: {3}".format(
+            len(report.converted),
+            len(report.skipped),
+            len(report.pruned),
+            len(report.failed),
+        )
+    )
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -20,10 +20,70 @@
 """This module provides Conversion Task Class."""
 
 import shlex
+from collections import namedtuple
 from os import W_OK, access
 from pathlib import Path
 
 from . import CPU_CORES, STATUS
+from .adapt import adapt_params
+from .retry import TaskAttempt
+from .scheduler import is_audio_only, job_kind
+from .selection import map_options
+from .streaming import streaming_output_args
+
+# end is None to convert up to the end of the video
+Trim = namedtuple("Trim", "start end")
+
+PREVIEW_SECONDS = 10
+PREVIEW_TAG = "[Preview]-"
+
+# Burn the subtitles into the video, or mux them as a soft track
+SubtitleModes = namedtuple("SubtitleModes", "burn soft")
+SUBTITLE_MODE = SubtitleModes("burn", "soft")
+# Charset of the subtitle files, None to let the library detect UTF-8
+SUBTITLE_CHARSET = "cp1252"
+# Soft subtitle codec of the containers supporting them
+SOFT_SUBTITLE_CODECS = {
+    ".mkv": "srt",
+    ".m4v": "mov_text",
+    ".mov": "mov_text",
+    ".mp4": "mov_text",
+    ".webm": "webvtt",
+}
+# Subtitle codecs of the sources that convert to a soft subtitle codec,
+# bitmap subtitles like PGS or DVD ones don't
+TEXT_SUBTITLE_CODECS = frozenset(
+    ("ass", "mov_text", "srt", "ssa", "subrip", "text", "webvtt")
+)
+
+# inputs go after the video input, streams before the preset params and
+# outputs after them
+SubtitleOptions = namedtuple("SubtitleOptions", "inputs streams outputs")
+
+
+def input_args(cmd):
+    """Return the input options of a conversion command.
+
+    Conversion commands start with: [-ss start] -i input_path, then the
+    options of the subtitle input, if any
+    """
+    last_input = len(cmd) - 1 - cmd[::-1].index("-i")
+    return cmd[: last_input + 2]
+
+
+def merge_conversion_cmds(cmds):
+    """Merge conversion commands sharing an input into one command.
+
+    The input is read and decoded once, and every output keeps its own
+    options.
+    """
+    inputs = input_args(cmds[0])
+    merged = list(cmds[0])
+    for cmd in cmds[1:]:
+        if input_args(cmd) != inputs:
+            raise ValueError("Commands don't share the same input")
+        merged.extend(cmd[len(inputs) :])
+    return merged
 
 
 class Task:
@@ -34,9 +94,54 @@ class Task:
         self.profile = profile
         self.output_dir = output_dir
         self.status = STATUS.todo
+        self.attempts = []
+        # LibraryError and last log lines of the failed conversion
+        self.error = None
+        self.error_tail = []
+        self.trim = None
+        self.is_preview = False
+        self.subtitle_mode = SUBTITLE_MODE.burn
+        self.subtitle_charset = SUBTITLE_CHARSET
+        # StreamRules to choose the streams to convert, None to let the
+        # library choose
+        self.stream_rules = None
+        # StreamTarget to stream the output to while encoding, None to
+        # write only the output file
+        self.stream_target = None
+        # Target quality of the task, the shared profile follows the last
+        # built command only
+        self.target_quality = None
+        self._kind = None
+
+    @property
+    def kind(self):
+        """Return the JOB_KIND of the target quality, None if unknown."""
+        if self.target_quality is None:
+            return None
+        if self._kind is None or self._kind[0] != self.target_quality:
+            params = self.profile.get_xml_profile_attr(
+                target_quality=self.target_quality, attr_name="preset_params"
+            )
+            extension = self.profile.get_xml_profile_attr(
+                target_quality=self.target_quality,
+                attr_name="preset_extension",
+            )
+            self._kind = (self.target_quality, job_kind(params, extension))
+        return self._kind[1]
 
-    def build_conversion_cmd(self, target_quality, tagged, subtitle):
-        """Return the conversion command."""
+    def build_conversion_cmd(
+        self,
+        target_quality,
+        tagged,
+        subtitle,
+        resources=None,
+        null_seconds=None,
+    ):
+        """Return the conversion command.
+
+        With null_seconds, only that many seconds are written to the null
+        muxer instead of the output, to validate the command.
+        """
         if not access(self.output_dir, W_OK):
             raise PermissionError("Access denied")
 
@@ -45,9 +150,29 @@ class Task:
 
         # Ensure the conversion_profile is up to date
         self.profile.update(new_quality=target_quality)
+        self.target_quality = target_quality
 
-        # Process subtitles if available
-        subtitle_opt = self._process_subtitles(subtitle)
+        params = shlex.split(self.profile.params)
+        streams = self._selected_streams(params)
+        stream_maps = map_options(streams)
+        if any(stream.codec_type == "subtitle" for stream in streams):
+            stream_maps += [
+                "-c:s",
+                SOFT_SUBTITLE_CODECS[self.profile.extension],
+            ]
+        if self.is_audio_only:
+            # Read only the audio stream, subtitles can't be burnt in
+            subtitle_opt = SubtitleOptions(
+                [], self._audio_stream_options(params, streams), []
+            )
+            stream_maps = []
+        else:
+            # Process subtitles if available
+            subtitle_opt = self._process_subtitles(
+                subtitle, mapped="-map" in params or bool(stream_maps)
+            )
+            # Don't upscale the source or raise its frame rate
+            params = adapt_params(params, self.video)
 
         # Get the output path
         output_path = self._get_output_path(tagged)
@@ -55,16 +180,97 @@ class Task:
         # if output_path.exists():
         #     raise FileExistsError('Video file already exits')
 
+        threads = CPU_CORES if resources is None else resources.threads
+
         # Build the conversion command
         cmd = (
-            ["-i", self.video.path.__str__()]
-            + subtitle_opt
-            + shlex.split(self.profile.params)
-            + ["-threads", str(CPU_CORES)]
-            + ["-y", output_path.__str__()]
+            self._seek_options()
+            + ["-i", self.video.path.__str__()]
+            + subtitle_opt.inputs
+            + subtitle_opt.streams
+            + stream_maps
+            + params
+            + subtitle_opt.outputs
+            + self._duration_options()
+            + ["-threads", str(threads)]
+        )
+
+        if null_seconds is not None:
+            return cmd + ["-t", str(null_seconds), "-f", "null", "-"]
+
+        if self.stream_target is None:
+            return cmd + ["-y", output_path.__str__()]
+
+        return cmd + streaming_output_args(
+            self.stream_target, output_path, mapped="-map" in cmd
         )
 
-        return cmd
+    @property
+    def source_duration(self):
+        """Return the duration of the whole input video in seconds."""
+        return float(self.video.format_info["duration"])
+
+    @property
+    def duration(self):
+        """Return the duration of the output video in seconds."""
+        if self.trim is None:
+            return self.source_duration
+
+        end = self.source_duration if self.trim.end is None else self.trim.end
+        return max(min(end, self.source_duration) - self.trim.start, 0.0)
+
+    @property
+    def source_size(self):
+        """Return the size of the input video in the trimmed range."""
+        size = float(self.video.format_info["size"])
+        if self.trim is None:
+            return size
+        return size * self.duration / self.source_duration
+
+    def set_trim(self, start=0.0, end=None):
+        """Convert only from start to end seconds of the video."""
+        if start < 0 or start >= self.source_duration:
+            raise ValueError("Trim start out of the video")
+        if end is not None and end <= start:
+            raise ValueError("Trim end before its start")
+
+        self.trim = Trim(float(start), None if end is None else float(end))
+        self.is_preview = False
+
+    def set_preview(self, seconds=PREVIEW_SECONDS):
+        """Convert only some seconds from the middle of the video."""
+        seconds = min(seconds, self.source_duration)
+        start = (self.source_duration - seconds) / 2
+        self.trim = Trim(start, start + seconds)
+        self.is_preview = True
+
+    def clear_trim(self):
+        """Convert the whole video."""
+        self.trim = None
+        self.is_preview = False
+
+    def _seek_options(self):
+        """Return the input options to seek fast to the trim start."""
+        if self.trim is None or not self.trim.start:
+            return []
+        return ["-ss", "{0:.3f}".format(self.trim.start)]
+
+    def _duration_options(self):
+        """Return the output options to stop at the trim end."""
+        if self.trim is None or self.trim.end is None:
+            return []
+        return ["-t", "{0:.3f}".format(self.duration)]
+
+    @property
+    def is_audio_only(self):
+        """Return True if the current profile targets an audio file."""
+        return is_audio_only(self.profile.params, self.profile.extension)
+
+    def record_attempt(self, target_quality, outcome=None):
+        """Record a conversion attempt, outcome is its LibraryError."""
+        attempt = TaskAttempt(len(self.attempts) + 1, target_quality, outcome)
+        self.attempts.append(attempt)
+        return attempt
 
     def delete_output(self, tagged):
         """Delete the output file if conversion is stopped."""
@@ -102,6 +308,9 @@ class Task:
     def _get_output_path(self, tagged):
         """Return the the output file path as pathlib.Path."""
         tag = self.profile.quality_tag if tagged else ""
+        # Don't overwrite the full output with a preview
+        if self.is_preview:
+            tag = PREVIEW_TAG + tag
         output_file_name = "".join(
             (tag, self.video.get_name(False), self.profile.extension)
         )
@@ -123,17 +332,102 @@ class Task:
 
         raise FileNotFoundError("Subtitle file not found")
 
-    def _process_subtitles(self, subtitle):
+    def sidecar_paths(self, subtitle):
+        """Return the paths of the files read besides the video."""
+        if not subtitle:
+            return []
+        try:
+            return [self.subtitle_path]
+        except FileNotFoundError:
+            return []
+
+    def _selected_streams(self, params):
+        """Return the Streams chosen by the rules, empty if no rules.
+
+        Subtitle streams the output container can't hold are dropped.
+        """
+        # Keep the stream mapping of presets that have their own
+        if self.stream_rules is None or "-map" in params:
+            return []
+        try:
+            streams = self.stream_rules.select(self.video.streams)
+        except (AttributeError, OSError):
+            return []
+        soft_subtitles = self.profile.extension in SOFT_SUBTITLE_CODECS
+        return [
+            stream
+            for stream in streams
+            if stream.codec_type != "subtitle"
+            or (soft_subtitles and stream.codec_name in TEXT_SUBTITLE_CODECS)
+        ]
+
+    @staticmethod
+    def _audio_stream_options(params, streams):
+        """Return the options to skip the video for an audio target."""
+        options = [] if "-vn" in params else ["-vn"]
+        # Keep the stream mapping of presets that have their own
+        if "-map" not in params:
+            audio = [
+                stream.index
+                for stream in streams
+                if stream.codec_type == "audio"
+            ]
+            stream_spec = "0:{0}".format(audio[0]) if audio else "0:a:0"
+            options += ["-map", stream_spec]
+        return options
+
+    @property
+    def soft_subtitle_codec(self):
+        """Return the soft subtitle codec of the output, None if missing."""
+        codec = SOFT_SUBTITLE_CODECS.get(self.profile.extension)
+        if codec == "srt" and self.subtitle_path.suffix.lower() == ".ssa":
+            # Keep the styles of SSA subtitles
+            return "ass"
+        return codec
+
+    def _process_subtitles(self, subtitle, mapped):
         """Process subtitles if available."""
         if subtitle:
             try:
-                subtitle_opt = [
-                    "-vf",
-                    "subtitles='{0}':force_style='Fontsize=24'"
-                    ":charenc=cp1252".format(self.subtitle_path.__str__()),
-                ]
-                return subtitle_opt
+                if self.subtitle_mode == SUBTITLE_MODE.soft:
+                    codec = self.soft_subtitle_codec
+                    if codec is not None:
+                        return self._soft_subtitle_options(codec, mapped)
+                # Burn in if the container has no soft subtitles
+                return SubtitleOptions([], self._burn_in_options(), [])
             except FileNotFoundError:
                 pass
 
-        return []
+        return SubtitleOptions([], [], [])
+
+    def _soft_subtitle_options(self, codec, mapped):
+        """Return the options to mux the subtitles as a soft track.
+
+        mapped is True if the command already maps the video streams.
+        """
+        inputs = self._seek_options()
+        if self.subtitle_charset:
+            inputs += ["-sub_charenc", self.subtitle_charset]
+        inputs += ["-i", self.subtitle_path.__str__()]
+
+        outputs = ["-map", "1:0", "-c:s", codec]
+        if not mapped:
+            # Mapping a stream drops the default stream selection
+            outputs = ["-map", "0:v:0?", "-map", "0:a:0?"] + outputs
+        return SubtitleOptions(inputs, [], outputs)
+
+    def _burn_in_options(self):
+        """Return the options to burn the subtitles into the video."""
+        subtitle_filter = "subtitles='{0}':force_style='Fontsize=24'".format(
+            self.subtitle_path.__str__()
+        )
+        if self.subtitle_charset:
+            subtitle_filter += ":charenc={0}".format(self.subtitle_charset)
+        seek = self._seek_options()
+        if seek:
+            # Seeking resets the timestamps, shift them back for the
+            # subtitles to show in time
+            subtitle_filter = "setpts=PTS+{0}/TB,{1},{2}".format(
+                seek[1], subtitle_filter, "setpts=PTS-STARTPTS"
+            )
+        return ["-vf", subtitle_filter]
@@ -19,13 +19,25 @@
 
 """This module provides the definition of TaskList and Video classes."""
 
-from collections import deque
+import os
+from collections import deque, namedtuple
 from pathlib import Path
 
 from . import STATUS
-from .task import Task
+from .fingerprint import fast_fingerprint, full_fingerprint
+from .retry import RetryPolicy
+from .task import (
+    PREVIEW_SECONDS,
+    SUBTITLE_CHARSET,
+    SUBTITLE_MODE,
+    Task,
+    input_args,
+)
 from .video import Video
 
+# A queued task converted in the same run as the running task
+Partner = namedtuple("Partner", "position cmd output_path")
+
 
 class TaskList(list):
     """Class to store the list of video files to convert."""
@@ -37,6 +49,20 @@ class TaskList(list):
         self._position = None  # None, no item running, 0, the first item,...
         self.not_added_files = deque()
         self._output_dir = output_dir
+        # Default ResourcePolicy for the queue and per target quality
+        self.resources = None
+        self.preset_resources = {}
+        self.retry_policy = RetryPolicy()
+        # Hash the whole added videos in the background, to confirm the
+        # duplicates found by their fast fingerprint
+        self.full_hash = False
+        # How the added tasks process subtitles
+        self.subtitle_mode = SUBTITLE_MODE.burn
+        self.subtitle_charset = SUBTITLE_CHARSET
+        # StreamRules of the added tasks, None to let the library choose
+        self.stream_rules = None
+        # Convert the queued tasks sharing an input in a single run
+        self.merge_inputs = True
 
     @property
     def output_dir(self):
@@ -57,7 +83,13 @@ class TaskList(list):
         """Add a task to the task list."""
         video = Video(video_path=video_path)
         if video.is_valid():
-            self.append(Task(video, self._profile, self.output_dir))
+            task = Task(video, self._profile, self.output_dir)
+            task.subtitle_mode = self.subtitle_mode
+            task.subtitle_charset = self.subtitle_charset
+            task.stream_rules = self.stream_rules
+            self.append(task)
+            if self.full_hash:
+                video.start_full_hash()
             return True
 
         self.not_added_files.append(video_path)
@@ -91,6 +123,22 @@ class TaskList(list):
         """Return general streaming info from a video file."""
         return self[position].video.format_info[info_param]
 
+    def get_task_duration(self, position):
+        """Return the duration of a task output in seconds."""
+        return self[position].duration
+
+    def set_task_trim(self, position, start=0.0, end=None):
+        """Convert only from start to end seconds of a video."""
+        self[position].set_trim(start, end)
+
+    def set_task_preview(self, position, seconds=PREVIEW_SECONDS):
+        """Convert only some seconds from the middle of a video."""
+        self[position].set_preview(seconds)
+
+    def clear_task_trim(self, position):
+        """Convert the whole video."""
+        self[position].clear_trim()
+
     def running_file_name(self, with_extension=True):
         """Return the running file name."""
         return self._running_task.video.get_name(with_extension)
@@ -99,6 +147,16 @@ class TaskList(list):
         """Return running file info."""
         return self._running_task.video.format_info[info_param]
 
+    @property
+    def running_task_duration(self):
+        """Return the duration of the running task output in seconds."""
+        return self._running_task.duration
+
+    @property
+    def running_task_source_size(self):
+        """Return the size of the running task input in its trimmed range."""
+        return self._running_task.source_size
+
     @property
     def running_task_status(self):
         """Return file status."""
@@ -109,12 +167,91 @@ class TaskList(list):
         """Set file status."""
         self._running_task.status = status
 
-    def running_task_conversion_cmd(self, target_quality, tagged, subtitle):
+    def fail_running_task(self, error, log_tail):
+        """Mark the running task as failed, keeping why it failed."""
+        self._running_task.status = STATUS.failed
+        self._running_task.error = error
+        self._running_task.error_tail = list(log_tail)
+
+    def resources_for(self, target_quality):
+        """Return the ResourcePolicy to use with a target quality."""
+        return self.preset_resources.get(target_quality, self.resources)
+
+    def running_task_conversion_cmd(
+        self, target_quality, tagged, subtitle, resources=None
+    ):
         """Return the conversion command."""
         return self._running_task.build_conversion_cmd(
-            target_quality, tagged, subtitle
+            target_quality, tagged, subtitle, resources
         )
 
+    def record_running_attempt(self, target_quality, outcome=None):
+        """Record a conversion attempt of the running task."""
+        return self._running_task.record_attempt(target_quality, outcome)
+
+    def running_task_retry(self, error):
+        """Return the Retry of the failed running task, None to give up."""
+        return self.retry_policy.next_retry(self._running_task.attempts, error)
+
+    def running_task_partners(
+        self, cmd, qualities, tagged, subtitle, resources=None
+    ):
+        """Return the Partners of the running task, in list order.
+
+        Partners are the queued tasks reading the same input with the same
+        input options, so a single run decodes the input for all of them.
+
+        Args:
+            cmd (list): Conversion command of the running task
+            qualities (dict): Target quality of every queued position, the
+                running one included
+            tagged (bool): Tag the output names with the quality
+            subtitle (bool): Process the subtitles
+            resources (ResourcePolicy): Priority and limits of the run
+        """
+        running = self._running_task
+        if not self.merge_inputs or running.stream_target is not None:
+            return []
+
+        video_path = os.path.realpath(running.video.path)
+        outputs = {running.get_output_path(tagged)}
+        partners = []
+        for position in range(self.position + 1, self.length):
+            task = self[position]
+            if (
+                task.status != STATUS.todo
+                or task.stream_target is not None
+                or os.path.realpath(task.video.path) != video_path
+            ):
+                continue
+            try:
+                partner_cmd = task.build_conversion_cmd(
+                    qualities[position], tagged, subtitle, resources
+                )
+            except (OSError, ValueError):
+                continue
+            # The profile is shared, so the output path is only right
+            # while the command is built
+            output_path = task.get_output_path(tagged)
+            if output_path in outputs or input_args(partner_cmd) != input_args(
+                cmd
+            ):
+                continue
+            outputs.add(output_path)
+            partners.append(Partner(position, partner_cmd, output_path))
+
+        # Point the shared profile back to the running task quality
+        running.profile.update(new_quality=qualities[self.position])
+        return partners
+
+    def running_task_output_path(self, tagged):
+        """Return the output path of the running task."""
+        return self._running_task.get_output_path(tagged)
+
+    def running_task_sidecar_paths(self, subtitle):
+        """Return the paths of the files the running task reads."""
+        return self._running_task.sidecar_paths(subtitle)
+
     def running_file_output_name(self, tagged):
         """Return the output name."""
         return self._running_task.get_output_file_name(tagged)
@@ -167,19 +304,15 @@ class TaskList(list):
         return self.__len__()
 
     def duration(self, step=1):
-        """Return the duration time of TaskList counting files to do only."""
-        if self.position >= 0:
-            tasks = self[self.position + step :]
-            return sum(
-                float(task.video.format_info["duration"])
-                for task in tasks
-                if task.status != STATUS.done
-            )
+        """Return the duration time of TaskList counting files to do only.
 
+        Trimmed tasks and previews count their output duration only.
+        """
+        tasks = self[self.position + step :] if self.position >= 0 else self
         return sum(
-            float(task.video.format_info["duration"])
-            for task in self
-            if task.status != STATUS.done
+            task.duration
+            for task in tasks
+            if task.status not in (STATUS.done, STATUS.failed)
         )
 
     @property
@@ -188,8 +321,41 @@ class TaskList(list):
         return self[self.position]
 
     def task_is_added(self, file_path):
-        """Determine if a video file is already in the list."""
+        """Determine if a video file is already in the list.
+
+        Links, other mounts and copies of a file in the list are found by
+        their content fingerprint.
+        """
+        path = Path(file_path)
+        try:
+            size = path.stat().st_size
+            resolved = path.resolve()
+        except OSError:
+            return any(task.video.path == path for task in self)
+
+        fingerprint = None
         for task in self:
-            if task.video.path.__str__() == file_path:
-                return True
+            try:
+                if task.video.path.resolve() == resolved:
+                    return True
+                if task.video.path.stat().st_size != size:
+                    continue
+            except OSError:
+                continue
+            if fingerprint is None:
+                try:
+                    fingerprint = fast_fingerprint(path)
+                except OSError:
+                    # An unreadable file is never a duplicate
+                    return False
+            try:
+                if task.video.fingerprint != fingerprint:
+                    continue
+                # Confirm the match with the whole content if asked
+                if not self.full_hash or full_fingerprint(
+                    path
+                ) == full_fingerprint(task.video.path):
+                    return True
+            except OSError:
+                continue
         return False
@@ -72,6 +72,26 @@ def write_time(time_in_secs):
     return "{secs:02d}s".format(secs=secs)
 
 
+def read_time(time_text):
+    """Return the seconds of a time in 00h:00m:00s, 00:00:00 or 0 format."""
+    parts = time_text.strip().replace("h", "").replace("m", "")
+    parts = parts.replace("s", "").split(":")
+    if len(parts) > 3:
+        raise ValueError("Invalid time measure.")
+
+    secs = 0.0
+    for part in parts:
+        try:
+            value = float(part)
+        except ValueError:
+            raise ValueError("Invalid time measure.")
+        if value < 0:
+            raise ValueError("Time must be positive.")
+        secs = secs * 60 + value
+
+    return secs
+
+
 def write_size(size_in_bytes):
     """Return size in appropriate measure."""
     try:
@@ -21,6 +21,7 @@
 
 from pathlib import Path
 
+from .fingerprint import fast_fingerprint, full_hash_in_background
 from .probe import Probe
 
 
@@ -31,6 +32,8 @@ class Video:
         """Class initializer."""
         self.path = Path(video_path)
         self._info = Probe(self.path)
+        self._fingerprint = None
+        self._full_hash = None
 
     def __getattr__(self, attr):
         """Delegate to get info about the video."""
@@ -42,6 +45,26 @@ class Video:
             return self.path.name
         return self.path.stem
 
+    @property
+    def fingerprint(self):
+        """Return the fast content fingerprint of the video file."""
+        if self._fingerprint is None:
+            self._fingerprint = fast_fingerprint(self.path)
+        return self._fingerprint
+
+    def start_full_hash(self):
+        """Start hashing the whole video file in the background."""
+        if self._full_hash is None:
+            self._full_hash = full_hash_in_background(self.path)
+        return self._full_hash
+
+    @property
+    def full_hash(self):
+        """Return the full content hash, None if not computed yet."""
+        if self._full_hash is None or not self._full_hash.done():
+            return None
+        return self._full_hash.result()
+
     def is_valid(self):
         """Check if a video is valid."""
         try:
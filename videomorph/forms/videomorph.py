@@ -23,15 +23,18 @@ from collections import OrderedDict
 from functools import partial
 from os.path import dirname, exists, isdir, isfile
 from os.path import join as join_path
+from pathlib import Path
 
 from PyQt6.QtCore import (
     QCoreApplication,
     QDir,
     QPoint,
-    QProcess,
     QSettings,
     QSize,
     Qt,
+    QThread,
+    QTimer,
+    pyqtSignal,
 )
 from PyQt6.QtGui import QIcon, QAction, QPixmap, QKeySequence
 from PyQt6.QtWidgets import (
@@ -41,6 +44,7 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QGroupBox,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
     QLineEdit,
     QMainWindow,
@@ -67,12 +71,21 @@ from videomorph.converter import (
     VIDEO_FILTERS,
     VM_PATHS,
 )
+from videomorph.converter.cache import OutputCache
 from videomorph.converter.console import search_directory_recursively
+from videomorph.converter.errors import (ERROR_ACTION, ERROR_KIND,
+                                         LibraryError, error_action)
+from videomorph.converter.fingerprint import fast_fingerprint, full_fingerprint
 from videomorph.converter.launchers import launcher_factory
 from videomorph.converter.library import Library
+from videomorph.converter.manifest import ScanManifest
+from videomorph.converter.preflight import Preflight
 from videomorph.converter.profile import Profile
+from videomorph.converter.resources import ResourcePolicy, parse_resources
+from videomorph.converter.selection import StreamRules
+from videomorph.converter.task import PREVIEW_SECONDS, merge_conversion_cmds
 from videomorph.converter.tasklist import TaskList
-from videomorph.converter.utils import write_time
+from videomorph.converter.utils import read_time, write_time
 
 from . import COLUMNS, videomorph_qrc
 from .about import AboutVMDialog
@@ -81,6 +94,22 @@ from .info import InfoDialog
 from .vmwidgets import TasksListTable
 
 
+class PreflightThread(QThread):
+    """Thread to run the pre-flight commands out of the GUI thread."""
+
+    checked = pyqtSignal(object)
+
+    def __init__(self, preflight, plan, parent=None):
+        """Class initializer."""
+        super(PreflightThread, self).__init__(parent)
+        self._preflight = preflight
+        self._plan = plan
+
+    def run(self):
+        """Run the commands and emit the PreflightReport."""
+        self.checked.emit(self._preflight.run_commands(self._plan))
+
+
 class VideoMorphMW(QMainWindow):
     """VideoMorph Main Window class."""
 
@@ -91,6 +120,16 @@ class VideoMorphMW(QMainWindow):
         self.icon = self._get_app_icon()
         self.source_dir = QDir.homePath()
         self.task_list_duration = 0.0
+        self._requeue_quality = None
+        self._preflight = True
+        self._preflight_thread = None
+        self._cache_entry = None
+        # (Partner, cache entry) of the tasks converted in the running run
+        self._partners = []
+        self._retry_delay = None
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._end_encoding_process)
 
         self._setup_ui()
         self._setup_model()
@@ -396,7 +435,7 @@ class VideoMorphMW(QMainWindow):
                 text=self.tr("&Convert"),
                 shortcut="Ctrl+R",
                 tip=self.tr("Start Conversion Process"),
-                callback=self.start_encoding,
+                callback=self.start_conversion,
             ),
             "stop_action": dict(
                 icon=QIcon(":/icons/stop.png"),
@@ -457,6 +496,18 @@ class VideoMorphMW(QMainWindow):
                 tip=self.tr("Show Video Properties"),
                 callback=self.show_video_info,
             ),
+            "trim_action": dict(
+                text=self.tr("Trim..."),
+                tip=self.tr("Convert only a Time Range of the Video"),
+                callback=self.trim_media_file,
+            ),
+            "preview_action": dict(
+                text=self.tr("Preview Render"),
+                tip=self.tr(
+                    "Convert only {0} Seconds from the Middle of the Video"
+                ).format(PREVIEW_SECONDS),
+                callback=self.preview_media_file,
+            ),
         }
 
         for action in actions:
@@ -467,6 +518,8 @@ class VideoMorphMW(QMainWindow):
         first_separator.setSeparator(True)
         second_separator = QAction(self)
         second_separator.setSeparator(True)
+        third_separator = QAction(self)
+        third_separator.setSeparator(True)
         self.tasks_table.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
         self.tasks_table.addAction(self.open_media_file_action)
         self.tasks_table.addAction(self.open_media_dir_action)
@@ -474,6 +527,9 @@ class VideoMorphMW(QMainWindow):
         self.tasks_table.addAction(self.remove_media_file_action)
         self.tasks_table.addAction(self.clear_media_list_action)
         self.tasks_table.addAction(second_separator)
+        self.tasks_table.addAction(self.trim_action)
+        self.tasks_table.addAction(self.preview_action)
+        self.tasks_table.addAction(third_separator)
         self.tasks_table.addAction(self.play_input_media_file_action)
         self.tasks_table.addAction(self.play_output_media_file_action)
         self.tasks_table.addAction(self.info_action)
@@ -593,6 +649,110 @@ class VideoMorphMW(QMainWindow):
             self.task_list.output_dir = output_dir
         if "source_dir" in settings.allKeys():
             self.source_dir = str(settings.value("source_dir"))
+        if "preflight" in settings.allKeys():
+            self._preflight = settings.value("preflight", type=bool)
+        if "merge_inputs" in settings.allKeys():
+            self.task_list.merge_inputs = settings.value(
+                "merge_inputs", type=bool)
+        if "full_hash" in settings.allKeys():
+            self.task_list.full_hash = settings.value("full_hash", type=bool)
+        if "subtitle_mode" in settings.allKeys():
+            self.task_list.subtitle_mode = str(settings.value("subtitle_mode"))
+        if "subtitle_charset" in settings.allKeys():
+            # An empty charset lets the library detect UTF-8
+            self.task_list.subtitle_charset = (
+                str(settings.value("subtitle_charset")) or None)
+        self._load_size_projector_settings(settings)
+        self._load_resources_settings(settings)
+        self._load_retry_settings(settings)
+        self._load_stream_settings(settings)
+        if "cache_max_mib" in settings.allKeys():
+            self.library.cache = OutputCache(
+                max_bytes=float(settings.value("cache_max_mib")) * 2**20,
+                # Key the outputs on the whole inputs if they are hashed
+                fingerprint=(
+                    full_fingerprint
+                    if self.task_list.full_hash
+                    else fast_fingerprint
+                ),
+            )
+
+    def _load_retry_settings(self, settings):
+        """Read the retry policy used with failed conversion tasks."""
+        policy = self.task_list.retry_policy
+        if "retry_attempts" in settings.allKeys():
+            policy.max_attempts = int(settings.value("retry_attempts"))
+        if "retry_backoff" in settings.allKeys():
+            policy.backoff = float(settings.value("retry_backoff"))
+        if "retry_max_delay" in settings.allKeys():
+            policy.max_delay = float(settings.value("retry_max_delay"))
+        # Fallback target quality for each target quality
+        settings.beginGroup("retry_fallbacks")
+        for quality in settings.childKeys():
+            policy.fallbacks[quality] = str(settings.value(quality))
+        settings.endGroup()
+
+    def _load_stream_settings(self, settings):
+        """Read the rules to choose the streams to convert."""
+        settings.beginGroup("streams")
+        keys = settings.childKeys()
+        if keys:
+            def languages(key):
+                # QSettings reads comma separated values as a list
+                value = settings.value(key, [])
+                if isinstance(value, str):
+                    value = value.split(",")
+                return tuple(code for code in value if code.strip())
+
+            max_audio = settings.value("max_audio")
+            self.task_list.stream_rules = StreamRules(
+                audio_languages=languages("audio_languages"),
+                subtitle_languages=languages("subtitle_languages"),
+                skip_commentary=settings.value(
+                    "skip_commentary", True, type=bool),
+                max_audio=int(max_audio) if max_audio else None)
+        settings.endGroup()
+
+    def _load_resources_settings(self, settings):
+        """Read the priority and limits given to the conversion process."""
+        # Policy for each target quality, like 'nice=10 ionice=idle'
+        settings.beginGroup("preset_resources")
+        for quality in settings.childKeys():
+            try:
+                self.task_list.preset_resources[quality] = parse_resources(
+                    str(settings.value(quality)))
+            except ValueError:
+                pass
+        settings.endGroup()
+
+        keys = settings.allKeys()
+        if not {"nice", "ionice", "cpu_quota", "memory_max_mib"} & set(keys):
+            return
+
+        self.task_list.resources = ResourcePolicy(
+            nice=int(settings.value("nice")) if "nice" in keys else None,
+            ionice=str(settings.value("ionice")) if "ionice" in keys else None,
+            cpu_quota=(
+                float(settings.value("cpu_quota"))
+                if "cpu_quota" in keys
+                else None
+            ),
+            memory_max=(
+                float(settings.value("memory_max_mib")) * 2**20
+                if "memory_max_mib" in keys
+                else None
+            ),
+        )
+
+    def _load_size_projector_settings(self, settings):
+        """Read the output size caps used to abort oversized conversions."""
+        projector = self.library.projector
+        if "size_cap_mib" in settings.allKeys():
+            projector.max_size = float(settings.value("size_cap_mib")) * 2**20
+        if "size_ratio" in settings.allKeys():
+            projector.max_ratio = float(settings.value("size_ratio"))
+        if "size_fallback" in settings.allKeys():
+            projector.fallback = str(settings.value("size_fallback")) or None
 
     def _write_app_settings(self, **app_settings):
         """Write app settings on exit.
@@ -745,6 +905,7 @@ class VideoMorphMW(QMainWindow):
                 )
                 self.library.kill_converter()
                 self.library.close_converter()
+                self.library.close_log()
                 self.task_list.delete_running_file_output(
                     tagged=self.tag_chb.checkState()
                 )
@@ -754,6 +915,8 @@ class VideoMorphMW(QMainWindow):
             else:
                 event.ignore()
         else:
+            if self._preflight_thread is not None:
+                self._preflight_thread.wait()
             # Save settings
             self._write_app_settings()
             QCoreApplication.exit(0)
@@ -908,7 +1071,9 @@ class VideoMorphMW(QMainWindow):
             return
 
         try:
-            media_files = search_directory_recursively(directory)
+            media_files = search_directory_recursively(
+                directory, manifest=ScanManifest()
+            )
             self.source_dir = directory
             self.add_tasks(*media_files)
         except FileNotFoundError:
@@ -943,6 +1108,50 @@ class VideoMorphMW(QMainWindow):
             self._reset_options_check_boxes()
             self._update_ui_when_no_file()
 
+    def trim_media_file(self):
+        """Convert only a time range of the selected video."""
+        row = self.tasks_table.currentIndex().row()
+        time_range, accepted = QInputDialog.getText(
+            self,
+            self.tr('Trim Video'),
+            self.tr('Time Range to Convert, like 00:01:30-00:02:00 '
+                    '(Empty for the Whole Video):'))
+
+        if not accepted:
+            return
+
+        start, _, end = time_range.partition("-")
+        try:
+            if not time_range.strip():
+                self.task_list.clear_task_trim(position=row)
+            else:
+                self.task_list.set_task_trim(
+                    position=row,
+                    start=read_time(start) if start.strip() else 0.0,
+                    end=read_time(end) if end.strip() else None)
+        except ValueError:
+            self._show_message_box(
+                type_=QMessageBox.Icon.Critical,
+                title=self.tr('Error!'),
+                msg=self.tr('Invalid Time Range:') + ' ' + time_range)
+            return
+
+        self._update_task_duration(row)
+
+    def preview_media_file(self):
+        """Convert only some seconds from the middle of the selected video."""
+        row = self.tasks_table.currentIndex().row()
+        self.task_list.set_task_preview(position=row)
+        self._update_task_duration(row)
+
+    def _update_task_duration(self, row):
+        """Show the output duration of a task after trimming it."""
+        item_text = write_time(self.task_list.get_task_duration(row))
+        if self.task_list.get_task(row).is_preview:
+            item_text = self.tr('Preview') + ' ' + item_text
+        self.tasks_table.item(row, COLUMNS.DURATION).setText(item_text)
+        self.task_list_duration = self.task_list.duration()
+
     def _select_directory(self, dialog_title, source_dir=QDir.homePath()):
         options = QFileDialog.Option.DontResolveSymlinks | QFileDialog.Option.ShowDirsOnly
 
@@ -988,6 +1197,63 @@ class VideoMorphMW(QMainWindow):
             self._reset_options_check_boxes()
             self._update_ui_when_no_file()
 
+    def start_conversion(self):
+        """Check the conversion tasks, then start the encoding process."""
+        if self._preflight:
+            self._start_preflight_check()
+        else:
+            self.start_encoding()
+
+    def _start_preflight_check(self):
+        """Validate the tasks in the background before encoding."""
+        jobs = [
+            (row, self.task_list.get_task(row),
+             self.tasks_table.item(row, COLUMNS.QUALITY).text())
+            for row in range(self.task_list.length)
+            if self.task_list.get_task_status(row) not in (STATUS.done,
+                                                           STATUS.failed)
+        ]
+        self.statusBar().showMessage(self.tr("Checking Conversion Tasks..."))
+        self._update_ui_when_checking()
+        preflight = Preflight()
+        # The commands use the shared profile, so they are built here
+        plan = preflight.prepare(
+            jobs,
+            tagged=self.tag_chb.checkState(),
+            subtitle=bool(self.subtitle_chb.checkState()),
+        )
+        self._preflight_thread = PreflightThread(preflight, plan, self)
+        self._preflight_thread.checked.connect(self._end_preflight_check)
+        self._preflight_thread.start()
+
+    def _end_preflight_check(self, report):
+        """Start the encoding process if the user accepts the report."""
+        self._preflight_thread.wait()
+        self._preflight_thread = None
+        self.statusBar().showMessage(self.tr("Ready"))
+        if report.ok:
+            self.start_encoding()
+            return
+
+        user_answer = QMessageBox.question(
+            self,
+            self.tr('Warning!'),
+            self.tr('Some Conversion Tasks are Going to Fail:') + '\n\n' +
+            report.format() + '\n\n' +
+            self.tr('Skip them and Continue?'),
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+
+        if user_answer != QMessageBox.StandardButton.Yes:
+            self.update_ui_when_ready()
+            return
+
+        for row in report.failed_positions:
+            self.task_list.set_task_status(row, STATUS.failed)
+            self.tasks_table.item(row, COLUMNS.PROGRESS).setText(
+                self.tr("Failed!"))
+        self.task_list_duration = self.task_list.duration()
+        self.start_encoding()
+
     def start_encoding(self):
         """Start the encoding process."""
         self._update_ui_when_converter_running()
@@ -995,18 +1261,45 @@ class VideoMorphMW(QMainWindow):
         self.task_list.position += 1
         self.library.timer.operation_start_time = 0.0
 
-        if self.task_list.running_task_status != STATUS.done:
+        if self.task_list.running_task_status not in (STATUS.done,
+                                                      STATUS.failed):
+            self.library.error = None
             try:
+                target_quality = self.tasks_table.item(
+                    self.task_list.position, COLUMNS.QUALITY
+                ).text()
+                resources = self.task_list.resources_for(target_quality)
                 # Fist build the conversion command
                 conversion_cmd = self.task_list.running_task_conversion_cmd(
-                    target_quality=self.tasks_table.item(
-                        self.task_list.position, COLUMNS.QUALITY
-                    ).text(),
+                    target_quality=target_quality,
                     tagged=self.tag_chb.checkState(),
                     subtitle=bool(self.subtitle_chb.checkState()),
+                    resources=resources,
+                )
+                # Complete the task at once if its output is cached
+                if self._fetch_cached_output(
+                    conversion_cmd,
+                    output_path=self.task_list.running_task_output_path(
+                        tagged=self.tag_chb.checkState()
+                    ),
+                    sidecars=self.task_list.running_task_sidecar_paths(
+                        subtitle=bool(self.subtitle_chb.checkState())
+                    ),
+                ):
+                    return
+                # Decode the input once for the queued tasks sharing it
+                conversion_cmd = self._merge_partners(
+                    conversion_cmd, resources
                 )
                 # Then pass it to the _converter
-                self.library.start_converter(cmd=conversion_cmd)
+                self.library.open_log(
+                    video_path=self.task_list.get_file_path(
+                        self.task_list.position
+                    )
+                )
+                self.library.start_converter(
+                    cmd=conversion_cmd, resources=resources
+                )
             except PermissionError:
                 self._show_message_box(
                     type_=QMessageBox.Icon.Critical,
@@ -1027,6 +1320,7 @@ class VideoMorphMW(QMainWindow):
 
     def stop_file_encoding(self):
         """Stop file encoding process and continue with the list."""
+        retry_pending = self._cancel_retry()
         # Terminate the file encoding
         self.library.stop_converter()
         # Set Video.status attribute
@@ -1041,9 +1335,13 @@ class VideoMorphMW(QMainWindow):
         # Update the list duration and partial time for total progress bar
         self.library.timer.reset_progress_times()
         self.task_list_duration = self.task_list.duration()
+        # No process will finish when waiting for a retry
+        if retry_pending:
+            self._end_encoding_process()
 
     def stop_all_files_encoding(self):
         """Stop the conversion process for all the files in list."""
+        retry_pending = self._cancel_retry()
         # Delete the file when conversion is stopped by the user
         self.library.stop_converter()
         self.task_list.delete_running_file_output(
@@ -1061,38 +1359,293 @@ class VideoMorphMW(QMainWindow):
         # Update the list duration and partial time for total progress bar
         self.library.timer.reset_progress_times()
         self.task_list_duration = self.task_list.duration()
+        # No process will finish when waiting for a retry
+        if retry_pending:
+            self._end_encoding_process()
+
+    def _cancel_retry(self):
+        """Cancel a pending retry, return True if there was one."""
+        if not self._retry_timer.isActive():
+            return False
+        self._retry_timer.stop()
+        # Point again to the task waiting for the retry
+        self.task_list.position += 1
+        return True
 
     def _finish_file_encoding(self):
         """Finish the file encoding process."""
-        if self.task_list.running_task_status != STATUS.stopped:
+        if self._requeue_quality is not None:
+            self._release_partners(done=False)
+            self._requeue_running_task()
+        elif self.task_list.running_task_status in (STATUS.stopped,
+                                                    STATUS.failed):
+            # Stopped by the user or failed while running
+            self._release_partners(done=False)
+        else:
             self.notify()
             # Close and kill the conversion process
             self.library.close_converter()
+            self.library.close_log()
             # Check if the process finished OK
-            if (self.library.converter_exit_status() ==
-                    QProcess.ExitStatus.NormalExit):
+            error = self.library.finish_error()
+            if error is None:
+                self.task_list.record_running_attempt(
+                    self.tasks_table.item(
+                        self.task_list.position, COLUMNS.QUALITY
+                    ).text()
+                )
                 # When finished a file conversion...
                 self.tasks_table.item(
                     self.task_list.position, COLUMNS.PROGRESS
                 ).setText(self.tr("Done!"))
                 self.task_list.running_task_status = STATUS.done
                 self.operation_pb.setProperty("value", 0)
+                if self._cache_entry is not None:
+                    self.library.cache.store(*self._cache_entry)
+                self._release_partners(done=True)
                 if self.delete_chb.checkState():
                     self.task_list.delete_running_file_input()
+            else:
+                self._release_partners(done=False)
+                self._fail_running_task(error)
+        if self._retry_delay is not None:
+            # Wait before running the failed task again
+            self._retry_timer.start(int(self._retry_delay * 1000))
+            self._retry_delay = None
+            return
         # Attempt to end the conversion process
         self._end_encoding_process()
 
+    def _fetch_cached_output(self, conversion_cmd, output_path, sidecars):
+        """Complete the running task from the cache, return True on a hit."""
+        hit, self._cache_entry = self._lookup_cache(
+            self.task_list.position, conversion_cmd, output_path, sidecars
+        )
+        if not hit:
+            return False
+
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.PROGRESS
+        ).setText(self.tr("Done!"))
+        self.task_list.running_task_status = STATUS.done
+        if self.delete_chb.checkState():
+            self.task_list.delete_running_file_input()
+        # Go on from the event loop, a long run of hits would recurse
+        QTimer.singleShot(0, self._end_encoding_process)
+        return True
+
+    def _lookup_cache(self, row, conversion_cmd, output_path, sidecars):
+        """Fetch the output of a task from the cache.
+
+        Return a (hit, entry) tuple, entry is the (key, output_path) to
+        store after a miss, None if there is nothing to store.
+        """
+        cache = self.library.cache
+        if cache is None:
+            return False, None
+
+        try:
+            key = cache.key(
+                conversion_cmd,
+                self.task_list.get_file_path(row),
+                output_path,
+                sidecars=sidecars,
+            )
+        except OSError:
+            # Convert uncached if the inputs can't be fingerprinted
+            return False, None
+        # The cache logs its own I/O errors and carries on uncached
+        if cache.fetch(key, output_path):
+            return True, None
+        cache.prepare(output_path)
+        return False, (key, output_path)
+
+    def _merge_partners(self, conversion_cmd, resources):
+        """Add the outputs of the tasks sharing the running task input."""
+        self._partners = []
+        subtitle = bool(self.subtitle_chb.checkState())
+        qualities = {
+            row: self.tasks_table.item(row, COLUMNS.QUALITY).text()
+            for row in range(self.task_list.position, self.task_list.length)
+        }
+        cmds = [conversion_cmd]
+        for partner in self.task_list.running_task_partners(
+            conversion_cmd,
+            qualities,
+            tagged=self.tag_chb.checkState(),
+            subtitle=subtitle,
+            resources=resources,
+        ):
+            hit, entry = self._lookup_cache(
+                partner.position,
+                partner.cmd,
+                partner.output_path,
+                self.task_list.get_task(partner.position).sidecar_paths(
+                    subtitle
+                ),
+            )
+            if hit:
+                self.task_list.set_task_status(partner.position, STATUS.done)
+                self.tasks_table.item(
+                    partner.position, COLUMNS.PROGRESS
+                ).setText(self.tr("Done!"))
+                continue
+            self._partners.append((partner, entry))
+            cmds.append(partner.cmd)
+
+        return merge_conversion_cmds(cmds)
+
+    def _release_partners(self, done):
+        """Finish the tasks converted along with the running task.
+
+        If the run didn't succeed, their outputs are deleted and they are
+        converted later on their own.
+        """
+        for partner, entry in self._partners:
+            row = partner.position
+            task = self.task_list.get_task(row)
+            if done:
+                task.record_attempt(
+                    self.tasks_table.item(row, COLUMNS.QUALITY).text()
+                )
+                task.status = STATUS.done
+                self.tasks_table.item(row, COLUMNS.PROGRESS).setText(
+                    self.tr("Done!"))
+                if entry is not None:
+                    self.library.cache.store(*entry)
+                continue
+            Path(partner.output_path).unlink(missing_ok=True)
+            if task.status == STATUS.todo:
+                self.update_table_progress_column(row=row)
+        self._partners = []
+        self.task_list_duration = self.task_list.duration()
+
+    def _fail_running_task(self, error):
+        """Mark the running task as failed and act on the error category."""
+        self.task_list.record_running_attempt(
+            self.tasks_table.item(
+                self.task_list.position, COLUMNS.QUALITY
+            ).text(),
+            error,
+        )
+        retry = self.task_list.running_task_retry(error)
+        if retry is not None:
+            self._retry_running_task(retry)
+            return
+
+        # Keep the log of the failing task, later tasks open their own
+        log_tail = self.library.log_tail()
+        self.library.failures.append(
+            (self.task_list.running_file_name(with_extension=True), error,
+             log_tail)
+        )
+        self.task_list.fail_running_task(error, log_tail)
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.PROGRESS
+        ).setText(self.tr("Failed!"))
+        self.operation_pb.setProperty("value", 0)
+        self.task_list.delete_running_file_output(
+            tagged=self.tag_chb.checkState()
+        )
+
+        action = error_action(error)
+        if action == ERROR_ACTION.skip_quality:
+            # Every task using the same quality would fail the same way
+            quality = self.tasks_table.item(
+                self.task_list.position, COLUMNS.QUALITY
+            ).text()
+            for row in range(self.task_list.position + 1,
+                             self.task_list.length):
+                if (self.task_list.get_task_status(row) == STATUS.todo and
+                        self.tasks_table.item(
+                            row, COLUMNS.QUALITY).text() == quality):
+                    self.task_list.set_task_status(row, STATUS.failed)
+                    self.tasks_table.item(row, COLUMNS.PROGRESS).setText(
+                        self.tr("Failed!"))
+        elif action == ERROR_ACTION.stop_queue:
+            # No task can succeed, so stop the whole list
+            for row in range(self.task_list.position + 1,
+                             self.task_list.length):
+                if self.task_list.get_task_status(row) == STATUS.todo:
+                    self.task_list.set_task_status(row, STATUS.stopped)
+                    self.tasks_table.item(row, COLUMNS.PROGRESS).setText(
+                        self.tr("Stopped!"))
+            self.task_list.position = self.task_list.length - 1
+
+        self.library.timer.reset_progress_times()
+        self.task_list_duration = self.task_list.duration()
+
+    def _retry_running_task(self, retry):
+        """Schedule the failed running task to run again after a delay."""
+        self.task_list.delete_running_file_output(
+            tagged=self.tag_chb.checkState()
+        )
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.QUALITY
+        ).setText(retry.target_quality)
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.PROGRESS
+        ).setText(self.tr("Retry in") + " {0}s".format(int(retry.delay)))
+        self.operation_pb.setProperty("value", 0)
+        self.task_list.running_task_status = STATUS.todo
+        self.task_list.position -= 1
+        self._retry_delay = retry.delay
+        self.library.timer.reset_progress_times()
+        self.task_list_duration = self.task_list.duration()
+
+    def _abort_oversized_task(self):
+        """Abort the running task if its output is projected to be too big."""
+        if self.task_list.running_task_status in (STATUS.stopped,
+                                                  STATUS.failed):
+            return
+
+        quality_item = self.tasks_table.item(
+            self.task_list.position, COLUMNS.QUALITY
+        )
+        fallback = self.library.projector.fallback_for(quality_item.text())
+        self.library.stop_converter()
+        if fallback is None:
+            # No smaller quality to fall back to, so the task fails
+            self._fail_running_task(
+                LibraryError(ERROR_KIND.too_big,
+                             'Projected output exceeds limit', True)
+            )
+        else:
+            self._requeue_quality = fallback
+            self.task_list.running_task_status = STATUS.stopped
+            self.task_list.delete_running_file_output(
+                tagged=self.tag_chb.checkState()
+            )
+            self.library.timer.reset_progress_times()
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.PROGRESS
+        ).setText(self.tr("Too Big!"))
+
+    def _requeue_running_task(self):
+        """Run the aborted task again using the fallback quality."""
+        self.tasks_table.item(
+            self.task_list.position, COLUMNS.QUALITY
+        ).setText(self._requeue_quality)
+        self.update_table_progress_column(row=self.task_list.position)
+        self.task_list.running_task_status = STATUS.todo
+        self.task_list.position -= 1
+        self._requeue_quality = None
+        self.task_list_duration = self.task_list.duration()
+
     def _end_encoding_process(self):
         """End up the encoding process."""
         # Test if encoding process is finished
         if self.task_list.is_exhausted:
-            if self.library.error is not None:
+            if self.library.failures:
                 self._show_message_box(
                     type_=QMessageBox.Icon.Critical,
                     title='Error!',
                     msg=self.tr('The Conversion Library has '
-                                'Failed with Error:') + ' ' +
-                    self.library.error)
+                                'Failed with Error:') + '\n' +
+                    '\n\n'.join('{0}: {1} ({2})\n{3}'.format(
+                        name, error.kind, error.message, '\n'.join(tail))
+                        for name, error, tail in self.library.failures))
+                self.library.failures.clear()
                 self.library.error = None
             elif not self.task_list.all_stopped:
                 if self.shutdown_chb.checkState():
@@ -1133,9 +1686,9 @@ class VideoMorphMW(QMainWindow):
 
     def _ready_read(self):
         """Is called when the conversion process emit a new output."""
-        self.library.reader.update_read(
-            process_output=self.library.read_converter_output()
-        )
+        process_output = self.library.read_converter_output()
+        self.library.write_log(process_output)
+        self.library.reader.update_read(process_output=process_output)
 
         self._update_conversion_progress()
 
@@ -1149,10 +1702,15 @@ class VideoMorphMW(QMainWindow):
         if not self.library.timer.operation_start_time:
             self.library.timer.init_operation_start_time()
 
+        # Kill the process as soon as the conversion is doomed
+        error = self.library.catch_errors()
+        if error is not None and error.fatal:
+            if self.library.converter_is_running:
+                self.library.stop_converter()
+            return
+
         # Return if no time read
         if not self.library.reader.has_time_read:
-            # Catch the library errors only before time_read
-            self.library.catch_errors()
             return
 
         self.library.timer.update_time(
@@ -1161,7 +1719,14 @@ class VideoMorphMW(QMainWindow):
 
         self.library.timer.update_cum_times()
 
-        file_duration = float(self.task_list.running_file_info("duration"))
+        file_duration = self.task_list.running_task_duration
+
+        if self.library.output_is_oversized(
+            file_duration=file_duration,
+            source_size=self.task_list.running_task_source_size,
+        ):
+            self._abort_oversized_task()
+            return
 
         operation_progress = self.library.timer.operation_progress(
             file_duration=file_duration
@@ -1174,6 +1739,14 @@ class VideoMorphMW(QMainWindow):
         self._update_progress(
             op_progress=operation_progress, pr_progress=process_progress
         )
+        # Outputs of the same run may have their own durations
+        for partner, _ in self._partners:
+            duration = self.task_list.get_task(partner.position).duration
+            if duration:
+                self.tasks_table.item(
+                    partner.position, COLUMNS.PROGRESS
+                ).setText("{0}%".format(min(
+                    int(self.library.reader.time / duration * 100), 100)))
 
         self._update_status_bar()
 
@@ -1208,7 +1781,7 @@ class VideoMorphMW(QMainWindow):
 
     def _update_status_bar(self):
         """Update the status bar while converting."""
-        file_duration = float(self.task_list.running_file_info("duration"))
+        file_duration = self.task_list.running_task_duration
 
         self.statusBar().showMessage(
             self.tr(
@@ -1279,6 +1852,7 @@ class VideoMorphMW(QMainWindow):
         """Update media files state of conversion."""
         for media_file in self.task_list:
             media_file.status = STATUS.todo
+            media_file.attempts.clear()
         self.task_list.position = None
 
     def _on_modify_conversion_option(self):
@@ -1334,6 +1908,8 @@ class VideoMorphMW(QMainWindow):
         self.play_input_media_file_action.setEnabled(variables["play_input"])
         self.play_output_media_file_action.setEnabled(variables["play_output"])
         self.info_action.setEnabled(variables["info"])
+        self.trim_action.setEnabled(variables["remove"])
+        self.preview_action.setEnabled(variables["remove"])
         self.tasks_table.setCurrentItem(None)
 
     def _update_ui_when_no_file(self):
@@ -1395,6 +1971,28 @@ class VideoMorphMW(QMainWindow):
             info=False,
         )
 
+    def _update_ui_when_checking(self):
+        self._update_ui(
+            add=False,
+            presets=False,
+            profiles=False,
+            subtitles_chb=False,
+            add_costume_profile=False,
+            import_profile=False,
+            restore_profile=False,
+            convert=False,
+            clear=False,
+            remove=False,
+            stop=False,
+            stop_all=False,
+            output_dir=False,
+            delete_chb=False,
+            tag_chb=False,
+            play_input=False,
+            play_output=False,
+            info=False,
+        )
+
     def _update_ui_when_converter_running(self):
         self._update_ui(
             presets=False,
@@ -1426,6 +2024,8 @@ class VideoMorphMW(QMainWindow):
     def _enable_context_menu_action(self):
         if not self.library.converter_is_running:
             self.remove_media_file_action.setEnabled(True)
+            self.trim_action.setEnabled(True)
+            self.preview_action.setEnabled(True)
 
         self.play_input_media_file_action.setEnabled(True)
 